@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.core.serialization import FastJSONResponse
+from app.services.readiness import readiness
+
+router = APIRouter()
+
+@router.get("/ready", include_in_schema=False)
+async def ready():
+    # Readiness probe: 503 until startup and warm-up are done, while MongoDB
+    # is unreachable, and once shutdown has begun
+    is_ready, checks = await readiness.check()
+    return FastJSONResponse({"ready": is_ready, "checks": checks}, status_code=200 if is_ready else 503)
@@ -0,0 +1,108 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services import metrics
+from app.services.connections import manager
+from app.services.event_journal import journal
+from app.services.live_sessions import live_sessions
+from app.services.rate_limit import load_monitor
+from app.services.response_cache import response_cache
+from app.services.ticker import tickers
+from app.services.user_cache import user_cache
+
+router = APIRouter()
+
+# Gauges read straight from the live objects at scrape time
+
+def _connections():
+    return {(): sum(len(connections) for connections in manager.active_connections.values())}
+
+def _queue_depth():
+    depths = [
+        len(connection.queue)
+        for connections in manager.active_connections.values()
+        for connection in connections.values()
+    ]
+    return {("total",): sum(depths), ("max",): max(depths, default=0)}
+
+def _broker_queue_depth():
+    commands = getattr(manager.broker, "_commands", None)
+    return {(): commands.qsize() if commands is not None else 0}
+
+def _live_sessions():
+    sessions = list(live_sessions.sessions.values())
+    return {("all",): len(sessions), ("dirty",): sum(1 for live in sessions if live.dirty)}
+
+def _response_cache():
+    counts = {}
+    for result, by_namespace in (
+        ("hit", response_cache.hits),
+        ("miss", response_cache.misses),
+        ("not_modified", response_cache.not_modified)
+    ):
+        for namespace, count in by_namespace.items():
+            counts[(namespace, result)] = count
+    return counts
+
+def _user_cache(attribute: str):
+    return lambda: {(): getattr(user_cache, attribute)}
+
+metrics.registry.gauge(
+    "dungeon_ws_connections", "Open WebSocket connections on this node", function=_connections
+)
+metrics.registry.gauge(
+    "dungeon_ws_sessions", "Sessions with at least one WebSocket on this node",
+    function=lambda: {(): len(manager.active_connections)}
+)
+metrics.registry.gauge(
+    "dungeon_ws_send_queue_depth", "Outbound messages waiting in per-connection send queues",
+    ("stat",), function=_queue_depth
+)
+metrics.registry.gauge(
+    "dungeon_pubsub_queue_depth", "Commands waiting to be sent to the pub/sub broker",
+    function=_broker_queue_depth
+)
+metrics.registry.gauge(
+    "dungeon_live_sessions", "In-memory game sessions, and those with unflushed changes",
+    ("state",), function=_live_sessions
+)
+metrics.registry.gauge(
+    "dungeon_event_journal_buffered", "Journal events waiting to be written",
+    function=lambda: {(): len(journal.buffer)}
+)
+metrics.registry.gauge(
+    "dungeon_event_loop_lag_seconds", "Event-loop lag at the load monitor's last sample",
+    function=lambda: {(): load_monitor.lag}
+)
+metrics.registry.gauge(
+    "dungeon_ws_position_rate", "Position updates per second currently allowed per client",
+    function=lambda: {(): load_monitor.position_rate}
+)
+metrics.registry.gauge(
+    "dungeon_tickers", "Sessions running a tick loop", function=lambda: {(): len(tickers.tickers)}
+)
+metrics.registry.gauge(
+    "dungeon_response_cache_requests_total",
+    "Cached endpoint lookups by result; not_modified counts responses answered with 304",
+    ("cache", "result"), function=_response_cache, kind="counter"
+)
+metrics.registry.gauge(
+    "dungeon_response_cache_entries", "Responses held in the response cache",
+    function=lambda: {(): len(response_cache.entries)}
+)
+metrics.registry.gauge(
+    "dungeon_user_cache_entries", "Users held in the authentication cache",
+    function=lambda: {(): len(user_cache.users)}
+)
+metrics.registry.gauge(
+    "dungeon_user_cache_hits_total", "User cache hits", function=_user_cache("hits"), kind="counter"
+)
+metrics.registry.gauge(
+    "dungeon_user_cache_misses_total", "User cache misses", function=_user_cache("misses"), kind="counter"
+)
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2AuthorizationCodeBearer
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from app.core.config import settings
-import httpx
 from app.models.models import User
+from app.services.google_certs import google_certs
+from app.services.http_client import http_client
+from app.services.user_cache import user_cache
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import secrets
@@ -13,7 +13,7 @@ from fastapi.responses import RedirectResponse
 router = APIRouter()
 oauth2_scheme = OAuth2AuthorizationCodeBearer(
     authorizationUrl="https://accounts.google.com/o/oauth2/v2/auth",
-    tokenUrl="https://oauth2.googleapis.com/token"
+    tokenUrl=settings.GOOGLE_TOKEN_URL
 )
 
 async def create_access_token(data: dict) -> str:
@@ -28,17 +28,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    user_id = user_cache.get_token_subject(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+            user_id = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        user_cache.put_token(token, user_id, payload["exp"])
         
-    user = await User.get(user_id)
+    user = user_cache.get_user(user_id)
     if user is None:
-        raise credentials_exception
+        user = await User.get(user_id)
+        if user is None:
+            raise credentials_exception
+        user_cache.put(user)
     return user
 
 callbackRoute = f"/auth/google/callback"
@@ -52,23 +58,21 @@ async def get_google_auth_url():
 @router.get(callbackRoute)
 async def google_auth_callback(code: str, state: str):
     # Exchange code for token
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "client_id": settings.GOOGLE_CLIENT_ID,
-                "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                "code": code,
-                "grant_type": "authorization_code",
-                "redirect_uri": settings.API_BASE_URL + settings.API_PREFIX + callbackRoute,
-            },
-        )
-        token_data = token_response.json()
+    token_response = await http_client.client.post(
+        settings.GOOGLE_TOKEN_URL,
+        data={
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "code": code,
+            "grant_type": "authorization_code",
+            "redirect_uri": settings.API_BASE_URL + settings.API_PREFIX + callbackRoute,
+        },
+    )
+    token_data = token_response.json()
     
-    # Verify token and get user info
-    idinfo = id_token.verify_oauth2_token(
+    # Verify token and get user info (certs are cached, nothing blocks the loop)
+    idinfo = await google_certs.verify_oauth2_token(
         token_data["id_token"],
-        requests.Request(),
         settings.GOOGLE_CLIENT_ID
     )
     
@@ -91,4 +95,8 @@ async def google_auth_callback(code: str, state: str):
 
 @router.get("/auth/user")
 async def get_user(current_user: User = Depends(get_current_user)):
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.get("/auth/cache/stats")
+async def get_user_cache_stats(current_user: User = Depends(get_current_user)):
+    return user_cache.stats()
@@ -1,93 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
-from datetime import datetime, timedelta
-from app.models.models import User, GameSave
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from pymongo import DESCENDING
+from app.core.config import settings
+from app.models.models import User, GameSave, LeaderboardEntry
 from app.api.v1.endpoints.auth import get_current_user
+from app.services import user_stats
+from app.services.response_cache import LEADERBOARD, response_cache
 
 router = APIRouter()
 
-def calculate_score(save: GameSave) -> int:
-    player_state = save.players.get(str(save.created_by.id))
-    if not player_state:
-        return 0
-        
-    score = 0
-    # Base score from health
-    score += player_state.health
-    # Points for weapons
-    score += len(player_state.weapons) * 50
-    # Points for being alive
-    if player_state.is_alive:
-        score += 100
-    
-    return score
-
 @router.get("/leaderboard/global")
 async def get_global_leaderboard(
-    limit: Optional[int] = 10,
+    request: Request,
+    limit: int = 10,
     timeframe: Optional[str] = "all"  # all, weekly, monthly
-) -> List[dict]:
+) -> Response:
+    # limit=0 would mean no limit to MongoDB
+    limit = max(1, min(limit, settings.LEADERBOARD_MAX_LIMIT))
+    # Polled constantly; served from the response cache between new saves
+    cached, generation = response_cache.lookup(LEADERBOARD, (limit, timeframe), request)
+    if cached is not None:
+        return cached
+    
     query = {}
     
     if timeframe == "weekly":
-        week_ago = datetime.now(datetime.timezone.utc) - timedelta(days=7)
+        week_ago = datetime.now(timezone.utc) - timedelta(days=7)
         query["created_at"] = {"$gte": week_ago}
     elif timeframe == "monthly":
-        month_ago = datetime.now(datetime.timezone.utc) - timedelta(days=30)
+        month_ago = datetime.now(timezone.utc) - timedelta(days=30)
         query["created_at"] = {"$gte": month_ago}
         
-    saves = await GameSave.find(query).to_list()
-    
-    # Calculate scores for each save
-    scored_saves = [
-        {
-            "username": save.created_by.username,
-            "score": calculate_score(save),
-            "save_name": save.name,
-            "created_at": save.created_at
-        }
-        for save in saves
-    ]
-    
-    # Sort by score and limit
-    return sorted(scored_saves, key=lambda x: x["score"], reverse=True)[:limit]
+    # Scores are stored on each save, so this is an indexed top-N read
+    entries = await GameSave.find(query).sort(
+        [("score", DESCENDING), ("created_at", DESCENDING)]
+    ).limit(limit).project(LeaderboardEntry).to_list()
+    
+    return response_cache.store(
+        LEADERBOARD, (limit, timeframe), generation,
+        [entry.model_dump() for entry in entries], request
+    )
 
 @router.get("/leaderboard/user/{user_id}")
 async def get_user_stats(
     user_id: str,
     current_user: User = Depends(get_current_user)
 ) -> dict:
-    saves = await GameSave.find(
-        {"created_by": user_id}
-    ).to_list()
-    
-    if not saves:
-        return {
-            "total_games": 0,
-            "highest_score": 0,
-            "average_score": 0,
-            "recent_scores": []
-        }
-    
-    scores = [calculate_score(save) for save in saves]
-    total_games = len(scores)
-    highest_score = max(scores) if scores else 0
-    average_score = sum(scores) / total_games if scores else 0
-    
-    # Get 5 most recent scores
-    recent_saves = sorted(saves, key=lambda x: x.created_at, reverse=True)[:5]
-    recent_scores = [
-        {
-            "save_name": save.name,
-            "score": calculate_score(save),
-            "created_at": save.created_at
-        }
-        for save in recent_saves
-    ]
-    
-    return {
-        "total_games": total_games,
-        "highest_score": highest_score,
-        "average_score": average_score,
-        "recent_scores": recent_scores
-    }
+    return await user_stats.get_user_stats(user_id)
@@ -1,7 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
-from app.models.models import User, GameSession, GameSave
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING
+from app.core.config import settings
+from app.models.models import User, GameSession, GameSave, PlayerRole, SaveSummary, link_id, user_ref
 from app.api.v1.endpoints.auth import get_current_user
+from app.core.serialization import FastJSONResponse
+from app.services.user_cache import user_cache
+from app.services.event_journal import replay_save
+from app.services.live_sessions import live_sessions
+from app.services.response_cache import LEADERBOARD, LOBBY, response_cache
+from app.services.save_storage import build_save, export_saves, resolve_save
+from app.services.scoring import calculate_score
+from app.services.user_stats import record_save
 
 router = APIRouter()
 
@@ -11,38 +25,85 @@ async def create_save(
     description: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
+    if not current_user.current_session:
+        current_user = await user_cache.reload(str(current_user.id)) or current_user
     if not current_user.current_session:
         raise HTTPException(
             status_code=400,
             detail="User is not in any active session"
         )
     
-    session = await GameSession.get(current_user.current_session)
+    session = await live_sessions.fetch(current_user.current_session)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Create save from current session state
-    save = GameSave(
-        session=session,
-        name=name,
-        description=description,
-        players=session.players.copy(),
-        world_map=session.world_map.copy(),
-        shared_objects=session.shared_objects.copy(),
-        game_state=session.game_state.copy(),
-        created_by=current_user
+    # Create save from current session state; stored as a delta when possible
+    save = await build_save(
+        session,
+        current_user,
+        name,
+        description,
+        score=calculate_score(session.players.get(str(current_user.id))),
+        username=current_user.username
     )
     await save.insert()
+    await record_save(str(current_user.id), save)
+    response_cache.invalidate(LEADERBOARD)
     
-    return save
+    return FastJSONResponse(save)
 
 @router.get("/saves/list")
 async def list_saves(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+) -> FastJSONResponse:
+    query = {"created_by": user_ref(str(current_user.id))}
+    if cursor:
+        try:
+            query["_id"] = {"$lt": PydanticObjectId(cursor)}
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = max(1, min(limit, settings.SAVE_LIST_MAX_LIMIT))
+    
+    # Newest first, summaries only; full saves come from /saves/export
+    saves = await GameSave.find(query).sort(
+        [("_id", DESCENDING)]
+    ).limit(limit + 1).project(SaveSummary).to_list()
+    
+    next_cursor = str(saves[limit - 1].id) if len(saves) > limit else None
+    return FastJSONResponse({
+        "saves": [save.model_dump() for save in saves[:limit]],
+        "next_cursor": next_cursor
+    })
+
+@router.get("/saves/export")
+async def export_user_saves(
+    world_map: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    # Every save of the user, fully resolved, streamed as NDJSON
+    return StreamingResponse(
+        export_saves(str(current_user.id), world_map),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/saves/{save_id}/replay")
+async def replay_from_save(
+    save_id: str,
+    until: Optional[datetime] = None,
+    world_map: bool = False,
     current_user: User = Depends(get_current_user)
-) -> List[GameSave]:
-    return await GameSave.find(
-        {"created_by": current_user.id}
-    ).to_list()
+):
+    save = await GameSave.get(save_id)
+    if not save:
+        raise HTTPException(status_code=404, detail="Save not found")
+    
+    # The save's state with the session's journaled events after it applied
+    state = await replay_save(save, until)
+    if not world_map:
+        del state["world_map"]
+    return FastJSONResponse(state)
 
 @router.post("/saves/{save_id}/load")
 async def load_save(
@@ -53,20 +114,28 @@ async def load_save(
     if not save:
         raise HTTPException(status_code=404, detail="Save not found")
     
+    # Rebuild the full state (base snapshot + delta, shared world map)
+    state = await resolve_save(save)
+    player_state = state["players"].get(link_id(save.created_by))
+    if player_state is None:
+        raise HTTPException(status_code=400, detail="Save has no player state to load")
+    
     # Create new session from save
     session = GameSession(
         name=f"{save.name} (Loaded)",
         host=current_user,
-        players={str(current_user.id): save.players[str(save.created_by.id)]},
-        world_map=save.world_map,
-        shared_objects=save.shared_objects,
-        game_state=save.game_state,
+        players={str(current_user.id): player_state},
+        player_count=1,
+        world_map=state["world_map"],
+        shared_objects=state["shared_objects"],
+        game_state=state["game_state"],
         player_roles={str(current_user.id): PlayerRole.HOST}
     )
     await session.insert()
+    response_cache.invalidate(LOBBY)
     
     # Update user's current session
-    current_user.current_session = str(session.id)
-    await current_user.save()
+    await current_user.set({User.current_session: str(session.id)})
+    user_cache.put(current_user)
     
-    return session
+    return FastJSONResponse(session)
@@ -1,7 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
-from app.models.models import User, GameSession, PlayerRole, PlayerState
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from typing import Optional
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING
+from app.models.models import User, GameSession, PlayerRole, PlayerState, SessionSummary
 from app.api.v1.endpoints.auth import get_current_user
+from app.core.serialization import FastJSONResponse
+from app.db.repositories import session_repository
+from app.services.user_cache import user_cache
+from app.core.config import settings
+from app.services.connections import manager
+from app.services.live_sessions import live_sessions
+from app.services.pubsub import router as session_router
+from app.services.response_cache import LOBBY, response_cache
+from app.services.session_reaper import wake_session
+from app.services.spatial import spaces
 
 router = APIRouter()
 
@@ -11,14 +24,24 @@ async def create_session(
     max_players: int = 4,
     is_private: bool = False,
     password: Optional[str] = None,
+    tick_rate: Optional[int] = None,
     current_user: User = Depends(get_current_user)
 ):
+    if tick_rate is None:
+        tick_rate = settings.DEFAULT_TICK_RATE
+    if tick_rate < 0 or tick_rate > settings.MAX_TICK_RATE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"tick_rate must be between 0 and {settings.MAX_TICK_RATE}"
+        )
+    
     session = GameSession(
         name=name,
         host=current_user,
         max_players=max_players,
         is_private=is_private,
         password=password,
+        tick_rate=tick_rate or None,
         player_roles={str(current_user.id): PlayerRole.HOST},
         players={
             str(current_user.id): PlayerState(
@@ -27,23 +50,60 @@ async def create_session(
                 weapons=[],
                 effects=[]
             )
-        }
+        },
+        player_count=1
     )
     await session.insert()
+    response_cache.invalidate(LOBBY)
     
     # Update user's current session
-    current_user.current_session = str(session.id)
-    await current_user.save()
+    await current_user.set({User.current_session: str(session.id)})
+    user_cache.put(current_user)
     
-    return session
+    return FastJSONResponse(session)
 
 @router.get("/sessions/list")
 async def list_sessions(
+    request: Request,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    joinable: bool = False,
+    current_user: User = Depends(get_current_user)
+) -> Response:
+    limit = max(1, min(limit, settings.SESSION_LIST_MAX_LIMIT))
+    # The page is the same for every user, so the cache is shared
+    cached, generation = response_cache.lookup(LOBBY, (limit, cursor, joinable), request)
+    if cached is not None:
+        return cached
+    
+    query = {"is_active": True}
+    if joinable:
+        query["is_private"] = False
+        query["$expr"] = {"$lt": ["$player_count", "$max_players"]}
+    if cursor:
+        try:
+            query["_id"] = {"$lt": PydanticObjectId(cursor)}
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Newest first; fetch one extra row to know whether there is a next page
+    sessions = await GameSession.find(query).sort(
+        [("_id", DESCENDING)]
+    ).limit(limit + 1).project(SessionSummary).to_list()
+    
+    next_cursor = str(sessions[limit - 1].id) if len(sessions) > limit else None
+    return response_cache.store(LOBBY, (limit, cursor, joinable), generation, {
+        "sessions": [session.model_dump() for session in sessions[:limit]],
+        "next_cursor": next_cursor
+    }, request)
+
+@router.get("/sessions/{session_id}/node")
+async def get_session_node(
+    session_id: str,
     current_user: User = Depends(get_current_user)
-) -> List[GameSession]:
-    return await GameSession.find(
-        {"is_active": True}
-    ).to_list()
+) -> dict:
+    # Node that must serve this session's WebSockets when SESSION_NODES is set
+    return {"node": session_router.owner(session_id), "routed": session_router.enabled}
 
 @router.post("/sessions/{session_id}/join")
 async def join_session(
@@ -51,59 +111,88 @@ async def join_session(
     password: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    session = await GameSession.get(session_id)
+    session = await live_sessions.fetch(session_id)
+    if session and not session.is_active and session.hibernated_at is not None:
+        # Closed by the idle reaper; joining brings it back
+        session = await wake_session(session)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    if len(session.players) >= session.max_players:
-        raise HTTPException(status_code=400, detail="Session is full")
+    if not session.is_active:
+        raise HTTPException(status_code=400, detail="Session is not active")
     
     if session.is_private and session.password != password:
         raise HTTPException(status_code=403, detail="Invalid password")
     
-    # Add player to session
-    session.players[str(current_user.id)] = PlayerState(
-        position={"x": 0, "y": 0},
-        health=100,
-        weapons=[],
-        effects=[]
-    )
-    session.player_roles[str(current_user.id)] = PlayerRole.PLAYER
-    await session.save()
+    user_id = str(current_user.id)
+    if user_id not in session.players:
+        # Add player to session; the capacity check happens atomically in MongoDB
+        state = PlayerState(
+            position={"x": 0, "y": 0},
+            health=100,
+            weapons=[],
+            effects=[]
+        )
+        if not await session_repository.add_player(session_id, user_id, state, PlayerRole.PLAYER):
+            raise HTTPException(status_code=400, detail="Session is full")
+        response_cache.invalidate(LOBBY)
+        
+        live = live_sessions.get(session_id)
+        live_sessions.add_player(session_id, user_id, state, PlayerRole.PLAYER)
+        if not live:
+            session = await GameSession.get(session_id)
+        # Nodes holding a live copy of the session add the player too
+        await manager.announce(session_id, {
+            "type": "player_joined",
+            "user_id": user_id,
+            "role": PlayerRole.PLAYER.value,
+            "player": state.model_dump(mode="json")
+        })
     
     # Update user's current session
-    current_user.current_session = str(session.id)
-    await current_user.save()
+    await current_user.set({User.current_session: str(session.id)})
+    user_cache.put(current_user)
     
-    return session
+    return FastJSONResponse(session)
 
 @router.post("/sessions/{session_id}/leave")
 async def leave_session(
     session_id: str,
     current_user: User = Depends(get_current_user)
 ):
-    session = await GameSession.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Remove player from session
-    if str(current_user.id) in session.players:
-        del session.players[str(current_user.id)]
-        del session.player_roles[str(current_user.id)]
+    user_id = str(current_user.id)
+    remaining = await session_repository.remove_player(session_id, user_id)
+    if remaining is None:
+        if not await GameSession.find({"_id": PydanticObjectId(session_id)}).count():
+            raise HTTPException(status_code=404, detail="Session not found")
+    else:
+        live_sessions.remove_player(session_id, user_id)
+        space = spaces.get(session_id)
+        if space:
+            space.remove_player(user_id)
         
         # If host leaves, assign new host or close session
-        if str(current_user.id) == str(session.host.id):
-            if session.players:
-                new_host_id = next(iter(session.players))
-                session.host = await User.get(new_host_id)
-                session.player_roles[new_host_id] = PlayerRole.HOST
-            else:
-                session.is_active = False
-        
-        await session.save()
+        host_id = None
+        closed = False
+        if str(remaining["host"].id) == user_id:
+            if remaining.get("players"):
+                new_host_id = next(iter(remaining["players"]))
+                if await session_repository.transfer_host(session_id, user_id, new_host_id):
+                    host_id = new_host_id
+                    live_sessions.transfer_host(session_id, host_id)
+            elif await session_repository.close_if_empty(session_id):
+                closed = True
+                live_sessions.deactivate(session_id)
+        response_cache.invalidate(LOBBY)
+        await manager.announce(session_id, {
+            "type": "player_left",
+            "user_id": user_id,
+            "host": host_id,
+            "closed": closed
+        })
     
     # Clear user's current session
-    current_user.current_session = None
-    await current_user.save()
+    await current_user.set({User.current_session: None})
+    user_cache.put(current_user)
     
     return {"message": "Successfully left session"}
@@ -1,128 +1,356 @@
+import asyncio
+import time
 from datetime import datetime, timezone
+from typing import Any, Optional, Set
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
-from typing import Dict
-from app.models.models import User, GameSession, PlayerState
+from fastapi.encoders import jsonable_encoder
+from app.models.models import User, GameSession, PlayerRole, PlayerState
 from app.api.v1.endpoints.auth import get_current_user
+from app.services.connections import manager
+from app.services.event_journal import journal
+from app.services.hit_validation import hit_damage, hit_resolvers, validate_shot
+from app.services.live_sessions import live_sessions
+from app.services.metrics import message_type_label, ws_message_seconds, ws_rate_limited
+from app.services.protocol import negotiate_codec
+from app.services.pubsub import router as session_router
+from app.services.rate_limit import POSITION_UPDATE, MessageLimiter, load_monitor
+from app.services.spatial import SessionSpace, clean_position, spaces
+from app.services.ticker import SessionTicker, tickers
+from app.services.user_cache import user_cache
 
 router = APIRouter()
 
-# Store active connections
-class ConnectionManager:
-    def __init__(self):
-        # session_id -> {user_id -> websocket}
-        self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
-        
-    async def connect(self, websocket: WebSocket, session_id: str, user_id: str):
-        await websocket.accept()
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = {}
-        self.active_connections[session_id][user_id] = websocket
-        
-    def disconnect(self, session_id: str, user_id: str):
-        if session_id in self.active_connections:
-            self.active_connections[session_id].pop(user_id, None)
-            if not self.active_connections[session_id]:
-                del self.active_connections[session_id]
-                
-    async def broadcast_to_session(self, session_id: str, message: dict, exclude_user: str = None):
-        if session_id in self.active_connections:
-            for user_id, connection in self.active_connections[session_id].items():
-                if user_id != exclude_user:
-                    await connection.send_json(message)
+def reveal_players(
+    session_id: str,
+    session: GameSession,
+    user_id: str,
+    entered: Set[str],
+    ticker: Optional[SessionTicker]
+):
+    # Players that just came into view haven't been streamed to this user yet
+    if not entered:
+        return
+    if ticker:
+        ticker.reveal(user_id, entered)
+        return
+    for other_id in entered:
+        other = session.players.get(other_id)
+        if other is not None:
+            manager.send_to_user(session_id, user_id, {
+                "type": "position_update",
+                "user_id": other_id,
+                "position": other.position
+            })
 
-manager = ConnectionManager()
+def apply_damage(session_id: str, session: GameSession, target_id: str, damage: int) -> bool:
+    target = session.players.get(target_id)
+    if target is None:
+        return False
+    target.health -= damage
+    if target.health <= 0:
+        target.is_alive = False
+    ticker = tickers.get(session_id)
+    if ticker:
+        ticker.mark_health(target_id)
+    return True
+
+def apply_remote_position(session_id: str, session: GameSession, user_id: str, position: Any) -> bool:
+    player = session.players.get(user_id)
+    position = clean_position(position)
+    if player is None or position is None:
+        return False
+    player.position = position
+    player.last_updated = datetime.now(timezone.utc)
+    space = spaces.get(session_id)
+    if space:
+        space.move_player(user_id, position)
+    return True
+
+def apply_remote_message(session_id: str, message: dict):
+    # Without sticky routing a session's players are spread over nodes; moves
+    # and hits from the others are applied to this node's live copy so hit
+    # validation and session_state see them. Only the originating node
+    # persists them.
+    session = live_sessions.get(session_id)
+    if session is None:
+        return
+    kind = message.get("type")
+    if kind == "position_update":
+        apply_remote_position(session_id, session, message.get("user_id"), message.get("position"))
+    elif kind == "tick_positions":
+        # Tick-mode moves arrive batched and go out in this node's snapshots
+        ticker = tickers.get(session_id)
+        for user_id, position in message.get("positions", {}).items():
+            if apply_remote_position(session_id, session, user_id, position) and ticker:
+                ticker.mark_position(user_id, local=False)
+    elif kind == "game_action":
+        action = message.get("action")
+        if isinstance(action, dict) and action.get("action") == "shoot" and action.get("target_hit"):
+            apply_damage(session_id, session, action["target_hit"]["user_id"], action["target_hit"]["damage"])
+    elif kind == "player_joined":
+        # Joins and leaves go through whichever node served the REST call
+        state = PlayerState.model_validate(message["player"])
+        live_sessions.add_player(session_id, message["user_id"], state, PlayerRole(message["role"]))
+    elif kind == "player_left":
+        live_sessions.remove_player(session_id, message["user_id"])
+        space = spaces.get(session_id)
+        if space:
+            space.remove_player(message["user_id"])
+        if message.get("host"):
+            live_sessions.transfer_host(session_id, message["host"])
+        if message.get("closed"):
+            live_sessions.deactivate(session_id)
+
+manager.remote_handler = apply_remote_message
+
+def session_state(
+    session_id: str,
+    session: GameSession,
+    user_id: str,
+    space: Optional[SessionSpace],
+    resumed: bool
+) -> dict:
+    # Sent on every connect, after any replayed events: the sequence position
+    # to resume from next time and the current state of the players in view
+    history = manager.histories[session_id]
+    visible = space.players_near(user_id) if space else None
+    state = {
+        "type": "session_state",
+        "epoch": history.epoch,
+        "seq": history.seq,
+        "resumed": resumed,
+        "connected": list(manager.active_connections.get(session_id, {})),
+        "players": {
+            player_id: {"position": player.position, "health": player.health, "is_alive": player.is_alive}
+            for player_id, player in session.players.items()
+            if visible is None or player_id == user_id or player_id in visible
+        }
+    }
+    if not resumed:
+        state["game_state"] = session.game_state
+    return state
 
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     session_id: str,
-    token: str
+    token: str,
+    snapshots: bool = False,
+    resume_from: Optional[int] = None,
+    epoch: Optional[str] = None
 ):
+    if not session_router.is_local(session_id):
+        # Sticky routing: the session's sockets belong on its owner node
+        await websocket.close(code=4009, reason=session_router.owner(session_id))
+        return
+        
     try:
         # Authenticate user
         user = await get_current_user(token)
+        if user and user.current_session != session_id:
+            user = await user_cache.reload(str(user.id))
         if not user or user.current_session != session_id:
             await websocket.close(code=4001)
             return
             
-        session = await GameSession.get(session_id)
-        if not session or not session.is_active:
+        session = await live_sessions.acquire(session_id, str(user.id))
+        if not session:
+            await websocket.close(code=4002)
+            return
+    except Exception as e:
+        await websocket.close(code=4000)
+        return
+        
+    try:
+        if not session.is_active:
             await websocket.close(code=4002)
             return
             
         # Connect to WebSocket
-        await manager.connect(websocket, session_id, str(user.id))
+        codec = negotiate_codec(websocket)
+        connection = await manager.connect(websocket, session_id, str(user.id), snapshots, codec)
+        # No awaits until the state is queued, so nothing broadcast in between is missed or duplicated
+        resumed = resume_from is not None and manager.resume(connection, epoch, resume_from)
+        space = spaces.ensure(session_id, session)
+        ticker = tickers.ensure(session_id, session, space)
+        limiter = MessageLimiter(load_monitor)
+        # Latest position_update over the rate limit, applied once a token frees up
+        held_position = None
+        receiving: Optional[asyncio.Future] = None
         
-        # Notify others that user has connected
-        await manager.broadcast_to_session(
-            session_id,
-            {
-                "type": "user_connected",
-                "user_id": str(user.id),
-                "username": user.username
-            },
-            exclude_user=str(user.id)
-        )
+        async def apply_position(position):
+            # Update player position in the live session; persisted by the flush loop
+            player = session.players.get(str(user.id))
+            if player is None:
+                return
+            player.position = position
+            player.last_updated = datetime.now(timezone.utc)
+            live_sessions.mark_moved(session_id, str(user.id))
+            journal.record(session_id, "move", str(user.id), {"position": position})
+            
+            if space:
+                entered = space.move_player(str(user.id), position)
+                reveal_players(session_id, session, str(user.id), entered, ticker)
+            
+            if ticker:
+                # Sent with the next snapshot
+                ticker.mark_position(str(user.id))
+                return
+            
+            # Broadcast to other players in range
+            await manager.broadcast_to_session(
+                session_id,
+                {
+                    "type": "position_update",
+                    "user_id": str(user.id),
+                    "position": position
+                },
+                exclude_user=str(user.id),
+                recipients=space.players_near(str(user.id)) if space else None
+            )
         
         try:
-            while True:
-                data = await websocket.receive_json()
-                
-                # Handle different message types
-                if data["type"] == "position_update":
-                    # Update player position
-                    session.players[str(user.id)].position = data["position"]
-                    session.players[str(user.id)].last_updated = datetime.now(timezone.utc)
-                    await session.save()
-                    
-                    # Broadcast to other players
-                    await manager.broadcast_to_session(
-                        session_id,
-                        {
-                            "type": "position_update",
-                            "user_id": str(user.id),
-                            "position": data["position"]
-                        },
-                        exclude_user=str(user.id)
-                    )
-                    
-                elif data["type"] == "game_action":
-                    # Handle game actions (shooting, item pickup, etc.)
-                    action_type = data["action"]
-                    if action_type == "shoot":
-                        # Process shooting logic
-                        target_hit = data.get("target_hit")
-                        if target_hit:
-                            target_id = target_hit["user_id"]
-                            damage = target_hit["damage"]
-                            if target_id in session.players:
-                                session.players[target_id].health -= damage
-                                if session.players[target_id].health <= 0:
-                                    session.players[target_id].is_alive = False
-                                await session.save()
-                    
-                    # Broadcast action to other players
-                    await manager.broadcast_to_session(
-                        session_id,
-                        {
-                            "type": "game_action",
-                            "user_id": str(user.id),
-                            "action": data
-                        },
-                        exclude_user=str(user.id)
-                    )
-                    
-        except WebSocketDisconnect:
-            manager.disconnect(session_id, str(user.id))
+            if space and str(user.id) in session.players:
+                entered = space.move_player(str(user.id), session.players[str(user.id)].position)
+                reveal_players(session_id, session, str(user.id), entered, ticker)
+            manager.send_to_user(session_id, str(user.id), session_state(session_id, session, str(user.id), space, resumed))
+            hit_resolver = await hit_resolvers.ensure(session_id, session)
+            
+            journal.record(session_id, "connect", str(user.id))
+            if load_monitor.throttled:
+                manager.send_to_user(session_id, str(user.id), load_monitor.hint())
+            
+            # Notify others that user has connected
             await manager.broadcast_to_session(
                 session_id,
                 {
-                    "type": "user_disconnected",
+                    "type": "user_connected",
                     "user_id": str(user.id),
                     "username": user.username
-                }
+                },
+                exclude_user=str(user.id)
             )
             
-    except Exception as e:
-        await websocket.close(code=4000)
-        return
+            while True:
+                if held_position is not None:
+                    # Wait for the next message, but no longer than until the
+                    # held-back position may be applied
+                    if receiving is None:
+                        receiving = asyncio.ensure_future(codec.receive(websocket))
+                    done, _ = await asyncio.wait((receiving,), timeout=limiter.delay(POSITION_UPDATE))
+                    if not done:
+                        if limiter.allow(POSITION_UPDATE):
+                            position, held_position = held_position, None
+                            await apply_position(position)
+                        continue
+                if receiving is not None:
+                    data, receiving = await receiving, None
+                else:
+                    data = await codec.receive(websocket)
+                
+                started = time.perf_counter()
+                try:
+                    if not limiter.allow(data.get("type")):
+                        ws_rate_limited.inc(message_type_label(data))
+                        if data["type"] == POSITION_UPDATE:
+                            # Coalesced: only the newest position is kept
+                            held_position = clean_position(data.get("position")) or held_position
+                        else:
+                            manager.send_to_user(session_id, str(user.id), {
+                                "type": "rate_limited",
+                                "message_type": data["type"],
+                                "retry_after": limiter.delay(data["type"])
+                            })
+                        continue
+                    
+                    # Handle different message types
+                    if data["type"] == "position_update":
+                        # Stored and persisted as sent, so anything but finite
+                        # numbers is dropped before it can corrupt the session
+                        position = clean_position(data.get("position"))
+                        if position is not None:
+                            # A newer position supersedes one being held back
+                            held_position = None
+                            await apply_position(position)
+                    
+                    elif data["type"] == "game_action":
+                        # Handle game actions (shooting, item pickup, etc.)
+                        action_type = data["action"]
+                        recipients = set(space.players_near(str(user.id))) if space else None
+                        if action_type == "shoot":
+                            # Process shooting logic
+                            target_hit = data.get("target_hit")
+                            if target_hit and hit_resolver:
+                                # Only what the server can confirm is applied and broadcast
+                                target_hit = await validate_shot(hit_resolver, session, str(user.id), target_hit)
+                                data["target_hit"] = target_hit
+                            elif target_hit:
+                                # Unvalidated, but health is still an int
+                                damage = hit_damage(target_hit.get("damage", 0))
+                                target_hit = {"user_id": target_hit.get("user_id"), "damage": damage} if damage else None
+                                data["target_hit"] = target_hit
+                            journal.record(session_id, "shoot", str(user.id), {
+                                "target_id": target_hit["user_id"] if target_hit else None,
+                                "damage": target_hit["damage"] if target_hit else 0
+                            })
+                            if target_hit:
+                                target_id = target_hit["user_id"]
+                                damage = target_hit["damage"]
+                                if apply_damage(session_id, session, target_id, damage):
+                                    live_sessions.mark_damaged(session_id, target_id, damage)
+                                    if recipients is not None:
+                                        recipients.add(target_id)
+                    
+                        # Broadcast action to other players
+                        await manager.broadcast_to_session(
+                            session_id,
+                            {
+                                "type": "game_action",
+                                "user_id": str(user.id),
+                                "action": data
+                            },
+                            exclude_user=str(user.id),
+                            recipients=recipients
+                        )
+                    
+                    elif data["type"] == "world_query":
+                        # World objects around the player, limited to the area of interest
+                        if space:
+                            objects = space.objects_near(str(user.id), data.get("radius"))
+                        else:
+                            objects = list(session.world_map) + list(session.shared_objects)
+                        manager.send_to_user(session_id, str(user.id), {
+                            "type": "world_objects",
+                            "objects": jsonable_encoder(objects)
+                        })
+                finally:
+                    ws_message_seconds.observe(time.perf_counter() - started, message_type_label(data))
+                    
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            await websocket.close(code=4000)
+        finally:
+            if receiving is not None:
+                receiving.cancel()
+            # A socket superseded by the same user's newer one leaves quietly
+            current = manager.disconnect(session_id, str(user.id), connection)
+            if current:
+                journal.record(session_id, "disconnect", str(user.id))
+            if not manager.connection_count(session_id):
+                tickers.discard(session_id)
+                spaces.discard(session_id)
+                hit_resolvers.discard(session_id)
+            if current:
+                await manager.broadcast_to_session(
+                    session_id,
+                    {
+                        "type": "user_disconnected",
+                        "user_id": str(user.id),
+                        "username": user.username
+                    },
+                    exclude_user=str(user.id)
+                )
+    finally:
+        # Last connection out writes the session back to MongoDB
+        await live_sessions.release(session_id)
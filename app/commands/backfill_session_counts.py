@@ -0,0 +1,23 @@
+"""Set player_count on existing sessions from their players map.
+
+    python -m app.commands.backfill_session_counts
+"""
+import asyncio
+from app.db.session import init_db
+from app.models.models import GameSession
+
+async def backfill_session_counts() -> int:
+    # Pipeline update so the whole backfill runs inside MongoDB
+    result = await GameSession.get_motor_collection().update_many(
+        {},
+        [{"$set": {"player_count": {"$size": {"$objectToArray": {"$ifNull": ["$players", {}]}}}}}]
+    )
+    return result.modified_count
+
+async def main():
+    await init_db()
+    count = await backfill_session_counts()
+    print(f"Updated {count} sessions")
+
+if __name__ == "__main__":
+    asyncio.run(main())
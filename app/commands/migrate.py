@@ -0,0 +1,15 @@
+"""Create the MongoDB indexes of every document model.
+
+    python -m app.commands.migrate
+
+Run on deploy when workers start with MONGODB_INDEXES=skip.
+"""
+import asyncio
+from app.db.session import DOCUMENT_MODELS, init_db
+
+async def main():
+    await init_db(create_indexes=True)
+    print(f"Indexes up to date for {len(DOCUMENT_MODELS)} collections")
+
+if __name__ == "__main__":
+    asyncio.run(main())
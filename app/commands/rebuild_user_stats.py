@@ -0,0 +1,22 @@
+"""Rebuild the per-user stats documents from existing saves.
+
+    python -m app.commands.rebuild_user_stats
+"""
+import asyncio
+from app.db.session import init_db
+from app.models.models import GameSave
+from app.services.user_stats import rebuild_user_stats
+
+async def rebuild_all_user_stats() -> int:
+    user_refs = await GameSave.get_motor_collection().distinct("created_by")
+    for ref in user_refs:
+        await rebuild_user_stats(str(ref.id))
+    return len(user_refs)
+
+async def main():
+    await init_db()
+    count = await rebuild_all_user_stats()
+    print(f"Rebuilt stats for {count} users")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""Backfill the materialized leaderboard fields on existing saves.
+
+    python -m app.commands.reindex_leaderboard
+"""
+import asyncio
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from app.db.session import init_db
+from app.models.models import GameSave, User, link_id
+from app.services.scoring import calculate_score
+
+BATCH_SIZE = 500
+
+async def reindex_leaderboard() -> int:
+    usernames: Dict[str, Optional[str]] = {}
+    operations: List[UpdateOne] = []
+    collection = GameSave.get_motor_collection()
+    count = 0
+
+    # Delta saves get their score when created and may not hold the creator's state
+    async for save in GameSave.find({"base_save": None}):
+        user_id = link_id(save.created_by)
+        if user_id not in usernames:
+            user = await User.get(user_id)
+            usernames[user_id] = user.username if user else None
+        operations.append(UpdateOne(
+            {"_id": save.id},
+            {"$set": {
+                "score": calculate_score(save.players.get(user_id)),
+                "username": usernames[user_id]
+            }}
+        ))
+        if len(operations) >= BATCH_SIZE:
+            await collection.bulk_write(operations, ordered=False)
+            count += len(operations)
+            operations = []
+
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        count += len(operations)
+    return count
+
+async def main():
+    await init_db()
+    count = await reindex_leaderboard()
+    print(f"Reindexed {count} saves")
+
+if __name__ == "__main__":
+    asyncio.run(main())
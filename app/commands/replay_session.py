@@ -0,0 +1,53 @@
+"""Replay a session's event journal on top of a save.
+
+    python -m app.commands.replay_session <save_id> [--restore]
+
+Prints the replayed players. With --restore, writes their position, health
+and is_alive back to the game session, e.g. after a node crashed before its
+live state was flushed.
+"""
+import asyncio
+import json
+import sys
+from typing import Any, Dict
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+from app.db.session import init_db
+from app.models.models import GameSave, GameSession, link_id
+from app.services.event_journal import replay_save
+
+async def restore_players(session_id: str, players: Dict[str, Dict[str, Any]]) -> int:
+    operations = [
+        UpdateOne(
+            {"_id": PydanticObjectId(session_id), f"players.{user_id}": {"$exists": True}},
+            {"$set": {
+                f"players.{user_id}.position": player["position"],
+                f"players.{user_id}.health": player["health"],
+                f"players.{user_id}.is_alive": player["is_alive"]
+            }}
+        )
+        for user_id, player in players.items()
+    ]
+    if not operations:
+        return 0
+    result = await GameSession.get_motor_collection().bulk_write(operations, ordered=False)
+    return result.modified_count
+
+async def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    await init_db()
+    save = await GameSave.get(sys.argv[1])
+    if save is None:
+        print(f"Save {sys.argv[1]} not found")
+        sys.exit(1)
+    state = await replay_save(save)
+    print(json.dumps(state["players"], default=str, indent=2))
+    print(f"Applied {state['events_applied']} events, last at {state['last_event_at']}")
+    if "--restore" in sys.argv[2:]:
+        count = await restore_players(link_id(save.session), state["players"])
+        print(f"Restored {count} players")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+"""Run the local stand-in pub/sub broker for PUBSUB_BACKEND=local.
+
+    python -m app.commands.run_broker [host] [port]
+"""
+import asyncio
+import sys
+from app.core.config import settings
+from app.services.pubsub import serve_local_broker
+
+async def main():
+    host = sys.argv[1] if len(sys.argv) > 1 else "127.0.0.1"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else settings.LOCAL_BROKER_PORT
+    server = await serve_local_broker(host, port)
+    print(f"Broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,12 +3,109 @@ import os
 
 class Settings(BaseSettings):
     MONGODB_URL: str = os.getenv("MONGODB_URL", "")
+    # Motor connection pool (max idle 0 = no limit)
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    MONGODB_MAX_IDLE_TIME_SECONDS: float = float(os.getenv("MONGODB_MAX_IDLE_TIME_SECONDS", "0"))
+    MONGODB_SERVER_SELECTION_TIMEOUT_SECONDS: float = float(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_SECONDS", "30"))
+    # When workers build indexes: "startup" (before serving), "background" (after startup) or "skip"
+    # (left to `python -m app.commands.migrate`)
+    MONGODB_INDEXES: str = os.getenv("MONGODB_INDEXES", "startup")
+    # How long /ready waits for MongoDB to answer a ping
+    READY_DB_TIMEOUT_SECONDS: float = float(os.getenv("READY_DB_TIMEOUT_SECONDS", "2"))
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
     GOOGLE_CLIENT_ID: str = os.getenv("GOOGLE_CLIENT_ID", "")
     GOOGLE_CLIENT_SECRET: str = os.getenv("GOOGLE_CLIENT_SECRET", "")
+    # Overridable so a local stand-in can replace Google in tests
+    GOOGLE_TOKEN_URL: str = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+    GOOGLE_CERTS_URL: str = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
     API_BASE_URL: str = os.getenv("API_BASE_URL", "")
     API_PREFIX: str = os.getenv("API_PREFIX", "/api/v1")
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "11520"))  # 8 days
+    # How often dirty in-memory game sessions are written back to MongoDB (0 disables the periodic flush)
+    SESSION_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "5"))
+    # Outbound WebSocket buffering: clients that fill their queue or stall a send are disconnected
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "5"))
+    # Resumable connections: recent session events kept per session for reconnecting clients (0 disables), and how
+    # long a session with no sockets keeps them and its in-memory state before a reconnect has to start over
+    WS_RESUME_BUFFER_SIZE: int = int(os.getenv("WS_RESUME_BUFFER_SIZE", "256"))
+    WS_RESUME_WINDOW_SECONDS: float = float(os.getenv("WS_RESUME_WINDOW_SECONDS", "30"))
+    # Idle session reaper: active sessions with no sockets and no update for the timeout (0 disables) are
+    # hibernated (world map moved to world_maps) or, with SESSION_IDLE_ACTION=deactivate, only deactivated, and
+    # their players' current_session is cleared. Joining a reaped session wakes it. Runs (and heartbeats this
+    # node's live sessions) every interval, which must stay well below the timeout.
+    SESSION_IDLE_TIMEOUT_SECONDS: float = float(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "1800"))
+    SESSION_REAPER_INTERVAL_SECONDS: float = float(os.getenv("SESSION_REAPER_INTERVAL_SECONDS", "60"))
+    SESSION_REAPER_BATCH_SIZE: int = int(os.getenv("SESSION_REAPER_BATCH_SIZE", "100"))
+    SESSION_IDLE_ACTION: str = os.getenv("SESSION_IDLE_ACTION", "hibernate")
+    # Tick rate (Hz) for new sessions that don't pick one; 0 keeps per-message broadcasts
+    DEFAULT_TICK_RATE: int = int(os.getenv("DEFAULT_TICK_RATE", "0"))
+    MAX_TICK_RATE: int = int(os.getenv("MAX_TICK_RATE", "60"))
+    # Inbound WebSocket limits per connection and message type: sustained messages/s and burst (rate 0 = no limit).
+    # Position updates over the limit are coalesced (latest wins), other messages are rejected.
+    WS_POSITION_RATE: float = float(os.getenv("WS_POSITION_RATE", "30"))
+    WS_POSITION_BURST: int = int(os.getenv("WS_POSITION_BURST", "10"))
+    WS_ACTION_RATE: float = float(os.getenv("WS_ACTION_RATE", "10"))
+    WS_ACTION_BURST: int = int(os.getenv("WS_ACTION_BURST", "10"))
+    WS_QUERY_RATE: float = float(os.getenv("WS_QUERY_RATE", "2"))
+    WS_QUERY_BURST: int = int(os.getenv("WS_QUERY_BURST", "5"))
+    # Adaptive position rate: every interval (0 disables) the event-loop lag and the deepest send queue are
+    # sampled; above the high marks the rate hinted to clients (and enforced) halves, below the low marks it recovers
+    LOAD_MONITOR_INTERVAL_SECONDS: float = float(os.getenv("LOAD_MONITOR_INTERVAL_SECONDS", "0.5"))
+    LOAD_LAG_HIGH_SECONDS: float = float(os.getenv("LOAD_LAG_HIGH_SECONDS", "0.05"))
+    LOAD_LAG_LOW_SECONDS: float = float(os.getenv("LOAD_LAG_LOW_SECONDS", "0.01"))
+    LOAD_QUEUE_HIGH: int = int(os.getenv("LOAD_QUEUE_HIGH", "64"))
+    LOAD_QUEUE_LOW: int = int(os.getenv("LOAD_QUEUE_LOW", "8"))
+    WS_MIN_POSITION_RATE: float = float(os.getenv("WS_MIN_POSITION_RATE", "5"))
+    # Area-of-interest radius in world units for player broadcasts and world queries (0 disables)
+    AOI_RADIUS: float = float(os.getenv("AOI_RADIUS", "0"))
+    # Spatial index cell size; defaults to AOI_RADIUS when 0
+    SPATIAL_CELL_SIZE: float = float(os.getenv("SPATIAL_CELL_SIZE", "0"))
+    # "materialized" reads the per-user stats document; "aggregate" computes stats from saves in MongoDB
+    USER_STATS_SOURCE: str = os.getenv("USER_STATS_SOURCE", "materialized")
+    # Authenticated-user cache used by get_current_user (size 0 disables it)
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    # Shared outbound HTTP client
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    # Page size cap for /sessions/list
+    SESSION_LIST_MAX_LIMIT: int = int(os.getenv("SESSION_LIST_MAX_LIMIT", "100"))
+    # Most entries /leaderboard/global will return
+    LEADERBOARD_MAX_LIMIT: int = int(os.getenv("LEADERBOARD_MAX_LIMIT", "100"))
+    # Rendered /leaderboard/global and /sessions/list responses: entries kept and seconds each is served (0 disables)
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "2"))
+    # Saves: a full snapshot every N saves per user and session, deltas in between (1 = always full)
+    SAVE_SNAPSHOT_INTERVAL: int = int(os.getenv("SAVE_SNAPSHOT_INTERVAL", "10"))
+    # Decompressed world maps kept in memory, keyed by content hash
+    WORLD_MAP_CACHE_SIZE: int = int(os.getenv("WORLD_MAP_CACHE_SIZE", "32"))
+    # Page size cap for /saves/list and documents per chunk of /saves/export
+    SAVE_LIST_MAX_LIMIT: int = int(os.getenv("SAVE_LIST_MAX_LIMIT", "100"))
+    SAVE_EXPORT_BATCH_SIZE: int = int(os.getenv("SAVE_EXPORT_BATCH_SIZE", "100"))
+    # Cross-node broadcast fan-out: "memory" (single process), "redis" or "local" (app.commands.run_broker)
+    PUBSUB_BACKEND: str = os.getenv("PUBSUB_BACKEND", "memory")
+    PUBSUB_URL: str = os.getenv("PUBSUB_URL", "")
+    PUBSUB_CHANNEL_PREFIX: str = os.getenv("PUBSUB_CHANNEL_PREFIX", "dungeon:")
+    LOCAL_BROKER_PORT: int = int(os.getenv("LOCAL_BROKER_PORT", "7400"))
+    # This node's id (random per process when empty) and, to pin each session to one node, the ids of all nodes
+    NODE_ID: str = os.getenv("NODE_ID", "")
+    SESSION_NODES: str = os.getenv("SESSION_NODES", "")
+    # Server-side shot validation: line of sight against world_map walls, range (0 = unlimited) and damage cap
+    HIT_VALIDATION: bool = os.getenv("HIT_VALIDATION", "true").lower() == "true"
+    HIT_MAX_RANGE: float = float(os.getenv("HIT_MAX_RANGE", "0"))
+    HIT_MAX_DAMAGE: float = float(os.getenv("HIT_MAX_DAMAGE", "100"))
+    # Shots are checked in batches collected over this window (0 = one event loop pass)
+    HIT_BATCH_WINDOW_SECONDS: float = float(os.getenv("HIT_BATCH_WINDOW_SECONDS", "0"))
+    # Side length of box walls without width/height properties
+    WALL_SIZE: float = float(os.getenv("WALL_SIZE", "1"))
+    # Session event journal: batch size (0 disables), max time an event waits, and buffer cap
+    EVENT_JOURNAL_BATCH_SIZE: int = int(os.getenv("EVENT_JOURNAL_BATCH_SIZE", "500"))
+    EVENT_JOURNAL_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("EVENT_JOURNAL_FLUSH_INTERVAL_SECONDS", "1"))
+    EVENT_JOURNAL_MAX_BUFFER: int = int(os.getenv("EVENT_JOURNAL_MAX_BUFFER", "100000"))
+    # Prometheus metrics on /metrics, HTTP/WebSocket/MongoDB timings
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 settings = Settings()
@@ -0,0 +1,51 @@
+import json
+from typing import Any
+from beanie import Link
+from bson import DBRef, ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.models.models import LivePlayer, WorldObjectColumns
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the standard library encoder
+    orjson = None
+
+# JSON for REST responses and exports without fastapi.encoders.jsonable_encoder,
+# which walks every value of a large document in Python. Pydantic models are
+# dumped by pydantic-core (same output as FastAPI's default), everything else
+# by orjson; this hook covers the types neither knows.
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Link):
+        return {"id": str(value.ref.id), "collection": value.ref.collection}
+    if isinstance(value, DBRef):
+        return {"id": str(value.id), "collection": value.collection}
+    if isinstance(value, LivePlayer):
+        return value.to_model().model_dump(mode="json")
+    if isinstance(value, WorldObjectColumns):
+        return [obj.model_dump(mode="json") for obj in value]
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if orjson is None and hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if isinstance(content, BaseModel):
+        # Straight to bytes in one pass
+        return content.model_dump_json(by_alias=True).encode()
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+class FastJSONResponse(JSONResponse):
+    # App-wide default response class. FastAPI still runs jsonable_encoder on
+    # plain return values, so handlers with large payloads return this
+    # directly: FastJSONResponse(document)
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,179 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from beanie import PydanticObjectId
+from beanie.odm.utils.encoder import Encoder
+from pymongo import ReturnDocument, UpdateOne
+from app.models.models import LIVE_BSON_ENCODERS, GameSession, PlayerRole, PlayerState, utc_now, user_ref
+
+def to_bson(value: Any) -> Any:
+    return Encoder(to_db=True, custom_encoders=LIVE_BSON_ENCODERS).encode(value)
+
+# Targeted, atomic writes to game_sessions. Each method touches only the
+# fields it owns, so concurrent writers (joins, leaves, the live-session
+# flush) never overwrite each other the way whole-document save() does.
+class GameSessionRepository:
+    @property
+    def collection(self):
+        return GameSession.get_motor_collection()
+
+    def _position_ops(
+        self,
+        session_id: PydanticObjectId,
+        user_id: str,
+        position: Dict[str, float],
+        updated_at: datetime
+    ) -> List[UpdateOne]:
+        return [UpdateOne(
+            {"_id": session_id, f"players.{user_id}": {"$exists": True}},
+            {"$set": {
+                f"players.{user_id}.position": position,
+                f"players.{user_id}.last_updated": updated_at
+            }}
+        )]
+
+    def _damage_ops(self, session_id: PydanticObjectId, user_id: str, damage: float) -> List[UpdateOne]:
+        return [
+            UpdateOne(
+                {"_id": session_id, f"players.{user_id}": {"$exists": True}},
+                {"$inc": {f"players.{user_id}.health": -damage}}
+            ),
+            UpdateOne(
+                {"_id": session_id, f"players.{user_id}.health": {"$lte": 0}},
+                {"$set": {f"players.{user_id}.is_alive": False}}
+            )
+        ]
+
+    async def apply_player_changes(
+        self,
+        session_id: str,
+        positions: Dict[str, Tuple[Dict[str, float], datetime]],
+        damage: Dict[str, float]
+    ):
+        # positions: user_id -> (position, last_updated); damage: user_id -> total damage taken
+        oid = PydanticObjectId(session_id)
+        operations: List[UpdateOne] = []
+        for user_id, (position, updated_at) in positions.items():
+            operations += self._position_ops(oid, user_id, position, updated_at)
+        for user_id, amount in damage.items():
+            operations += self._damage_ops(oid, user_id, amount)
+        if not operations:
+            return
+        operations.append(UpdateOne({"_id": oid}, {"$set": {"last_updated": utc_now()}}))
+        await self.collection.bulk_write(operations, ordered=True)
+
+    async def set_player_position(self, session_id: str, user_id: str, position: Dict[str, float]):
+        await self.apply_player_changes(session_id, {user_id: (position, utc_now())}, {})
+
+    async def apply_damage(self, session_id: str, user_id: str, damage: float):
+        await self.apply_player_changes(session_id, {}, {user_id: damage})
+
+    async def add_player(self, session_id: str, user_id: str, state: PlayerState, role: PlayerRole) -> bool:
+        # Only succeeds while the session is active, has room and doesn't
+        # already contain the player
+        result = await self.collection.update_one(
+            {
+                "_id": PydanticObjectId(session_id),
+                "is_active": True,
+                f"players.{user_id}": {"$exists": False},
+                "$expr": {"$lt": ["$player_count", "$max_players"]}
+            },
+            {
+                "$set": {
+                    f"players.{user_id}": to_bson(state),
+                    f"player_roles.{user_id}": role.value,
+                    "last_updated": utc_now()
+                },
+                "$inc": {"player_count": 1}
+            }
+        )
+        return result.modified_count == 1
+
+    async def remove_player(self, session_id: str, user_id: str) -> Optional[dict]:
+        # Returns the session's remaining players and host, or None if the
+        # player wasn't in it
+        return await self.collection.find_one_and_update(
+            {"_id": PydanticObjectId(session_id), f"players.{user_id}": {"$exists": True}},
+            {
+                "$unset": {f"players.{user_id}": "", f"player_roles.{user_id}": ""},
+                "$inc": {"player_count": -1},
+                "$set": {"last_updated": utc_now()}
+            },
+            projection={"players": 1, "host": 1, "player_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def transfer_host(self, session_id: str, old_host_id: str, new_host_id: str) -> bool:
+        result = await self.collection.update_one(
+            {
+                "_id": PydanticObjectId(session_id),
+                "host": user_ref(old_host_id),
+                f"players.{new_host_id}": {"$exists": True}
+            },
+            {"$set": {
+                "host": user_ref(new_host_id),
+                f"player_roles.{new_host_id}": PlayerRole.HOST.value
+            }}
+        )
+        return result.modified_count == 1
+
+    async def close_if_empty(self, session_id: str) -> bool:
+        result = await self.collection.update_one(
+            {"_id": PydanticObjectId(session_id), "player_count": {"$lte": 0}},
+            {"$set": {"is_active": False, "last_updated": utc_now()}}
+        )
+        return result.modified_count == 1
+
+    async def roster(self, session_id: str) -> Optional[dict]:
+        # Who is in the session, without the world map
+        return await self.collection.find_one(
+            {"_id": PydanticObjectId(session_id)},
+            projection={"players": 1, "player_roles": 1, "host": 1, "is_active": 1}
+        )
+
+    async def touch(self, session_ids: List[str]):
+        # Heartbeat for sessions with sockets on this node, so no node's
+        # reaper takes them for idle while players stand still
+        if session_ids:
+            await self.collection.update_many(
+                {"_id": {"$in": [PydanticObjectId(session_id) for session_id in session_ids]}},
+                {"$set": {"last_updated": utc_now()}}
+            )
+
+    async def find_idle(self, cutoff: datetime, exclude: List[str], limit: int, world_map: bool) -> List[dict]:
+        return await self.collection.find(
+            {
+                "is_active": True,
+                "last_updated": {"$lt": cutoff},
+                "_id": {"$nin": [PydanticObjectId(session_id) for session_id in exclude]}
+            },
+            projection={"world_map": 1} if world_map else {"_id": 1}
+        ).sort("last_updated", 1).limit(limit).to_list(None)
+
+    async def deactivate_idle(
+        self,
+        session_id: PydanticObjectId,
+        cutoff: datetime,
+        world_map_hash: Optional[str] = None
+    ) -> bool:
+        # Fails if the session saw activity since it was found idle. With a
+        # world_map_hash the map is dropped from the document (hibernation).
+        update: Dict[str, Any] = {"is_active": False, "hibernated_at": utc_now()}
+        if world_map_hash is not None:
+            update.update({"world_map": [], "world_map_hash": world_map_hash})
+        result = await self.collection.update_one(
+            {"_id": session_id, "is_active": True, "last_updated": {"$lt": cutoff}},
+            {"$set": update}
+        )
+        return result.modified_count == 1
+
+    async def wake(self, session_id: str, world_map: Optional[List[dict]]) -> bool:
+        update: Dict[str, Any] = {"is_active": True, "hibernated_at": None, "world_map_hash": None, "last_updated": utc_now()}
+        if world_map is not None:
+            update["world_map"] = world_map
+        result = await self.collection.update_one(
+            {"_id": PydanticObjectId(session_id), "is_active": False, "hibernated_at": {"$ne": None}},
+            {"$set": update}
+        )
+        return result.modified_count == 1
+
+session_repository = GameSessionRepository()
@@ -1,18 +1,74 @@
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
+from beanie.odm.utils.init import Initializer
 from app.core.config import settings
-from app.models.models import User, GameSession, GameSave
+from app.models.models import User, GameSession, GameSave, GameEvent, UserStats, WorldMapBlob
+from app.services.metrics import mongo_metrics
 
-async def init_db():
+# MONGODB_URL=mongomock:// runs against an in-memory stand-in (benchmarks, local
+# experiments); it needs the optional mongomock-motor package
+IN_MEMORY_URL_SCHEME = "mongomock://"
+
+INDEX_MODES = ("startup", "background", "skip")
+
+DOCUMENT_MODELS = [
+    User,
+    GameSession,
+    GameSave,
+    GameEvent,
+    UserStats,
+    WorldMapBlob
+]
+
+def create_client():
+    if settings.MONGODB_URL.startswith(IN_MEMORY_URL_SCHEME):
+        from mongomock_motor import AsyncMongoMockClient
+        return AsyncMongoMockClient()
+    listeners = [mongo_metrics] if settings.METRICS_ENABLED else []
+    return AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        event_listeners=listeners,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=int(settings.MONGODB_MAX_IDLE_TIME_SECONDS * 1000) or None,
+        serverSelectionTimeoutMS=int(settings.MONGODB_SERVER_SELECTION_TIMEOUT_SECONDS * 1000)
+    )
+
+class _Initializer(Initializer):
+    # init_beanie, optionally without the index builds (listing and creating
+    # indexes is several round trips per model). init_beanie has no such flag
+    # in beanie 1.21, so this and create_indexes lean on Initializer internals
+    # (init_indexes, document_models, inited_classes): pinned to beanie==1.21.0,
+    # re-check on upgrade.
+    def __init__(self, *args, create_indexes: bool = True, **kwargs):
+        self.create_indexes = create_indexes
+        super().__init__(*args, **kwargs)
+
+    async def init_indexes(self, cls, allow_index_dropping: bool = False):
+        if self.create_indexes:
+            await super().init_indexes(cls, allow_index_dropping)
+
+async def init_db(client=None, create_indexes: Optional[bool] = None):
+    if settings.MONGODB_INDEXES not in INDEX_MODES:
+        raise ValueError(f"Unknown MONGODB_INDEXES {settings.MONGODB_INDEXES!r}")
     # Create Motor client
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    
+    if client is None:
+        client = create_client()
+    if create_indexes is None:
+        create_indexes = settings.MONGODB_INDEXES == "startup"
+
     # Initialize beanie with the MongoDB client and document models
-    await init_beanie(
+    await _Initializer(
         database=client.dungeon_api,  # Specify the database name explicitly
-        document_models=[
-            User,
-            GameSession,
-            GameSave
-        ]
+        document_models=DOCUMENT_MODELS,
+        create_indexes=create_indexes
     )
+    return client
+
+async def create_indexes(client):
+    # Indexes of every document model, for a database initialised without them.
+    # Uses Initializer internals; see _Initializer.
+    initializer = _Initializer(database=client.dungeon_api, document_models=DOCUMENT_MODELS)
+    initializer.inited_classes = list(initializer.document_models)
+    for model in initializer.document_models:
+        await initializer.init_indexes(model)
@@ -2,19 +2,46 @@ import ssl
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.serialization import FastJSONResponse
 from app.api.v1.api import api_router
+from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
 from app.db.session import init_db
+from app.services.connections import manager
+from app.services.event_journal import journal
+from app.services.http_client import http_client
+from app.services.live_sessions import live_sessions
+from app.services.metrics import HttpMetricsMiddleware
+from app.services.rate_limit import load_monitor
+from app.services.readiness import readiness
+from app.services.session_reaper import session_reaper
+from app.services.ticker import tickers
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await init_db()
+    client = await init_db()
+    await http_client.start()
+    await manager.start()
+    live_sessions.start()
+    journal.start()
+    load_monitor.start()
+    session_reaper.start()
+    readiness.start(client)
     yield
     # Shutdown
-    # Add any cleanup code here if needed
+    readiness.stop()
+    session_reaper.stop()
+    load_monitor.stop()
+    tickers.stop_all()
+    await live_sessions.stop()
+    await journal.stop()
+    await manager.close()
+    await http_client.close()
+    client.close()
 
-app = FastAPI(title="Dungeon API", lifespan=lifespan)
+app = FastAPI(title="Dungeon API", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +52,11 @@ app.add_middleware(
 )
 
 app.include_router(api_router, prefix=settings.API_PREFIX)
+app.include_router(health_router)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(HttpMetricsMiddleware)
+    app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,7 +1,11 @@
+from array import array
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
-from beanie import Document, Link
-from pydantic import ConfigDict, EmailStr, Field
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
+from beanie import Document, Link, PydanticObjectId
+from beanie.odm.utils.encoder import Encoder
+from bson import DBRef
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_serializer
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from enum import Enum
 
 def utc_now():
@@ -12,21 +16,172 @@ class PlayerRole(str, Enum):
     PLAYER = "player"
     SPECTATOR = "spectator"
 
-class PlayerState:
+class PlayerState(BaseModel):
     position: Dict[str, float]  # {x: float, y: float}
     health: int = 100
-    weapons: List[Dict[str, Any]] = []  # [{type: str, ammo: int}]
-    effects: List[str] = []
+    weapons: List[Dict[str, Any]] = Field(default_factory=list)  # [{type: str, ammo: int}]
+    effects: List[str] = Field(default_factory=list)
     is_alive: bool = True
     last_updated: datetime = Field(default_factory=utc_now)
 
-class WorldObject:
+class WorldObject(BaseModel):
     type: str  # wall, enemy, bonus, etc
     x: float
     y: float
     properties: Optional[Dict[str, Any]] = None
     owner_id: Optional[str] = None  # For objects that belong to specific players
 
+# Compact stand-ins that live sessions swap in for the models above (see
+# live_sessions.compact_session). They hold exactly the same values, convert
+# back with to_model()/to_models(), and are dumped and BSON-encoded as the
+# models they replace.
+
+class LivePlayer:
+    # PlayerState without a per-instance __dict__. A position of exactly
+    # {x, y} is kept as two floats; anything else is kept as given.
+    # weapons/effects are tuples: assign a new one rather than mutating.
+    __slots__ = ("x", "y", "_position", "health", "weapons", "effects", "is_alive", "last_updated")
+
+    def __init__(
+        self,
+        position: Any,
+        health: int = 100,
+        weapons: Tuple[Dict[str, Any], ...] = (),
+        effects: Tuple[str, ...] = (),
+        is_alive: bool = True,
+        last_updated: Optional[datetime] = None
+    ):
+        self.position = position
+        self.health = health
+        self.weapons = tuple(weapons)
+        self.effects = tuple(effects)
+        self.is_alive = is_alive
+        self.last_updated = last_updated or utc_now()
+
+    @property
+    def position(self) -> Any:
+        if self._position is not None:
+            return self._position
+        return {"x": self.x, "y": self.y}
+
+    @position.setter
+    def position(self, position: Any):
+        if type(position) is dict and len(position) == 2 and "x" in position and "y" in position:
+            self.x, self.y = position["x"], position["y"]
+            self._position = None
+        else:
+            self.x = self.y = None
+            self._position = position
+
+    @classmethod
+    def from_model(cls, state: PlayerState) -> "LivePlayer":
+        return cls(state.position, state.health, state.weapons, state.effects, state.is_alive, state.last_updated)
+
+    def to_model(self) -> PlayerState:
+        return PlayerState.model_construct(
+            position=self.position,
+            health=self.health,
+            weapons=list(self.weapons),
+            effects=list(self.effects),
+            is_alive=self.is_alive,
+            last_updated=self.last_updated
+        )
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        # (field, value) pairs, like a BaseModel
+        return iter(self.to_model())
+
+class WorldObjectColumns:
+    # A list of WorldObjects stored column-wise: x and y as packed doubles,
+    # type as an index into type_names, and properties/owner_id only for the
+    # rows that have them. Indexing and iteration build WorldObjects on demand.
+    __slots__ = ("x", "y", "types", "type_names", "properties", "owners")
+
+    def __init__(self):
+        self.x = array("d")
+        self.y = array("d")
+        self.types = array("H")
+        self.type_names: List[str] = []
+        # row -> value, for rows where it isn't None
+        self.properties: Dict[int, Dict[str, Any]] = {}
+        self.owners: Dict[int, str] = {}
+
+    @classmethod
+    def from_models(cls, objects: Iterable[WorldObject]) -> "WorldObjectColumns":
+        columns = cls()
+        for obj in objects:
+            columns.append(obj)
+        return columns
+
+    def _code(self, name: str) -> int:
+        try:
+            return self.type_names.index(name)
+        except ValueError:
+            self.type_names.append(name)
+            return len(self.type_names) - 1
+
+    def append(self, obj: WorldObject):
+        row = len(self.x)
+        self.x.append(obj.x)
+        self.y.append(obj.y)
+        self.types.append(self._code(obj.type))
+        if obj.properties is not None:
+            self.properties[row] = obj.properties
+        if obj.owner_id is not None:
+            self.owners[row] = obj.owner_id
+
+    def type_code(self, name: str) -> Optional[int]:
+        return self.type_names.index(name) if name in self.type_names else None
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, row: int) -> WorldObject:
+        if row < 0:
+            row += len(self.x)
+        return WorldObject.model_construct(
+            type=self.type_names[self.types[row]],
+            x=self.x[row],
+            y=self.y[row],
+            properties=self.properties.get(row),
+            owner_id=self.owners.get(row)
+        )
+
+    def __iter__(self) -> Iterator[WorldObject]:
+        for row in range(len(self.x)):
+            yield self[row]
+
+    def __add__(self, other: "WorldObjectColumns") -> "WorldObjectColumns":
+        combined = WorldObjectColumns()
+        for columns in (self, other):
+            offset = len(combined.x)
+            codes = [combined._code(name) for name in columns.type_names]
+            combined.x.extend(columns.x)
+            combined.y.extend(columns.y)
+            combined.types.extend(codes[code] for code in columns.types)
+            combined.properties.update((offset + row, value) for row, value in columns.properties.items())
+            combined.owners.update((offset + row, value) for row, value in columns.owners.items())
+        return combined
+
+    def to_models(self) -> List[WorldObject]:
+        return list(self)
+
+def persisted(value: Any) -> Any:
+    # The models behind live stand-ins, in a players dict or object list
+    if isinstance(value, WorldObjectColumns):
+        return value.to_models()
+    if isinstance(value, dict):
+        return {
+            key: item.to_model() if isinstance(item, LivePlayer) else item
+            for key, item in value.items()
+        }
+    return value
+
+LIVE_BSON_ENCODERS = {
+    LivePlayer: lambda player: Encoder(to_db=True).encode(player.to_model()),
+    WorldObjectColumns: lambda columns: Encoder(to_db=True).encode(columns.to_models())
+}
+
 class User(Document):
     email: EmailStr
     google_id: str
@@ -43,12 +198,21 @@ class User(Document):
             "current_session"
         ]
 
+def user_ref(user_id: str) -> DBRef:
+    # How Link[User] fields are stored; match on this to query by user
+    return DBRef(User.Settings.name, PydanticObjectId(user_id))
+
+def link_id(link: Any) -> str:
+    # Id of a Link field whether or not it has been fetched
+    return str(link.ref.id) if isinstance(link, Link) else str(link.id)
+
 class GameSession(Document):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
     name: str
     host: Link[User]
     players: Dict[str, PlayerState] = {}  # user_id: PlayerState
+    player_count: int = 0  # len(players), stored for lobby queries
     max_players: int = 4
     is_private: bool = False
     password: Optional[str] = None
@@ -56,34 +220,123 @@ class GameSession(Document):
     shared_objects: List[WorldObject] = []  # Objects visible/interactive for all players
     game_state: Dict[str, Any] = {}  # Shared game state (scores, objectives, etc)
     player_roles: Dict[str, PlayerRole] = {}  # user_id: role
+    tick_rate: Optional[int] = None  # Hz; None broadcasts every update immediately
     created_at: datetime = Field(default_factory=utc_now)
     last_updated: datetime = Field(default_factory=utc_now)
     is_active: bool = True
+    # Set while hibernated by the idle reaper: world_map is moved to this WorldMapBlob
+    hibernated_at: Optional[datetime] = None
+    world_map_hash: Optional[str] = None
+
+    @field_serializer("players", "world_map", "shared_objects", mode="wrap")
+    def _dump_live_state(self, value: Any, handler):
+        return handler(persisted(value))
 
     class Settings:
         name = "game_sessions"
+        bson_encoders = LIVE_BSON_ENCODERS
         indexes = [
             "host",
             "is_active",
-            "name"
+            "name",
+            # Lobby browsing: newest first, optionally only public sessions
+            IndexModel([("is_active", ASCENDING), ("_id", DESCENDING)]),
+            IndexModel([("is_active", ASCENDING), ("is_private", ASCENDING), ("_id", DESCENDING)]),
+            # Idle session reaper
+            IndexModel([("is_active", ASCENDING), ("last_updated", ASCENDING)])
         ]
 
+class SessionSummary(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    player_count: int = 0
+    max_players: int
+    is_private: bool
+
 class GameSave(Document):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
     session: Link[GameSession]
     name: str
     description: Optional[str] = None
-    players: Dict[str, PlayerState]
-    world_map: List[WorldObject]
-    shared_objects: List[WorldObject]
-    game_state: Dict[str, Any]
+    # Full saves hold the whole state. Delta saves set base_save and only
+    # hold players that changed since it (plus removed_players); None for
+    # shared_objects/game_state means unchanged from the base.
+    players: Dict[str, PlayerState] = {}
+    removed_players: List[str] = []
+    world_map: List[WorldObject] = []  # inline only on saves made before world_map_hash
+    world_map_hash: Optional[str] = None  # WorldMapBlob id
+    shared_objects: Optional[List[WorldObject]] = None
+    game_state: Optional[Dict[str, Any]] = None
+    base_save: Optional[PydanticObjectId] = None
     created_by: Link[User]
     created_at: datetime = Field(default_factory=utc_now)
+    # Leaderboard fields, materialized when the save is created
+    score: int = 0
+    username: Optional[str] = None
 
     class Settings:
         name = "game_saves"
         indexes = [
             "session",
-            "created_by"
+            "created_by",
+            "base_save",
+            IndexModel([("session", ASCENDING), ("created_by", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("created_by", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("created_by", ASCENDING), ("_id", DESCENDING)]),
+            IndexModel([("score", DESCENDING), ("created_at", DESCENDING)])
+        ]
+
+class SaveSummary(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    description: Optional[str] = None
+    score: int = 0
+    created_at: datetime
+    base_save: Optional[PydanticObjectId] = None  # set on delta saves
+
+class LeaderboardEntry(BaseModel):
+    username: Optional[str] = None
+    score: int
+    save_name: str = Field(alias="name")
+    created_at: datetime
+
+class UserStats(Document):
+    # Running per-user aggregates, updated atomically on every new save
+    user_id: str
+    total_games: int = 0
+    total_score: int = 0
+    highest_score: int = 0
+    recent_scores: List[Dict[str, Any]] = []  # newest first: [{save_name, score, created_at}]
+
+    class Settings:
+        name = "user_stats"
+        indexes = [
+            IndexModel([("user_id", ASCENDING)], unique=True)
         ]
+
+class GameEvent(Document):
+    # Append-only journal of what happened in a session, written in batches
+    # by the event journal
+    session_id: str
+    type: str  # connect, disconnect, move, shoot
+    user_id: str
+    data: Dict[str, Any] = {}
+    created_at: datetime = Field(default_factory=utc_now)
+
+    class Settings:
+        name = "game_events"
+        indexes = [
+            IndexModel([("session_id", ASCENDING), ("created_at", ASCENDING)])
+        ]
+
+class WorldMapBlob(Document):
+    # Content-addressed world map: id is the SHA-256 of the BSON-encoded
+    # objects, data is that BSON zlib-compressed. Stored once per distinct map.
+    id: str
+    data: bytes
+    object_count: int
+    created_at: datetime = Field(default_factory=utc_now)
+
+    class Settings:
+        name = "world_maps"
@@ -0,0 +1,382 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Callable, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+from fastapi import WebSocket
+from app.core.config import settings
+from app.services.metrics import broadcast_recipients, broadcast_seconds, ws_send_seconds, ws_slow_disconnects
+from app.services.protocol import Frame, json_codec
+from app.services.pubsub import InProcessBroker, SessionRouter, create_broker, node_id, router, session_channel
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to clients that can't keep up with the session
+SLOW_CONSUMER_CLOSE_CODE = 4008
+INTERNAL_ERROR_CLOSE_CODE = 1011
+
+# State rather than events: not sequenced or kept for resume, a reconnecting
+# client gets the players' current state instead
+UNSEQUENCED = {"position_update", "snapshot"}
+
+class OutboundMessage:
+    __slots__ = ("frame", "key")
+
+    def __init__(self, frame: Frame, key: Optional[Tuple[str, str]] = None):
+        self.frame = frame
+        # Messages sharing a key supersede each other while still queued
+        self.key = key
+
+class Connection:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        user_id: str,
+        wants_snapshots: bool = False,
+        codec=json_codec
+    ):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.user_id = user_id
+        self.codec = codec
+        # Tick-mode sessions send per-tick snapshots to clients that opted in
+        # and plain per-user events to everyone else
+        self.wants_snapshots = wants_snapshots
+        self.queue: Deque[OutboundMessage] = deque()
+        self.pending: Dict[Tuple[str, str], OutboundMessage] = {}
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: OutboundMessage):
+        if self.closed:
+            return
+        if message.key is not None:
+            queued = self.pending.get(message.key)
+            if queued is not None:
+                # Client is behind: overwrite the stale update in place
+                queued.frame = message.frame
+                return
+        if len(self.queue) >= settings.WS_SEND_QUEUE_SIZE:
+            logger.info(
+                "Disconnecting slow client %s from session %s",
+                self.user_id, self.session_id
+            )
+            ws_slow_disconnects.inc()
+            self._close_soon(SLOW_CONSUMER_CLOSE_CODE)
+            return
+        self.queue.append(message)
+        if message.key is not None:
+            self.pending[message.key] = message
+        self._wakeup.set()
+
+    async def _write_loop(self):
+        while True:
+            if not self.queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            message = self.queue.popleft()
+            if message.key is not None:
+                self.pending.pop(message.key, None)
+            try:
+                payload = message.frame.encode(self.codec)
+                started = time.perf_counter()
+                await asyncio.wait_for(
+                    self.codec.send(self.websocket, payload),
+                    timeout=settings.WS_SEND_TIMEOUT_SECONDS
+                )
+                ws_send_seconds.observe(time.perf_counter() - started, self.codec.name)
+            except asyncio.TimeoutError:
+                ws_slow_disconnects.inc()
+                await self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return
+            except Exception:
+                # Socket is gone or the frame couldn't be sent; close it so the
+                # client reconnects instead of silently receiving nothing
+                await self.close(INTERNAL_ERROR_CLOSE_CODE)
+                return
+
+    def stop(self):
+        self.closed = True
+        self.queue.clear()
+        self.pending.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def _close_soon(self, code: int):
+        # Closed from here on, so later enqueues are dropped; the socket
+        # itself is closed by a single task
+        self.stop()
+        self._closing = asyncio.create_task(self._close_socket(code))
+
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.stop()
+        await self._close_socket(code)
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+class HistoryEntry:
+    __slots__ = ("seq", "frame", "exclude_user", "recipients")
+
+    def __init__(self, seq: int, frame: Frame, exclude_user: Optional[str], recipients: Optional[FrozenSet[str]]):
+        self.seq = seq
+        self.frame = frame
+        self.exclude_user = exclude_user
+        self.recipients = recipients
+
+# Sequence numbers and a ring buffer of a session's recent events on this node,
+# so a client that reconnects with the last seq it saw gets only what it
+# missed. A new epoch (this node restarted or forgot the session) means the
+# client's seq no longer applies.
+class SessionHistory:
+    def __init__(self, size: int):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.entries: Deque[HistoryEntry] = deque(maxlen=size)
+        # When the session's last socket on this node closed
+        self.idle_since: Optional[float] = None
+
+    def record(self, message: dict, exclude_user: Optional[str], recipients: Optional[Set[str]]) -> Frame:
+        self.seq += 1
+        frame = Frame({**message, "seq": self.seq})
+        self.entries.append(HistoryEntry(
+            self.seq, frame, exclude_user, frozenset(recipients) if recipients is not None else None
+        ))
+        return frame
+
+    def since(self, seq: int) -> Optional[List[HistoryEntry]]:
+        # Entries after seq, or None if some of them are no longer kept
+        if seq == self.seq:
+            return []
+        if seq > self.seq or not self.entries or self.entries[0].seq > seq + 1:
+            return None
+        return list(itertools.islice(self.entries, seq + 1 - self.entries[0].seq, None))
+
+# Store active connections. Broadcasts go to this node's sockets directly and,
+# with a distributed broker, to the other nodes through the session's channel.
+class ConnectionManager:
+    def __init__(
+        self,
+        broker: Optional[InProcessBroker] = None,
+        session_router: Optional[SessionRouter] = None,
+        node: str = node_id
+    ):
+        # session_id -> {user_id -> Connection}
+        self.active_connections: Dict[str, Dict[str, Connection]] = {}
+        # session_id -> SessionHistory, kept WS_RESUME_WINDOW_SECONDS after the last socket closes
+        self.histories: Dict[str, SessionHistory] = {}
+        self.broker = broker or InProcessBroker()
+        self.router = session_router or router
+        self.node_id = node
+        # Called with (session_id, message) for broadcasts from other nodes, so
+        # this node's copy of the session can apply what changed there
+        self.remote_handler: Optional[Callable[[str, dict], None]] = None
+
+    async def start(self):
+        await self.broker.start(self._receive)
+
+    async def close(self):
+        await self.broker.close()
+
+    @property
+    def fans_out(self) -> bool:
+        # With routing every socket of a session is on its owner node
+        return self.broker.distributed and not self.router.enabled
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        user_id: str,
+        wants_snapshots: bool = False,
+        codec=json_codec
+    ) -> Connection:
+        await websocket.accept(subprotocol=codec.subprotocol)
+        if session_id not in self.active_connections:
+            self.active_connections[session_id] = {}
+            self.broker.subscribe(session_channel(session_id))
+            self._prune_histories()
+            history = self.histories.get(session_id)
+            if history is None:
+                history = self.histories[session_id] = SessionHistory(settings.WS_RESUME_BUFFER_SIZE)
+            history.idle_since = None
+        previous = self.active_connections[session_id].get(user_id)
+        if previous is not None:
+            # Same user opened a second socket; the newest one wins
+            await previous.close()
+        connection = Connection(websocket, session_id, user_id, wants_snapshots, codec)
+        connection.start()
+        self.active_connections[session_id][user_id] = connection
+        return connection
+
+    def disconnect(self, session_id: str, user_id: str, connection: Optional[Connection] = None) -> bool:
+        # False when the connection was no longer the user's current one
+        if connection is not None:
+            connection.stop()
+        connections = self.active_connections.get(session_id)
+        if not connections:
+            return False
+        current = connections.get(user_id)
+        # A newer socket for the same user may already have replaced this one
+        if current is None or (connection is not None and current is not connection):
+            return False
+        del connections[user_id]
+        current.stop()
+        if not connections:
+            del self.active_connections[session_id]
+            self.broker.unsubscribe(session_channel(session_id))
+            history = self.histories.get(session_id)
+            if history is not None:
+                history.idle_since = time.monotonic()
+        return True
+
+    def _prune_histories(self):
+        now = time.monotonic()
+        for session_id, history in list(self.histories.items()):
+            if history.idle_since is not None and now - history.idle_since >= settings.WS_RESUME_WINDOW_SECONDS:
+                del self.histories[session_id]
+
+    def resume(self, connection: Connection, epoch: Optional[str], seq: int) -> bool:
+        # Queue the events the client missed since seq; False if they can't
+        # all be replayed and the client needs a full state instead
+        history = self.histories.get(connection.session_id)
+        if history is None or epoch != history.epoch:
+            return False
+        entries = history.since(seq)
+        if entries is None:
+            return False
+        missed = [
+            entry for entry in entries
+            if entry.exclude_user != connection.user_id
+            and (entry.recipients is None or connection.user_id in entry.recipients)
+        ]
+        # A gap that would fill most of the send queue is cheaper as a snapshot
+        if len(missed) > settings.WS_SEND_QUEUE_SIZE // 2:
+            return False
+        for entry in missed:
+            connection.enqueue(OutboundMessage(entry.frame))
+        return True
+
+    def connection_count(self, session_id: str) -> int:
+        return len(self.active_connections.get(session_id, {}))
+
+    def send_to_user(self, session_id: str, user_id: str, message: dict):
+        connection = self.active_connections.get(session_id, {}).get(user_id)
+        if connection is not None:
+            connection.enqueue(OutboundMessage(Frame(message)))
+
+    def send_to_all(self, message: dict, key: Optional[Tuple[str, str]] = None):
+        # Every socket on this node, sharing one frame
+        frame = Frame(message)
+        for connections in self.active_connections.values():
+            for connection in connections.values():
+                connection.enqueue(OutboundMessage(frame, key))
+
+    async def broadcast_to_session(
+        self,
+        session_id: str,
+        message: dict,
+        exclude_user: str = None,
+        recipients: Optional[Set[str]] = None
+    ):
+        # recipients limits delivery to those users (e.g. an area of interest)
+        started = time.perf_counter()
+        frame = self._frame(session_id, message, exclude_user, recipients)
+        self._deliver(session_id, frame, exclude_user, recipients)
+        if self.fans_out:
+            # Other nodes don't share this node's area-of-interest index, so
+            # they get the message unfiltered
+            self._publish(session_id, frame, exclude_user)
+        broadcast_seconds.observe(time.perf_counter() - started)
+
+    async def announce(self, session_id: str, message: dict):
+        # Membership changes made through the REST API. The node handling the
+        # request needn't own the session even with routing, so they go to
+        # the broker whenever there is one.
+        frame = self._frame(session_id, message, None, None)
+        self._deliver(session_id, frame, None, None)
+        if self.broker.distributed:
+            self._publish(session_id, frame, None)
+
+    def publish_state(self, session_id: str, message: dict):
+        # For other nodes' live copies only: their sockets get the change
+        # through those nodes' own tick snapshots
+        if self.fans_out:
+            self._publish(session_id, Frame(message), None, deliver=False)
+
+    def _publish(self, session_id: str, frame: Frame, exclude_user: Optional[str], deliver: bool = True):
+        # The envelope reuses the frame's JSON encoding
+        header = {"node": self.node_id, "exclude_user": exclude_user}
+        if not deliver:
+            header["deliver"] = False
+        header = json.dumps(header, separators=(",", ":"))
+        envelope = f'{header[:-1]},"message":{frame.encode(json_codec)}}}'
+        self.broker.publish(session_channel(session_id), envelope.encode())
+
+    def _receive(self, channel: str, data: bytes):
+        envelope = json.loads(data)
+        if envelope["node"] == self.node_id:
+            return
+        session_id = channel[len(session_channel("")):]
+        if self.remote_handler is not None:
+            self.remote_handler(session_id, envelope["message"])
+        if not envelope.get("deliver", True):
+            return
+        # Resequenced: every node numbers the session's events for its own sockets
+        frame = self._frame(session_id, envelope["message"], envelope["exclude_user"], None)
+        self._deliver(session_id, frame, envelope["exclude_user"], None)
+
+    def _frame(
+        self,
+        session_id: str,
+        message: dict,
+        exclude_user: Optional[str],
+        recipients: Optional[Set[str]]
+    ) -> Frame:
+        history = self.histories.get(session_id)
+        if history is None or message.get("type") in UNSEQUENCED:
+            return Frame(message)
+        return history.record(message, exclude_user, recipients)
+
+    def _deliver(
+        self,
+        session_id: str,
+        frame: Frame,
+        exclude_user: Optional[str],
+        recipients: Optional[Set[str]]
+    ):
+        connections = self.active_connections.get(session_id)
+        if not connections:
+            return
+        # Hand one shared frame to every connection's writer task, so a slow
+        # socket never holds up the sender or the other players. The frame is
+        # encoded at most once per wire format, not once per recipient.
+        key = None
+        if frame.message.get("type") == "position_update":
+            key = ("position_update", frame.message["user_id"])
+        queued = 0
+        for user_id, connection in connections.items():
+            if user_id == exclude_user:
+                continue
+            if recipients is not None and user_id not in recipients:
+                continue
+            connection.enqueue(OutboundMessage(frame, key))
+            queued += 1
+        broadcast_recipients.inc(amount=queued)
+
+manager = ConnectionManager(create_broker())
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.models.models import GameEvent, GameSave, link_id, utc_now
+from app.services.metrics import journal_events_dropped
+from app.services.save_storage import canonical, resolve_save
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Append-only per-session event log. record() only appends to an in-memory
+# buffer; batches go to MongoDB with insert_many when EVENT_JOURNAL_BATCH_SIZE
+# events are waiting or every EVENT_JOURNAL_FLUSH_INTERVAL_SECONDS, whichever
+# comes first. Events still buffered when the process dies are lost.
+# Events are ordered by created_at, then _id within a node.
+class EventJournal:
+    def __init__(self, batch_size: int, flush_interval: float, max_buffer: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffer: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_flush: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.batch_size > 0
+
+    def record(self, session_id: str, event_type: str, user_id: str, data: Optional[Dict[str, Any]] = None):
+        if not self.enabled:
+            return
+        if len(self.buffer) >= self.max_buffer:
+            # MongoDB is down or too slow; never let the journal grow without bound
+            journal_events_dropped.inc()
+            return
+        self.buffer.append({
+            "session_id": session_id,
+            "type": event_type,
+            "user_id": user_id,
+            "data": data or {},
+            "created_at": utc_now()
+        })
+        if len(self.buffer) >= self.batch_size and (self._batch_flush is None or self._batch_flush.done()):
+            self._batch_flush = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            while self.buffer:
+                batch = self.buffer[:self.batch_size]
+                del self.buffer[:self.batch_size]
+                try:
+                    # Unordered: every event that can be stored is. Replay
+                    # orders by created_at and _id, not insertion order.
+                    await GameEvent.get_motor_collection().insert_many(batch, ordered=False)
+                except BulkWriteError as e:
+                    # insert_many set each event's _id, so a retried event that
+                    # was already stored fails with a duplicate key; drop those
+                    failed = [
+                        batch[error["index"]] for error in e.details.get("writeErrors", [])
+                        if error.get("code") != DUPLICATE_KEY_ERROR
+                    ]
+                    if not failed:
+                        continue
+                    logger.error("Failed to write %d journal events: %s", len(failed), e.details.get("writeErrors"))
+                    self.buffer[:0] = failed[:max(0, self.max_buffer - len(self.buffer))]
+                    return
+                except Exception:
+                    logger.exception("Failed to write %d journal events", len(batch))
+                    # Keep them for the next attempt, oldest first
+                    self.buffer[:0] = batch[:max(0, self.max_buffer - len(self.buffer))]
+                    return
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self.enabled and self.flush_interval > 0 and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+journal = EventJournal(
+    settings.EVENT_JOURNAL_BATCH_SIZE,
+    settings.EVENT_JOURNAL_FLUSH_INTERVAL_SECONDS,
+    settings.EVENT_JOURNAL_MAX_BUFFER
+)
+
+def apply_event(players: Dict[str, dict], event: dict):
+    # Same effect the WebSocket handler had on the live session
+    data = event.get("data") or {}
+    if event["type"] == "move":
+        player = players.get(event["user_id"])
+        if player is not None:
+            player["position"] = data["position"]
+            player["last_updated"] = event["created_at"]
+    elif event["type"] == "shoot":
+        target = players.get(data.get("target_id"))
+        if target is not None:
+            target["health"] -= data["damage"]
+            if target["health"] <= 0:
+                target["is_alive"] = False
+
+async def replay_save(save: GameSave, until: Optional[datetime] = None) -> Dict[str, Any]:
+    # State of the save's session at `until` (default: the last journaled
+    # event): the save's state with every later event applied
+    state = await resolve_save(save)
+    players = canonical(state["players"])
+    query: Dict[str, Any] = {
+        "session_id": link_id(save.session),
+        "created_at": {"$gt": save.created_at}
+    }
+    if until is not None:
+        query["created_at"]["$lte"] = until
+    applied = 0
+    last_event_at = None
+    cursor = GameEvent.get_motor_collection().find(query).sort([("created_at", 1), ("_id", 1)])
+    async for event in cursor:
+        apply_event(players, event)
+        applied += 1
+        last_event_at = event["created_at"]
+    state["players"] = players
+    state["events_applied"] = applied
+    state["last_event_at"] = last_event_at
+    return state
@@ -0,0 +1,55 @@
+import asyncio
+import re
+import time
+from typing import Dict, Optional
+from app.core.config import settings
+from app.services.http_client import http_client
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+DEFAULT_MAX_AGE = 3600
+
+_max_age = re.compile(r"max-age=(\d+)")
+
+def cache_max_age(cache_control: Optional[str]) -> int:
+    match = _max_age.search(cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+# Google's ID-token signing certificates, fetched asynchronously over the
+# shared client and kept for as long as the response's Cache-Control allows.
+class GoogleCertificates:
+    def __init__(self, url: str):
+        self.url = url
+        self.certs: Optional[Dict[str, str]] = None
+        self.expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, force_refresh: bool = False) -> Dict[str, str]:
+        if not force_refresh and self.certs is not None and time.monotonic() < self.expires_at:
+            return self.certs
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if not force_refresh and self.certs is not None and time.monotonic() < self.expires_at:
+                return self.certs
+            response = await http_client.client.get(self.url)
+            response.raise_for_status()
+            self.certs = response.json()
+            self.expires_at = time.monotonic() + cache_max_age(response.headers.get("cache-control"))
+            return self.certs
+
+    async def verify_oauth2_token(self, token: str, audience: str) -> dict:
+        # Imported on first use: google.auth pulls in cryptography, which
+        # slows down every worker start for the rare login request
+        from google.auth import exceptions, jwt as google_jwt
+        certs = await self.get()
+        try:
+            idinfo = google_jwt.decode(token, certs=certs, audience=audience)
+        except ValueError as e:
+            # Keys rotate ahead of the cache expiring; retry once with fresh certs
+            if "Certificate for key id" not in str(e):
+                raise
+            idinfo = google_jwt.decode(token, certs=await self.get(force_refresh=True), audience=audience)
+        if idinfo["iss"] not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError("Wrong issuer")
+        return idinfo
+
+google_certs = GoogleCertificates(settings.GOOGLE_CERTS_URL)
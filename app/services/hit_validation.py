@@ -0,0 +1,300 @@
+import asyncio
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.models.models import GameSession, WorldObject, WorldObjectColumns
+from app.services.spatial import position_xy
+
+# Server-side validation of shots. Walls from the session's world_map are
+# turned into NumPy arrays once when the session loads; line of sight for
+# every shot submitted in the same batch window is then tested in a few
+# vectorized passes against the walls near it (found through a uniform grid)
+# instead of a Python loop per wall.
+#
+# A wall is a segment when its properties have x2/y2, otherwise an
+# axis-aligned box centred on (x, y) of properties width/height (WALL_SIZE
+# by default).
+
+# Shots resolved per vectorized pass, to cap temporary memory
+SHOT_CHUNK = 1024
+
+Point = Tuple[float, float]
+
+def _expand(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # For counts [2, 3]: owners [0, 0, 1, 1, 1] and offsets [0, 1, 0, 1, 2]
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, offsets
+
+class WallGrid:
+    # Uniform grid over wall bounding boxes in CSR form: the walls of cell c
+    # are walls[starts[c]:starts[c + 1]]. A wall is listed in every cell its
+    # bounding box touches. Cells are sized for a few walls each.
+    def __init__(self, bounds: np.ndarray):
+        self.bounds = bounds
+        if not len(bounds):
+            self.origin = np.zeros(2)
+            self.cell_size = 1.0
+            self.shape = np.ones(2, dtype=np.int64)
+            self.walls = np.zeros(0, dtype=np.int64)
+            self.starts = np.zeros(2, dtype=np.int64)
+            return
+        self.origin = bounds[:, :2].min(axis=0)
+        extent = np.maximum(bounds[:, 2:].max(axis=0) - self.origin, 1e-9)
+        self.cell_size = max(float(np.sqrt(extent[0] * extent[1] * 4 / len(bounds))), float(extent.max()) / 4096)
+        low, high = self._cells(bounds[:, :2]), self._cells(bounds[:, 2:])
+        self.shape = high.max(axis=0) + 1
+        walls, cells = self._cover(low, high)
+        order = np.argsort(cells, kind="stable")
+        self.walls = walls[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _cover(self, low: np.ndarray, high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # (owner, cell id) for every cell in each low..high cell rectangle
+        width = high[:, 0] - low[:, 0] + 1
+        counts = width * (high[:, 1] - low[:, 1] + 1)
+        owners, offsets = _expand(counts)
+        x = low[owners, 0] + offsets % width[owners]
+        y = low[owners, 1] + offsets // width[owners]
+        return owners, x * self.shape[1] + y
+
+    def candidates(self, low: np.ndarray, high: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # (shot, wall) pairs whose bounding boxes overlap; short shots on a
+        # large map only reach the exact test for a handful of walls
+        limit = self.shape - 1
+        shots, cells = self._cover(
+            np.clip(self._cells(low), 0, limit),
+            np.clip(self._cells(high), 0, limit)
+        )
+        counts = self.starts[cells + 1] - self.starts[cells]
+        pairs, offsets = _expand(counts)
+        shots = shots[pairs]
+        walls = self.walls[self.starts[cells[pairs]] + offsets]
+        bounds = self.bounds[walls]
+        overlap = (
+            (bounds[:, 0] <= high[shots, 0]) & (bounds[:, 2] >= low[shots, 0])
+            & (bounds[:, 1] <= high[shots, 1]) & (bounds[:, 3] >= low[shots, 1])
+        )
+        return shots[overlap], walls[overlap]
+
+class WallIndex:
+    def __init__(self, objects: Iterable[WorldObject]):
+        segments: List[Tuple[float, float, float, float]] = []
+        boxes: List[Tuple[float, float, float, float]] = []
+        plain = np.zeros((0, 2))
+        if isinstance(objects, WorldObjectColumns):
+            # Walls without properties straight from the columns; only the
+            # rest are built as objects
+            code = objects.type_code("wall")
+            rows = np.zeros(0, dtype=np.int64)
+            if code is not None:
+                rows = np.flatnonzero(np.frombuffer(objects.types, dtype=np.uint16) == code)
+            has_properties = np.isin(rows, np.fromiter(objects.properties, dtype=np.int64))
+            xy = np.column_stack((np.frombuffer(objects.x), np.frombuffer(objects.y)))
+            plain = xy[rows[~has_properties]]
+            objects = [objects[row] for row in rows[has_properties].tolist()]
+        for obj in objects:
+            if obj.type != "wall":
+                continue
+            properties = obj.properties or {}
+            x, y = float(obj.x), float(obj.y)
+            if "x2" in properties and "y2" in properties:
+                segments.append((x, y, float(properties["x2"]), float(properties["y2"])))
+            else:
+                half_width = float(properties.get("width", settings.WALL_SIZE)) / 2
+                half_height = float(properties.get("height", settings.WALL_SIZE)) / 2
+                boxes.append((x - half_width, y - half_height, x + half_width, y + half_height))
+        # Columns: x1, y1, x2, y2
+        self.segments = np.array(segments, dtype=np.float64).reshape(-1, 4)
+        # Columns: min x, min y, max x, max y
+        half = settings.WALL_SIZE / 2
+        self.boxes = np.concatenate((
+            np.hstack((plain - half, plain + half)),
+            np.array(boxes, dtype=np.float64).reshape(-1, 4)
+        ))
+        self.box_grid = WallGrid(self.boxes)
+        self.segment_grid = WallGrid(np.column_stack((
+            np.minimum(self.segments[:, 0], self.segments[:, 2]),
+            np.minimum(self.segments[:, 1], self.segments[:, 3]),
+            np.maximum(self.segments[:, 0], self.segments[:, 2]),
+            np.maximum(self.segments[:, 1], self.segments[:, 3]),
+        )))
+
+    def __len__(self) -> int:
+        return len(self.segments) + len(self.boxes)
+
+    def blocked(self, origins: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        # origins, targets: (shots, 2). True where a wall crosses the line
+        # strictly between origin and target.
+        result = np.zeros(len(origins), dtype=bool)
+        for start in range(0, len(origins), SHOT_CHUNK):
+            stop = start + SHOT_CHUNK
+            chunk_origins, chunk_targets = origins[start:stop], targets[start:stop]
+            if len(self.boxes):
+                result[start:stop] |= self._box_hits(chunk_origins, chunk_targets)
+            if len(self.segments):
+                result[start:stop] |= self._segment_hits(chunk_origins, chunk_targets)
+        return result
+
+    def _box_hits(self, origins: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        shots, walls = self.box_grid.candidates(np.minimum(origins, targets), np.maximum(origins, targets))
+        origin = origins[shots]
+        delta = targets[shots] - origin
+        box = self.boxes[walls]
+        # Slab test with the line parametrised as origin + t * delta, t in [0, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse = 1.0 / delta
+            tx1 = (box[:, 0] - origin[:, 0]) * inverse[:, 0]
+            tx2 = (box[:, 2] - origin[:, 0]) * inverse[:, 0]
+            ty1 = (box[:, 1] - origin[:, 1]) * inverse[:, 1]
+            ty2 = (box[:, 3] - origin[:, 1]) * inverse[:, 1]
+            t_enter = np.fmax(np.fmin(tx1, tx2), np.fmin(ty1, ty2))
+            t_exit = np.fmin(np.fmax(tx1, tx2), np.fmax(ty1, ty2))
+        # A box the shooter stands in doesn't block its own shots
+        hits = (t_exit >= t_enter) & (t_enter > 0) & (t_enter < 1)
+        result = np.zeros(len(origins), dtype=bool)
+        result[shots[hits]] = True
+        return result
+
+    def _segment_hits(self, origins: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        shots, walls = self.segment_grid.candidates(np.minimum(origins, targets), np.maximum(origins, targets))
+        origin = origins[shots]
+        ray = targets[shots] - origin
+        segment = self.segments[walls]
+        edge = segment[:, 2:] - segment[:, :2]
+        offset = segment[:, :2] - origin
+        denominator = ray[:, 0] * edge[:, 1] - ray[:, 1] * edge[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (offset[:, 0] * edge[:, 1] - offset[:, 1] * edge[:, 0]) / denominator
+            u = (offset[:, 0] * ray[:, 1] - offset[:, 1] * ray[:, 0]) / denominator
+        # Parallel and collinear walls (denominator 0) never block
+        hits = (denominator != 0) & (t > 0) & (t < 1) & (u >= 0) & (u <= 1)
+        result = np.zeros(len(origins), dtype=bool)
+        result[shots[hits]] = True
+        return result
+
+class HitResolver:
+    # Collects line-of-sight checks and answers them in one vectorized batch
+    # per HIT_BATCH_WINDOW_SECONDS (0: every shot queued in the same event
+    # loop pass)
+    def __init__(self, walls: WallIndex, window: float):
+        self.walls = walls
+        self.window = window
+        self.pending: List[Tuple[Point, Point, asyncio.Future]] = []
+        self._scheduled = False
+
+    def line_of_sight(self, origin: Point, target: Point) -> "asyncio.Future[bool]":
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not len(self.walls):
+            future.set_result(True)
+            return future
+        self.pending.append((origin, target, future))
+        if not self._scheduled:
+            self._scheduled = True
+            if self.window > 0:
+                loop.call_later(self.window, self.resolve)
+            else:
+                loop.call_soon(self.resolve)
+        return future
+
+    def resolve(self):
+        batch, self.pending = self.pending, []
+        self._scheduled = False
+        if not batch:
+            return
+        origins = np.array([origin for origin, _, _ in batch], dtype=np.float64)
+        targets = np.array([target for _, target, _ in batch], dtype=np.float64)
+        blocked = self.walls.blocked(origins, targets)
+        for (_, _, future), is_blocked in zip(batch, blocked):
+            if not future.done():
+                future.set_result(not bool(is_blocked))
+
+def hit_damage(value: Any) -> Optional[int]:
+    # Health is an int, so client damage (binary frames carry float32) is
+    # rounded; None if it isn't a positive number
+    try:
+        damage = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(damage):
+        return None
+    damage = round(damage)
+    return damage if damage > 0 else None
+
+async def validate_shot(
+    resolver: HitResolver,
+    session: GameSession,
+    shooter_id: str,
+    target_hit: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    # The hit to apply, with damage clamped, or None if the shot can't have
+    # hit: the shooter itself, unknown or dead players, out of range, or a
+    # wall in between. Positions come from the server's PlayerState, not
+    # from the client.
+    if target_hit.get("user_id") == shooter_id:
+        return None
+    shooter = session.players.get(shooter_id)
+    target = session.players.get(target_hit.get("user_id"))
+    if shooter is None or target is None or not shooter.is_alive or not target.is_alive:
+        return None
+    origin = position_xy(shooter.position)
+    destination = position_xy(target.position)
+    if origin is None or destination is None:
+        return None
+    if settings.HIT_MAX_RANGE > 0 and math.dist(origin, destination) > settings.HIT_MAX_RANGE:
+        return None
+    damage = hit_damage(target_hit.get("damage", 0))
+    if damage is None:
+        return None
+    if not await resolver.line_of_sight(origin, destination):
+        return None
+    return {"user_id": target_hit["user_id"], "damage": min(damage, int(settings.HIT_MAX_DAMAGE))}
+
+class HitResolverRegistry:
+    def __init__(self):
+        # session_id -> HitResolver
+        self.resolvers: Dict[str, HitResolver] = {}
+        self._building: Dict[str, "asyncio.Future[WallIndex]"] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.HIT_VALIDATION
+
+    def get(self, session_id: str) -> Optional[HitResolver]:
+        return self.resolvers.get(session_id)
+
+    async def ensure(self, session_id: str, session: GameSession) -> Optional[HitResolver]:
+        if not self.enabled:
+            return None
+        resolver = self.resolvers.get(session_id)
+        if resolver is not None:
+            return resolver
+        # A large map's wall index takes hundreds of milliseconds to build, so
+        # it's built off the event loop, once for concurrent connects
+        building = self._building.get(session_id)
+        if building is None:
+            building = asyncio.get_running_loop().run_in_executor(None, WallIndex, session.world_map)
+            self._building[session_id] = building
+        try:
+            walls = await building
+        finally:
+            if self._building.get(session_id) is building:
+                del self._building[session_id]
+        resolver = self.resolvers.get(session_id)
+        if resolver is None:
+            resolver = HitResolver(walls, settings.HIT_BATCH_WINDOW_SECONDS)
+            self.resolvers[session_id] = resolver
+        return resolver
+
+    def discard(self, session_id: str):
+        resolver = self.resolvers.pop(session_id, None)
+        if resolver is not None:
+            # Answer anything still queued rather than leaving handlers waiting
+            resolver.resolve()
+
+hit_resolvers = HitResolverRegistry()
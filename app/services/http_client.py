@@ -0,0 +1,30 @@
+from typing import Optional
+import httpx
+from app.core.config import settings
+
+# One pooled AsyncClient for all outbound HTTP, opened and closed by the app lifespan
+class HttpClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS
+                )
+            )
+        return self._client
+
+    async def start(self):
+        self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+http_client = HttpClient()
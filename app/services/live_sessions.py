@@ -0,0 +1,227 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+from beanie import Link
+from app.core.config import settings
+from app.db.repositories import session_repository
+from app.models.models import GameSession, LivePlayer, PlayerRole, PlayerState, User, WorldObjectColumns, link_id, user_ref
+
+logger = logging.getLogger(__name__)
+
+def compact_session(session: GameSession) -> GameSession:
+    # Swap the session's players and world objects for their compact live
+    # forms; the document still dumps and encodes exactly as before
+    session.players = {
+        user_id: state if isinstance(state, LivePlayer) else LivePlayer.from_model(state)
+        for user_id, state in session.players.items()
+    }
+    for field in ("world_map", "shared_objects"):
+        objects = getattr(session, field)
+        if not isinstance(objects, WorldObjectColumns):
+            setattr(session, field, WorldObjectColumns.from_models(objects))
+    return session
+
+class LiveSession:
+    def __init__(self, session: GameSession):
+        self.session = compact_session(session)
+        self.connections = 0
+        # Players whose position changed since the last flush
+        self.moved: Set[str] = set()
+        # user_id -> damage taken since the last flush, written as $inc
+        self.damage: Dict[str, float] = {}
+        self.flush_lock = asyncio.Lock()
+        # Pending eviction after the last socket closed
+        self.evict_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.moved or self.damage)
+
+# Authoritative in-memory copies of sessions that have WebSocket connections.
+# Mutations from the game loop are only recorded here; the store writes them
+# back to Mongo as field-level updates on an interval, on the last disconnect
+# and on shutdown. A session whose last socket closed stays in memory for the
+# linger period, so clients reconnecting after a network flap don't reload it.
+class LiveSessionStore:
+    def __init__(self, flush_interval: float, linger: float = 0):
+        self.flush_interval = flush_interval
+        self.linger = linger
+        # session_id -> LiveSession
+        self.sessions: Dict[str, LiveSession] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        live = self.sessions.get(session_id)
+        return live.session if live else None
+
+    async def fetch(self, session_id: str) -> Optional[GameSession]:
+        # Prefer the live copy so REST handlers see the same state as the
+        # WebSocket loop instead of a stale document.
+        session = self.get(session_id)
+        if session is not None:
+            return session
+        return await GameSession.get(session_id)
+
+    async def acquire(self, session_id: str, user_id: Optional[str] = None) -> Optional[GameSession]:
+        live = self.sessions.get(session_id)
+        # A lingering copy missed joins and leaves made while this node had no
+        # sockets (and no broker subscription) for it; a connecting player it
+        # doesn't know joined through another node
+        stale = live is not None and (
+            live.connections <= 0 or (user_id is not None and user_id not in live.session.players)
+        )
+        if live is None:
+            # Concurrent connects for the same session share a single load
+            task = self._loading.get(session_id)
+            if task is None:
+                task = asyncio.ensure_future(GameSession.get(session_id))
+                self._loading[session_id] = task
+            try:
+                session = await task
+            finally:
+                self._loading.pop(session_id, None)
+            if session is None:
+                return None
+            live = self.sessions.get(session_id)
+            if live is None:
+                live = LiveSession(session)
+                self.sessions[session_id] = live
+        if live.evict_handle is not None:
+            live.evict_handle.cancel()
+            live.evict_handle = None
+        live.connections += 1
+        if stale:
+            await self._sync_players(session_id, live)
+        return live.session
+
+    async def _sync_players(self, session_id: str, live: LiveSession):
+        # Membership from MongoDB; players still present keep their live state
+        roster = await session_repository.roster(session_id)
+        if roster is None or self.sessions.get(session_id) is not live:
+            return
+        players = roster.get("players", {})
+        roles = roster.get("player_roles", {})
+        for user_id in [user_id for user_id in live.session.players if user_id not in players]:
+            self.remove_player(session_id, user_id)
+        for user_id, state in players.items():
+            role = PlayerRole(roles.get(user_id, PlayerRole.PLAYER.value))
+            self.add_player(session_id, user_id, PlayerState.model_validate(state), role)
+        host_id = str(roster["host"].id)
+        if link_id(live.session.host) != host_id:
+            self.transfer_host(session_id, host_id)
+        live.session.is_active = roster.get("is_active", live.session.is_active)
+
+    async def release(self, session_id: str):
+        live = self.sessions.get(session_id)
+        if live is None:
+            return
+        live.connections -= 1
+        if live.connections > 0:
+            return
+        await self._flush(live)
+        if self.linger > 0 and live.connections <= 0:
+            if live.evict_handle is not None:
+                live.evict_handle.cancel()
+            live.evict_handle = asyncio.get_running_loop().call_later(self.linger, self._evict, session_id, live)
+        else:
+            self._evict(session_id, live)
+
+    def _evict(self, session_id: str, live: LiveSession):
+        live.evict_handle = None
+        # Someone may have reconnected in the meantime
+        if live.connections <= 0 and self.sessions.get(session_id) is live:
+            del self.sessions[session_id]
+
+    def add_player(self, session_id: str, user_id: str, state: PlayerState, role: PlayerRole):
+        # Joins are written to MongoDB by the REST handler; this only updates
+        # a live copy, on whichever node holds one
+        session = self.get(session_id)
+        if session is not None and user_id not in session.players:
+            session.players[user_id] = LivePlayer.from_model(state)
+            session.player_roles[user_id] = role
+            session.player_count = len(session.players)
+
+    def remove_player(self, session_id: str, user_id: str):
+        session = self.get(session_id)
+        if session is not None and user_id in session.players:
+            del session.players[user_id]
+            session.player_roles.pop(user_id, None)
+            session.player_count = len(session.players)
+            live = self.sessions[session_id]
+            live.moved.discard(user_id)
+            live.damage.pop(user_id, None)
+
+    def transfer_host(self, session_id: str, host_id: str):
+        session = self.get(session_id)
+        if session is not None:
+            # Unfetched, like the host of a session loaded from MongoDB
+            session.host = Link(user_ref(host_id), User)
+            session.player_roles[host_id] = PlayerRole.HOST
+
+    def deactivate(self, session_id: str):
+        session = self.get(session_id)
+        if session is not None:
+            session.is_active = False
+
+    def mark_moved(self, session_id: str, user_id: str):
+        live = self.sessions.get(session_id)
+        if live is not None:
+            live.moved.add(user_id)
+
+    def mark_damaged(self, session_id: str, user_id: str, damage: float):
+        live = self.sessions.get(session_id)
+        if live is not None:
+            live.damage[user_id] = live.damage.get(user_id, 0) + damage
+
+    async def flush_session(self, session_id: str):
+        live = self.sessions.get(session_id)
+        if live is not None:
+            await self._flush(live)
+
+    async def flush_all(self):
+        await asyncio.gather(
+            *(self._flush(live) for live in list(self.sessions.values()))
+        )
+
+    async def _flush(self, live: LiveSession):
+        async with live.flush_lock:
+            if not live.dirty:
+                return
+            # Swap the change sets out first so changes made while the write
+            # is in flight are picked up by the next flush.
+            moved, live.moved = live.moved, set()
+            damage, live.damage = live.damage, {}
+            positions = {}
+            for user_id in moved:
+                player = live.session.players.get(user_id)
+                if player is not None:
+                    positions[user_id] = (player.position, player.last_updated)
+            try:
+                await session_repository.apply_player_changes(str(live.session.id), positions, damage)
+            except Exception:
+                live.moved |= moved
+                for user_id, amount in damage.items():
+                    live.damage[user_id] = live.damage.get(user_id, 0) + amount
+                logger.exception("Failed to flush session %s", live.session.id)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_all()
+
+    def start(self):
+        if self.flush_interval > 0 and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush_all()
+
+live_sessions = LiveSessionStore(settings.SESSION_FLUSH_INTERVAL_SECONDS, settings.WS_RESUME_WINDOW_SECONDS)
@@ -0,0 +1,275 @@
+import abc
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo import monitoring
+
+# Minimal in-process Prometheus instrumentation. Hot paths only touch a dict
+# and a few integers per observation; gauges are computed from live state
+# when /metrics is scraped, so they cost nothing in between.
+
+Labels = Tuple[str, ...]
+
+# Seconds; covers sub-millisecond encodes up to slow MongoDB queries
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines += self.samples()
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self.series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        function: Optional[Callable[[], Dict[Labels, float]]] = None,
+        kind: Optional[str] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        # Called at scrape time; returns labels -> value
+        self.function = function
+        # "counter" for totals kept elsewhere (e.g. cache hit counters)
+        if kind is not None:
+            self.kind = kind
+
+    def samples(self) -> List[str]:
+        values = self.function() if self.function is not None else {}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values.items()
+        ]
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        function=None,
+        kind: Optional[str] = None
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function, kind))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+registry = Registry()
+
+ws_message_seconds = registry.histogram(
+    "dungeon_ws_message_seconds",
+    "Time spent handling an inbound WebSocket message",
+    ("type",)
+)
+ws_send_seconds = registry.histogram(
+    "dungeon_ws_send_seconds",
+    "Time spent writing one outbound WebSocket frame",
+    ("codec",)
+)
+ws_encode_seconds = registry.histogram(
+    "dungeon_ws_encode_seconds",
+    "Time spent encoding an outbound message (once per frame and wire format)",
+    ("codec",)
+)
+ws_slow_disconnects = registry.counter(
+    "dungeon_ws_slow_consumer_disconnects_total",
+    "Clients disconnected for not keeping up with their send queue"
+)
+ws_rate_limited = registry.counter(
+    "dungeon_ws_rate_limited_total",
+    "Inbound WebSocket messages over their rate limit (position updates are coalesced, others rejected)",
+    ("type",)
+)
+broadcast_seconds = registry.histogram(
+    "dungeon_broadcast_seconds",
+    "Time to fan a broadcast out to every local recipient queue and the broker"
+)
+broadcast_recipients = registry.counter(
+    "dungeon_broadcast_recipients_total",
+    "Messages queued for delivery by broadcasts"
+)
+tick_seconds = registry.histogram(
+    "dungeon_tick_seconds",
+    "Time to build and queue one tick's snapshots for a session"
+)
+journal_events_dropped = registry.counter(
+    "dungeon_event_journal_dropped_total",
+    "Journal events dropped because the buffer was full"
+)
+sessions_reaped = registry.counter(
+    "dungeon_sessions_reaped_total",
+    "Idle sessions closed by the reaper",
+    ("action",)
+)
+mongo_command_seconds = registry.histogram(
+    "dungeon_mongo_command_seconds",
+    "MongoDB command latency",
+    ("command", "collection")
+)
+mongo_command_failures = registry.counter(
+    "dungeon_mongo_command_failures_total",
+    "Failed MongoDB commands",
+    ("command", "collection")
+)
+http_request_seconds = registry.histogram(
+    "dungeon_http_request_seconds",
+    "HTTP request latency",
+    ("method", "handler", "status")
+)
+
+# Label for inbound message types; anything else is bucketed to keep cardinality bounded
+WS_MESSAGE_TYPES = {"position_update", "game_action", "world_query"}
+
+def message_type_label(message: dict) -> str:
+    kind = message.get("type")
+    return kind if kind in WS_MESSAGE_TYPES else "other"
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # Passed to the Motor client; times every command Beanie issues
+    def __init__(self):
+        # request_id -> collection, from the started event
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_seconds.observe(event.duration_micros / 1e6, event.command_name, collection)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_seconds.observe(event.duration_micros / 1e6, event.command_name, collection)
+        mongo_command_failures.inc(event.command_name, collection)
+
+mongo_metrics = MongoCommandMetrics()
+
+class HttpMetricsMiddleware:
+    # Plain ASGI middleware (no per-request task like BaseHTTPMiddleware);
+    # the handler label is the endpoint function name, so paths with ids
+    # don't create new series
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = scope.get("endpoint")
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(endpoint, "__name__", "unmatched"),
+                str(status[0])
+            )
@@ -0,0 +1,250 @@
+import json
+import math
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+from fastapi import WebSocket, WebSocketDisconnect
+from app.services.metrics import ws_encode_seconds
+
+# Wire formats for /ws/{session_id}. JSON text frames stay the default; clients
+# that request the "dungeon.bin.v1" subprotocol get binary frames where the hot
+# messages (positions, shots, tick snapshots) use fixed struct layouts and
+# everything else is JSON behind a one-byte tag.
+#
+# Binary layout (little-endian, floats are float32, ids are u8 length + utf-8):
+#   0 JSON       tag, utf-8 JSON document
+#   1 POSITION   tag, user_id, x, y                 (user_id empty client->server)
+#   2 SHOOT      tag, user_id, target_id, damage    (target_id empty on a miss)
+#   3 SNAPSHOT   tag, u32 tick, u16 count, count * (user_id, u8 flags,
+#                [x, y] if flags & 1, [health] if flags & 2); flags & 4 = alive
+#
+# "dungeon.bin.v2" is the same except SHOOT carries the session sequence
+# number used to resume: tag, u32 seq, user_id, target_id, damage (seq 0 from
+# clients). v1 drops it, so v1 clients can't resume exactly.
+
+BINARY_SUBPROTOCOL = "dungeon.bin.v1"
+SEQUENCED_BINARY_SUBPROTOCOL = "dungeon.bin.v2"
+
+TAG_JSON = 0
+TAG_POSITION = 1
+TAG_SHOOT = 2
+TAG_SNAPSHOT = 3
+
+FLAG_POSITION = 1
+FLAG_HEALTH = 2
+FLAG_ALIVE = 4
+
+_tag = struct.Struct("<B")
+_xy = struct.Struct("<ff")
+_float = struct.Struct("<f")
+_seq = struct.Struct("<I")
+_snapshot_header = struct.Struct("<BIH")
+
+# Largest finite float32
+FLOAT32_MAX = 3.4028234663852886e38
+
+Payload = Union[str, bytes]
+
+class JsonCodec:
+    name = "json"
+    subprotocol: Optional[str] = None
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message, separators=(",", ":"))
+
+    def decode(self, payload: Payload) -> dict:
+        return json.loads(payload)
+
+    async def send(self, websocket: WebSocket, payload: str):
+        await websocket.send_text(payload)
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        return await websocket.receive_json()
+
+def _pack_id(value: str) -> bytes:
+    raw = value.encode()
+    return _tag.pack(len(raw)) + raw
+
+def _unpack_id(data: bytes, offset: int) -> Tuple[str, int]:
+    length = data[offset]
+    offset += 1
+    return data[offset:offset + length].decode(), offset + length
+
+def _is_float32(value: Any) -> bool:
+    return isinstance(value, (int, float)) and math.isfinite(value) and abs(value) <= FLOAT32_MAX
+
+def _xy_of(position: Any) -> Optional[Tuple[float, float]]:
+    # Only plain {x, y} positions with float32-sized numbers fit the struct layout
+    if isinstance(position, dict) and len(position) == 2:
+        x, y = position.get("x"), position.get("y")
+        if _is_float32(x) and _is_float32(y):
+            return x, y
+    return None
+
+class BinaryCodec:
+    def __init__(self, name: str, subprotocol: str, sequenced: bool):
+        self.name = name
+        self.subprotocol = subprotocol
+        self.sequenced = sequenced
+
+    def encode(self, message: dict) -> bytes:
+        try:
+            encoded = self._encode_struct(message)
+        except (struct.error, OverflowError, TypeError):
+            # Client-supplied values that don't fit the layout (huge numbers,
+            # ids over 255 bytes) still go out, as JSON
+            encoded = None
+        if encoded is not None:
+            return encoded
+        return _tag.pack(TAG_JSON) + json.dumps(message, separators=(",", ":")).encode()
+
+    def _encode_struct(self, message: dict) -> Optional[bytes]:
+        kind = message.get("type")
+        if kind == "position_update":
+            xy = _xy_of(message.get("position"))
+            if xy is not None:
+                return (
+                    _tag.pack(TAG_POSITION)
+                    + _pack_id(message.get("user_id", ""))
+                    + _xy.pack(*xy)
+                )
+        elif kind == "game_action":
+            return self._encode_shoot(message)
+        elif kind == "snapshot":
+            return self._encode_snapshot(message)
+        return None
+
+    def _encode_shoot(self, message: dict) -> Optional[bytes]:
+        # Server broadcasts wrap the client's message in "action"
+        action = message.get("action")
+        if isinstance(action, dict):
+            if set(message) - {"type", "user_id", "action", "seq"}:
+                return None
+        else:
+            action = message
+        if action.get("action") != "shoot" or set(action) - {"type", "action", "target_hit"}:
+            return None
+        target_id, damage = "", 0.0
+        target_hit = action.get("target_hit")
+        if target_hit:
+            if set(target_hit) != {"user_id", "damage"}:
+                return None
+            target_id, damage = target_hit["user_id"], target_hit["damage"]
+        header = _tag.pack(TAG_SHOOT)
+        if self.sequenced:
+            header += _seq.pack(message.get("seq", 0))
+        return (
+            header
+            + _pack_id(message.get("user_id", ""))
+            + _pack_id(target_id)
+            + _float.pack(damage)
+        )
+
+    def _encode_snapshot(self, message: dict) -> Optional[bytes]:
+        players = message["players"]
+        parts: List[bytes] = [_snapshot_header.pack(TAG_SNAPSHOT, message["tick"], len(players))]
+        for user_id, entry in players.items():
+            flags = 0
+            body = b""
+            if "position" in entry:
+                xy = _xy_of(entry["position"])
+                if xy is None:
+                    return None
+                flags |= FLAG_POSITION
+                body += _xy.pack(*xy)
+            if "health" in entry:
+                flags |= FLAG_HEALTH
+                body += _float.pack(entry["health"])
+            if entry.get("is_alive"):
+                flags |= FLAG_ALIVE
+            parts.append(_pack_id(user_id) + _tag.pack(flags) + body)
+        return b"".join(parts)
+
+    def decode(self, payload: Payload) -> dict:
+        if isinstance(payload, str):
+            return json.loads(payload)
+        tag = payload[0]
+        if tag == TAG_POSITION:
+            user_id, offset = _unpack_id(payload, 1)
+            x, y = _xy.unpack_from(payload, offset)
+            message: Dict[str, Any] = {"type": "position_update", "position": {"x": x, "y": y}}
+            if user_id:
+                message["user_id"] = user_id
+            return message
+        if tag == TAG_SHOOT:
+            seq, offset = 0, 1
+            if self.sequenced:
+                (seq,) = _seq.unpack_from(payload, offset)
+                offset += _seq.size
+            user_id, offset = _unpack_id(payload, offset)
+            target_id, offset = _unpack_id(payload, offset)
+            (damage,) = _float.unpack_from(payload, offset)
+            action: Dict[str, Any] = {"type": "game_action", "action": "shoot"}
+            if target_id:
+                action["target_hit"] = {"user_id": target_id, "damage": damage}
+            if user_id:
+                message = {"type": "game_action", "user_id": user_id, "action": action}
+                if seq:
+                    message["seq"] = seq
+                return message
+            return action
+        if tag == TAG_SNAPSHOT:
+            _, tick, count = _snapshot_header.unpack_from(payload, 0)
+            offset = _snapshot_header.size
+            players = {}
+            for _ in range(count):
+                user_id, offset = _unpack_id(payload, offset)
+                flags = payload[offset]
+                offset += 1
+                entry: Dict[str, Any] = {}
+                if flags & FLAG_POSITION:
+                    x, y = _xy.unpack_from(payload, offset)
+                    offset += _xy.size
+                    entry["position"] = {"x": x, "y": y}
+                if flags & FLAG_HEALTH:
+                    (entry["health"],) = _float.unpack_from(payload, offset)
+                    offset += _float.size
+                    entry["is_alive"] = bool(flags & FLAG_ALIVE)
+                players[user_id] = entry
+            return {"type": "snapshot", "tick": tick, "players": players}
+        return json.loads(payload[1:])
+
+    async def send(self, websocket: WebSocket, payload: bytes):
+        await websocket.send_bytes(payload)
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            return self.decode(message["bytes"])
+        return self.decode(message["text"])
+
+json_codec = JsonCodec()
+binary_codec = BinaryCodec("binary", BINARY_SUBPROTOCOL, sequenced=False)
+sequenced_binary_codec = BinaryCodec("binary.v2", SEQUENCED_BINARY_SUBPROTOCOL, sequenced=True)
+
+def negotiate_codec(websocket: WebSocket):
+    subprotocols = websocket.scope.get("subprotocols", [])
+    if SEQUENCED_BINARY_SUBPROTOCOL in subprotocols:
+        return sequenced_binary_codec
+    if BINARY_SUBPROTOCOL in subprotocols:
+        return binary_codec
+    return json_codec
+
+# A message fanned out to many connections; encoded at most once per codec
+class Frame:
+    __slots__ = ("message", "_encoded")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self._encoded: Dict[str, Payload] = {}
+
+    def encode(self, codec) -> Payload:
+        payload = self._encoded.get(codec.name)
+        if payload is None:
+            started = time.perf_counter()
+            payload = codec.encode(self.message)
+            ws_encode_seconds.observe(time.perf_counter() - started, codec.name)
+            self._encoded[codec.name] = payload
+        return payload
@@ -0,0 +1,293 @@
+import abc
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import struct
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub between API nodes, so a broadcast reaches players of the same
+# session connected to other workers or pods. Each node subscribes to the
+# channels of the sessions it has sockets for. Brokers deliver at most once:
+# messages published while a node is disconnected from the broker are lost.
+
+Handler = Callable[[str, bytes], None]
+
+def session_channel(session_id: str) -> str:
+    return f"{settings.PUBSUB_CHANNEL_PREFIX}session:{session_id}"
+
+class InProcessBroker:
+    # Single node: every socket is local, so there is nothing to fan out
+    distributed = False
+
+    def __init__(self):
+        self.channels: Set[str] = set()
+        self.handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def close(self):
+        pass
+
+    def subscribe(self, channel: str):
+        self.channels.add(channel)
+
+    def unsubscribe(self, channel: str):
+        self.channels.discard(channel)
+
+    def publish(self, channel: str, data: bytes):
+        pass
+
+SUBSCRIBE = 1
+UNSUBSCRIBE = 2
+PUBLISH = 3
+MESSAGE = 4
+
+class NetworkBroker(InProcessBroker, abc.ABC):
+    # Commands go through one queue so subscribes, unsubscribes and publishes
+    # reach the broker in the order they were issued, without callers waiting
+    # on the network. The connection is reopened (and every channel
+    # resubscribed) whenever it drops.
+    distributed = True
+    reconnect_delay = 1.0
+
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self.connected = False
+        self._commands: "asyncio.Queue[Tuple[int, str, bytes]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _command(self, op: int, channel: str, data: bytes = b""):
+        # While disconnected, channels are resubscribed on reconnect and
+        # publishes are dropped
+        if self.connected:
+            self._commands.put_nowait((op, channel, data))
+
+    def subscribe(self, channel: str):
+        if channel not in self.channels:
+            super().subscribe(channel)
+            self._command(SUBSCRIBE, channel)
+
+    def unsubscribe(self, channel: str):
+        if channel in self.channels:
+            super().unsubscribe(channel)
+            self._command(UNSUBSCRIBE, channel)
+
+    def publish(self, channel: str, data: bytes):
+        self._command(PUBLISH, channel, data)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._open()
+                try:
+                    await self._serve()
+                finally:
+                    self.connected = False
+                    await self._close_connection()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Pub/sub connection to %s lost", self.url, exc_info=True)
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _serve(self):
+        self._commands = asyncio.Queue()
+        for channel in list(self.channels):
+            await self._execute(SUBSCRIBE, channel, b"")
+        self.connected = True
+        reader = asyncio.create_task(self._read_loop())
+        try:
+            while True:
+                getter = asyncio.ensure_future(self._commands.get())
+                done, _ = await asyncio.wait({getter, reader}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    # Raises whatever ended the read loop
+                    reader.result()
+                    return
+                await self._execute(*getter.result())
+        finally:
+            reader.cancel()
+
+    def _dispatch(self, channel: str, data: bytes):
+        try:
+            self.handler(channel, data)
+        except Exception:
+            logger.exception("Failed to handle pub/sub message on %s", channel)
+
+    @abc.abstractmethod
+    async def _open(self):
+        ...
+
+    @abc.abstractmethod
+    async def _close_connection(self):
+        ...
+
+    @abc.abstractmethod
+    async def _execute(self, op: int, channel: str, data: bytes):
+        ...
+
+    @abc.abstractmethod
+    async def _read_loop(self):
+        ...
+
+class RedisBroker(NetworkBroker):
+    # Needs the optional redis package (pip install redis)
+    async def _open(self):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("PUBSUB_BACKEND=redis requires the redis package") from e
+        self._redis = redis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+
+    async def _close_connection(self):
+        await self._pubsub.close()
+        await self._redis.close()
+
+    async def _execute(self, op: int, channel: str, data: bytes):
+        if op == SUBSCRIBE:
+            await self._pubsub.subscribe(channel)
+        elif op == UNSUBSCRIBE:
+            await self._pubsub.unsubscribe(channel)
+        else:
+            await self._redis.publish(channel, data)
+
+    async def _read_loop(self):
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is not None and message["type"] == "message":
+                self._dispatch(message["channel"].decode(), message["data"])
+
+# Local stand-in broker: a small TCP pub/sub server (app.commands.run_broker)
+# so several workers can be run against each other on one machine without
+# Redis. Frames are: u8 op, u16 channel length, u32 data length, channel, data.
+_frame_header = struct.Struct("<BHI")
+
+def _pack_frame(op: int, channel: str, data: bytes = b"") -> bytes:
+    raw = channel.encode()
+    return _frame_header.pack(op, len(raw), len(data)) + raw + data
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[int, str, bytes]:
+    op, channel_length, data_length = _frame_header.unpack(
+        await reader.readexactly(_frame_header.size)
+    )
+    channel = (await reader.readexactly(channel_length)).decode()
+    data = await reader.readexactly(data_length) if data_length else b""
+    return op, channel, data
+
+class LocalBroker(NetworkBroker):
+    async def _open(self):
+        address = urlparse(self.url)
+        self._reader, self._writer = await asyncio.open_connection(
+            address.hostname or "127.0.0.1", address.port or settings.LOCAL_BROKER_PORT
+        )
+
+    async def _close_connection(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+
+    async def _execute(self, op: int, channel: str, data: bytes):
+        self._writer.write(_pack_frame(op, channel, data))
+        await self._writer.drain()
+
+    async def _read_loop(self):
+        while True:
+            op, channel, data = await _read_frame(self._reader)
+            if op == MESSAGE:
+                self._dispatch(channel, data)
+
+async def serve_local_broker(host: str, port: int) -> asyncio.AbstractServer:
+    # channel -> subscribed client streams
+    subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels: Set[str] = set()
+        try:
+            while True:
+                op, channel, data = await _read_frame(reader)
+                if op == SUBSCRIBE:
+                    subscribers.setdefault(channel, set()).add(writer)
+                    channels.add(channel)
+                elif op == UNSUBSCRIBE:
+                    subscribers.get(channel, set()).discard(writer)
+                    channels.discard(channel)
+                elif op == PUBLISH:
+                    frame = _pack_frame(MESSAGE, channel, data)
+                    for subscriber in subscribers.get(channel, ()):
+                        subscriber.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for channel in channels:
+                subscribers.get(channel, set()).discard(writer)
+                if not subscribers.get(channel):
+                    subscribers.pop(channel, None)
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+def create_broker() -> InProcessBroker:
+    backend = settings.PUBSUB_BACKEND
+    if backend == "memory":
+        return InProcessBroker()
+    if backend == "redis":
+        return RedisBroker(settings.PUBSUB_URL or "redis://localhost:6379/0")
+    if backend == "local":
+        return LocalBroker(settings.PUBSUB_URL or f"tcp://127.0.0.1:{settings.LOCAL_BROKER_PORT}")
+    raise ValueError(f"Unknown PUBSUB_BACKEND {backend!r}")
+
+# Optional sticky routing: with SESSION_NODES set, each session is owned by
+# one node (rendezvous hashing), every socket of that session must connect
+# there, and its broadcasts never need the broker.
+class SessionRouter:
+    def __init__(self, nodes: List[str], node_id: str):
+        self.nodes = nodes
+        self.node_id = node_id
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.nodes)
+
+    def owner(self, session_id: str) -> str:
+        if not self.enabled:
+            return self.node_id
+        return max(
+            self.nodes,
+            key=lambda node: hashlib.sha1(f"{node}/{session_id}".encode()).digest()
+        )
+
+    def is_local(self, session_id: str) -> bool:
+        return self.owner(session_id) == self.node_id
+
+node_id = settings.NODE_ID or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+router = SessionRouter(
+    [node.strip() for node in settings.SESSION_NODES.split(",") if node.strip()],
+    node_id
+)
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.connections import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+
+POSITION_UPDATE = "position_update"
+
+class TokenBucket:
+    # Refills `rate` tokens per second up to `burst`; rate 0 never limits
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        # Seconds until the next token
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+def message_limits() -> Dict[str, Tuple[float, int]]:
+    return {
+        POSITION_UPDATE: (settings.WS_POSITION_RATE, settings.WS_POSITION_BURST),
+        "game_action": (settings.WS_ACTION_RATE, settings.WS_ACTION_BURST),
+        "world_query": (settings.WS_QUERY_RATE, settings.WS_QUERY_BURST)
+    }
+
+class MessageLimiter:
+    # One bucket per inbound message type for a single connection. The
+    # position bucket follows the load monitor's current rate.
+    def __init__(self, monitor: "LoadMonitor"):
+        self.monitor = monitor
+        self.buckets = {kind: TokenBucket(rate, burst) for kind, (rate, burst) in message_limits().items()}
+
+    def _bucket(self, kind: str) -> Optional[TokenBucket]:
+        bucket = self.buckets.get(kind)
+        if bucket is not None and kind == POSITION_UPDATE and bucket.rate > 0:
+            bucket.rate = self.monitor.position_rate
+        return bucket
+
+    def allow(self, kind: str) -> bool:
+        bucket = self._bucket(kind)
+        return bucket is None or bucket.take()
+
+    def delay(self, kind: str) -> float:
+        bucket = self._bucket(kind)
+        return bucket.delay() if bucket is not None else 0.0
+
+# Watches this worker's event-loop lag and outbound queue depth and adapts
+# the position update rate: clients are sent a rate_hint when it changes,
+# and each connection's position bucket enforces it.
+class LoadMonitor:
+    def __init__(self, interval: float, connections: ConnectionManager):
+        self.interval = interval
+        self.connections = connections
+        self.max_rate = settings.WS_POSITION_RATE
+        self.position_rate = self.max_rate
+        self.lag = 0.0
+        self.queue_depth = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def throttled(self) -> bool:
+        return self.position_rate < self.max_rate
+
+    def hint(self) -> dict:
+        return {"type": "rate_hint", "position_rate": self.position_rate}
+
+    def _deepest_queue(self) -> int:
+        return max(
+            (
+                len(connection.queue)
+                for connections in self.connections.active_connections.values()
+                for connection in connections.values()
+            ),
+            default=0
+        )
+
+    def adjust(self, lag: float, queue_depth: int):
+        self.lag = lag
+        self.queue_depth = queue_depth
+        if self.max_rate <= 0:
+            return
+        rate = self.position_rate
+        if lag > settings.LOAD_LAG_HIGH_SECONDS or queue_depth > settings.LOAD_QUEUE_HIGH:
+            rate = max(min(settings.WS_MIN_POSITION_RATE, self.max_rate), rate / 2)
+        elif lag < settings.LOAD_LAG_LOW_SECONDS and queue_depth < settings.LOAD_QUEUE_LOW:
+            rate = min(self.max_rate, rate * 1.5)
+        if rate != self.position_rate:
+            logger.info("Position rate %.1f -> %.1f (lag %.3fs, queue %d)", self.position_rate, rate, lag, queue_depth)
+            self.position_rate = rate
+            self.connections.send_to_all(self.hint(), key=("rate_hint", ""))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            # Anything past the requested sleep is time the loop was busy
+            lag = max(0.0, loop.time() - started - self.interval)
+            try:
+                self.adjust(lag, self._deepest_queue())
+            except Exception:
+                logger.exception("Load monitor failed")
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+load_monitor = LoadMonitor(settings.LOAD_MONITOR_INTERVAL_SECONDS, manager)
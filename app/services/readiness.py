@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Dict, Tuple
+from app.core.config import settings
+from app.db.session import create_indexes
+from app.services.google_certs import google_certs
+
+logger = logging.getLogger(__name__)
+
+# Whether this worker should receive traffic: startup has finished, MongoDB
+# answers, and the warm-up (Google signing certificates) has run. Deferred
+# index builds (MONGODB_INDEXES=background) run alongside without holding
+# readiness back.
+class Readiness:
+    def __init__(self):
+        self.client = None
+        self.started = False
+        self.stopping = False
+        self.warm = False
+        self._tasks = []
+
+    def start(self, client):
+        self.client = client
+        self.started = True
+        self._tasks.append(asyncio.create_task(self._warm_up()))
+        if settings.MONGODB_INDEXES == "background":
+            self._tasks.append(asyncio.create_task(self._build_indexes()))
+
+    async def _warm_up(self):
+        if settings.GOOGLE_CLIENT_ID:
+            try:
+                await google_certs.get()
+            except Exception:
+                # Logins fetch them again; not a reason to keep the worker out
+                logger.warning("Could not prefetch Google certificates", exc_info=True)
+        self.warm = True
+
+    async def _build_indexes(self):
+        try:
+            await create_indexes(self.client)
+        except Exception:
+            logger.exception("Background index build failed")
+
+    def stop(self):
+        # Draining: report not ready so no new traffic is routed here
+        self.stopping = True
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    async def _database(self) -> bool:
+        if self.client is None:
+            return False
+        try:
+            await asyncio.wait_for(self.client.admin.command("ping"), settings.READY_DB_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+    async def check(self) -> Tuple[bool, Dict[str, bool]]:
+        checks = {
+            "started": self.started and not self.stopping,
+            "warm": self.warm,
+            "database": await self._database()
+        }
+        return all(checks.values()), checks
+
+readiness = Readiness()
@@ -0,0 +1,99 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from fastapi import Request, Response
+from app.core.config import settings
+from app.core.serialization import dumps
+
+# Short-lived cache of rendered JSON responses for endpoints clients poll
+# (leaderboard, lobby), keyed by namespace and query parameters. Writes that
+# change what a namespace returns call invalidate(namespace). Every response
+# carries a strong ETag of its body; a matching If-None-Match on a cached
+# entry is answered with 304 without touching MongoDB.
+#
+# Invalidation is per process: other workers serve their copy until it
+# expires, so keep the TTL short.
+
+LEADERBOARD = "leaderboard"
+LOBBY = "lobby"
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "expires_at")
+
+    def __init__(self, body: bytes, etag: str, expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+class ResponseCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        # (namespace, key) -> CachedResponse
+        self.entries: "OrderedDict[Tuple[str, Hashable], CachedResponse]" = OrderedDict()
+        # Bumped by invalidate, so responses computed from older data aren't stored
+        self.generations: Dict[str, int] = {}
+        # namespace -> count, for /metrics
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.not_modified: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def _respond(self, namespace: str, entry: CachedResponse, request: Request) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified[namespace] = self.not_modified.get(namespace, 0) + 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def lookup(self, namespace: str, key: Hashable, request: Request) -> Tuple[Optional[Response], int]:
+        # A ready response (200 or 304) or None, plus the generation to hand
+        # back to store()
+        generation = self.generations.get(namespace, 0)
+        entry = self.entries.get((namespace, key))
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self.entries[(namespace, key)]
+            self.misses[namespace] = self.misses.get(namespace, 0) + 1
+            return None, generation
+        self.entries.move_to_end((namespace, key))
+        self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return self._respond(namespace, entry, request), generation
+
+    def store(self, namespace: str, key: Hashable, generation: int, content: Any, request: Request) -> Response:
+        body = dumps(content)
+        entry = CachedResponse(body, _etag(body), time.monotonic() + self.ttl)
+        if self.enabled and self.generations.get(namespace, 0) == generation:
+            self.entries[(namespace, key)] = entry
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return self._respond(namespace, entry, request)
+
+    def invalidate(self, namespace: str):
+        self.generations[namespace] = self.generations.get(namespace, 0) + 1
+        for cache_key in [cache_key for cache_key in self.entries if cache_key[0] == namespace]:
+            del self.entries[cache_key]
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
@@ -0,0 +1,247 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+import bson
+from bson import DBRef
+from pymongo import ASCENDING
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.db.repositories import to_bson
+from app.models.models import GameSave, GameSession, PlayerState, User, WorldMapBlob, WorldObject, user_ref, utc_now
+
+# Copy-on-write save storage. World maps are stored once per distinct map in
+# world_maps, keyed by content hash and compressed. Saves of a session are
+# deltas against the creator's latest full save, with a full snapshot every
+# SAVE_SNAPSHOT_INTERVAL saves so a load never needs more than two reads.
+
+class WorldMapCache:
+    # Maps are immutable once hashed, so cached entries never go stale
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.maps: "OrderedDict[str, List[dict]]" = OrderedDict()
+
+    def get(self, map_hash: str) -> Optional[List[dict]]:
+        objects = self.maps.get(map_hash)
+        if objects is not None:
+            self.maps.move_to_end(map_hash)
+        return objects
+
+    def put(self, map_hash: str, objects: List[dict]):
+        if self.max_size <= 0:
+            return
+        self.maps[map_hash] = objects
+        self.maps.move_to_end(map_hash)
+        while len(self.maps) > self.max_size:
+            self.maps.popitem(last=False)
+
+world_maps = WorldMapCache(settings.WORLD_MAP_CACHE_SIZE)
+
+def encode_world_map(objects: List[Any]) -> bytes:
+    return bson.encode({"objects": to_bson(objects)})
+
+def canonical(value: Any) -> Any:
+    # Value as it reads back from MongoDB (ms datetimes, plain dicts), so
+    # live state and stored state compare equal when nothing changed
+    return bson.decode(bson.encode({"value": to_bson(value)}))["value"]
+
+async def store_world_map(objects: List[Any]) -> str:
+    raw = encode_world_map(objects)
+    map_hash = hashlib.sha256(raw).hexdigest()
+    if world_maps.get(map_hash) is None:
+        await WorldMapBlob.get_motor_collection().update_one(
+            {"_id": map_hash},
+            {"$setOnInsert": {
+                "data": zlib.compress(raw),
+                "object_count": len(objects),
+                "created_at": utc_now()
+            }},
+            upsert=True
+        )
+        world_maps.put(map_hash, bson.decode(raw)["objects"])
+    return map_hash
+
+async def load_world_map(map_hash: str) -> List[dict]:
+    objects = world_maps.get(map_hash)
+    if objects is None:
+        blob = await WorldMapBlob.get(map_hash)
+        if blob is None:
+            raise LookupError(f"World map {map_hash} not found")
+        objects = bson.decode(zlib.decompress(blob.data))["objects"]
+        world_maps.put(map_hash, objects)
+    return objects
+
+async def _latest_full_save(session: GameSession, user: User) -> Optional[GameSave]:
+    return await GameSave.find(
+        {
+            "session": DBRef(GameSession.Settings.name, session.id),
+            "created_by": user_ref(str(user.id)),
+            "base_save": None
+        }
+    ).sort([("created_at", -1)]).first_or_none()
+
+async def build_save(
+    session: GameSession,
+    user: User,
+    name: str,
+    description: Optional[str],
+    **fields
+) -> GameSave:
+    players = {user_id: canonical(state) for user_id, state in session.players.items()}
+    shared_objects = canonical(session.shared_objects)
+    game_state = canonical(session.game_state)
+    save = GameSave(
+        session=session,
+        name=name,
+        description=description,
+        world_map_hash=await store_world_map(session.world_map),
+        created_by=user,
+        **fields
+    )
+
+    base = await _latest_full_save(session, user)
+    if base is not None and settings.SAVE_SNAPSHOT_INTERVAL > 1:
+        deltas = await GameSave.find({"base_save": base.id}).count()
+        if deltas < settings.SAVE_SNAPSHOT_INTERVAL - 1:
+            base_state = await resolve_save(base)
+            base_players = {user_id: canonical(state) for user_id, state in base_state["players"].items()}
+            save.base_save = base.id
+            save.players = _player_models({
+                user_id: state for user_id, state in players.items()
+                if base_players.get(user_id) != state
+            })
+            save.removed_players = [user_id for user_id in base_players if user_id not in players]
+            if canonical(base_state["shared_objects"]) != shared_objects:
+                save.shared_objects = _object_models(shared_objects)
+            if canonical(base_state["game_state"]) != game_state:
+                save.game_state = game_state
+            return save
+
+    save.players = _player_models(players)
+    save.shared_objects = _object_models(shared_objects)
+    save.game_state = game_state
+    return save
+
+# Fields assigned after construction skip validation; keep them as the
+# declared models so the save dumps cleanly
+def _player_models(players: Dict[str, dict]) -> Dict[str, PlayerState]:
+    return {user_id: PlayerState.model_validate(state) for user_id, state in players.items()}
+
+def _object_models(objects: List[dict]) -> List[WorldObject]:
+    return [WorldObject.model_validate(obj) for obj in objects]
+
+def _apply_save(
+    base_state: Optional[Dict[str, Any]],
+    players: Dict[str, Any],
+    removed_players: List[str],
+    shared_objects: Optional[List[Any]],
+    game_state: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    # State after a save: the save itself when full, or the delta applied to
+    # its base's state
+    if base_state is None:
+        return {
+            "players": players,
+            "shared_objects": shared_objects or [],
+            "game_state": game_state or {},
+        }
+    state = dict(base_state)
+    state["players"] = {
+        user_id: player for user_id, player in base_state["players"].items()
+        if user_id not in removed_players
+    }
+    state["players"].update(players)
+    if shared_objects is not None:
+        state["shared_objects"] = shared_objects
+    if game_state is not None:
+        state["game_state"] = game_state
+    return state
+
+async def resolve_save(save: GameSave) -> Dict[str, Any]:
+    # Full state of a save: players, world_map, shared_objects, game_state
+    base_state = None
+    if save.base_save is not None:
+        base = await GameSave.get(save.base_save)
+        if base is None:
+            raise LookupError(f"Base save {save.base_save} not found")
+        base_state = await resolve_save(base)
+    state = _apply_save(
+        base_state, save.players, save.removed_players, save.shared_objects, save.game_state
+    )
+    if save.world_map_hash is not None:
+        state["world_map"] = await load_world_map(save.world_map_hash)
+    elif "world_map" not in state:
+        state["world_map"] = save.world_map
+    return state
+
+class SaveDocumentResolver:
+    # resolve_save for raw documents read from a cursor (exports). Full saves
+    # seen recently are kept, so the deltas that follow them need no extra
+    # read; world maps come from the shared map cache.
+    def __init__(self, max_bases: int = 4):
+        self.max_bases = max_bases
+        self.bases: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+
+    def _remember(self, save_id: Any, state: Dict[str, Any]):
+        self.bases[save_id] = state
+        self.bases.move_to_end(save_id)
+        while len(self.bases) > self.max_bases:
+            self.bases.popitem(last=False)
+
+    async def resolve(self, document: dict, world_map: bool = True) -> Dict[str, Any]:
+        base_state = None
+        base_id = document.get("base_save")
+        if base_id is not None:
+            base_state = self.bases.get(base_id)
+            if base_state is None:
+                base = await GameSave.get_motor_collection().find_one({"_id": base_id})
+                if base is None:
+                    raise LookupError(f"Base save {base_id} not found")
+                base_state = await self.resolve(base, world_map=False)
+        state = _apply_save(
+            base_state,
+            document.get("players") or {},
+            document.get("removed_players") or [],
+            document.get("shared_objects"),
+            document.get("game_state")
+        )
+        if base_id is None:
+            self._remember(document["_id"], state)
+        if world_map:
+            map_hash = document.get("world_map_hash")
+            state = dict(state)
+            state["world_map"] = (
+                await load_world_map(map_hash) if map_hash is not None
+                else document.get("world_map") or []
+            )
+        return state
+
+async def export_saves(user_id: str, world_map: bool = True) -> AsyncIterator[bytes]:
+    # NDJSON, one fully resolved save per line, oldest first. Reads the raw
+    # cursor batch by batch and yields a chunk per batch, so memory use and
+    # time to first byte don't grow with the number of saves.
+    batch_size = settings.SAVE_EXPORT_BATCH_SIZE
+    resolver = SaveDocumentResolver()
+    cursor = GameSave.get_motor_collection().find(
+        {"created_by": user_ref(user_id)},
+        batch_size=batch_size
+    ).sort("_id", ASCENDING)
+    lines: List[bytes] = []
+    async for document in cursor:
+        state = await resolver.resolve(document, world_map)
+        lines.append(dumps({
+            "_id": document["_id"],
+            "session_id": str(document["session"].id),
+            "name": document["name"],
+            "description": document.get("description"),
+            "score": document.get("score", 0),
+            "username": document.get("username"),
+            "created_at": document["created_at"],
+            "world_map_hash": document.get("world_map_hash"),
+            **state
+        }))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
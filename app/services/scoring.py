@@ -0,0 +1,17 @@
+from typing import Optional
+from app.models.models import PlayerState
+
+def calculate_score(player_state: Optional[PlayerState]) -> int:
+    if not player_state:
+        return 0
+        
+    score = 0
+    # Base score from health
+    score += player_state.health
+    # Points for weapons
+    score += len(player_state.weapons) * 50
+    # Points for being alive
+    if player_state.is_alive:
+        score += 100
+    
+    return score
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional, Set
+from app.core.config import settings
+from app.db.repositories import session_repository
+from app.models.models import GameSession, User, utc_now
+from app.services.live_sessions import LiveSessionStore, live_sessions
+from app.services.metrics import sessions_reaped
+from app.services.response_cache import LOBBY, response_cache
+from app.services.save_storage import load_world_map, store_world_map
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+IDLE_ACTIONS = ("hibernate", "deactivate")
+
+# Closes sessions that players abandoned without /leave: active, not live on
+# this node and not updated for the idle timeout. Hibernation also moves the
+# world map out of the document into the shared, deduplicated world_maps
+# store. The players stay in the session; their current_session pointers are
+# cleared in one update per pass, and joining the session wakes it again.
+class SessionReaper:
+    def __init__(self, interval: float, idle_timeout: float, store: LiveSessionStore):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.store = store
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 and self.idle_timeout > 0
+
+    async def reap(self) -> int:
+        if settings.SESSION_IDLE_ACTION not in IDLE_ACTIONS:
+            raise ValueError(f"Unknown SESSION_IDLE_ACTION {settings.SESSION_IDLE_ACTION!r}")
+        hibernate = settings.SESSION_IDLE_ACTION == "hibernate"
+        await session_repository.touch([
+            session_id for session_id, live in self.store.sessions.items() if live.connections > 0
+        ])
+        cutoff = utc_now() - timedelta(seconds=self.idle_timeout)
+        candidates = await session_repository.find_idle(
+            cutoff, list(self.store.sessions), settings.SESSION_REAPER_BATCH_SIZE, hibernate
+        )
+        reaped: Set[str] = set()
+        for document in candidates:
+            world_map_hash = None
+            if hibernate and document.get("world_map"):
+                world_map_hash = await store_world_map(document["world_map"])
+            if await session_repository.deactivate_idle(document["_id"], cutoff, world_map_hash):
+                reaped.add(str(document["_id"]))
+        if reaped:
+            await User.get_motor_collection().update_many(
+                {"current_session": {"$in": list(reaped)}},
+                {"$set": {"current_session": None}}
+            )
+            user_cache.invalidate_sessions(reaped)
+            response_cache.invalidate(LOBBY)
+            sessions_reaped.inc(settings.SESSION_IDLE_ACTION, amount=len(reaped))
+            logger.info("Reaped %d idle sessions (%s)", len(reaped), settings.SESSION_IDLE_ACTION)
+        return len(reaped)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # A full batch means more are waiting
+                while await self.reap() >= settings.SESSION_REAPER_BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception("Session reaper failed")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+async def wake_session(session: GameSession) -> Optional[GameSession]:
+    # Reactivate a session the reaper closed, restoring a hibernated world map
+    world_map = None
+    if session.world_map_hash is not None:
+        world_map = await load_world_map(session.world_map_hash)
+    # A concurrent join may have woken it already
+    if await session_repository.wake(str(session.id), world_map):
+        response_cache.invalidate(LOBBY)
+    return await GameSession.get(session.id)
+
+session_reaper = SessionReaper(
+    settings.SESSION_REAPER_INTERVAL_SECONDS,
+    settings.SESSION_IDLE_TIMEOUT_SECONDS,
+    live_sessions
+)
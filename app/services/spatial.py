@@ -0,0 +1,167 @@
+import math
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+from app.core.config import settings
+from app.models.models import GameSession, WorldObject, WorldObjectColumns
+
+def position_xy(position: Any) -> Optional[Tuple[float, float]]:
+    # None unless both coordinates are finite numbers; the grid can't place
+    # inf or NaN
+    try:
+        x, y = float(position["x"]), float(position["y"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return None
+    return x, y
+
+def clean_position(position: Any) -> Optional[Dict[str, float]]:
+    # A client-sent position as PlayerState stores it, or None unless it's a
+    # dict with finite numeric x and y
+    if not isinstance(position, dict):
+        return None
+    x, y = position.get("x"), position.get("y")
+    if isinstance(x, bool) or isinstance(y, bool) or not isinstance(x, (int, float)) or not isinstance(y, (int, float)):
+        return None
+    xy = position_xy(position)
+    if xy is None:
+        return None
+    return {"x": xy[0], "y": xy[1]}
+
+# Uniform grid over 2D points; each cell holds the ids of the points in it
+class UniformGrid:
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self.positions: Dict[Hashable, Tuple[float, float]] = {}
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, item: Hashable, x: float, y: float):
+        cell = self._cell(x, y)
+        previous = self.positions.get(item)
+        if previous is not None:
+            old_cell = self._cell(*previous)
+            if old_cell != cell:
+                self._discard(item, old_cell)
+                self.cells.setdefault(cell, set()).add(item)
+        else:
+            self.cells.setdefault(cell, set()).add(item)
+        self.positions[item] = (x, y)
+
+    def remove(self, item: Hashable):
+        previous = self.positions.pop(item, None)
+        if previous is not None:
+            self._discard(item, self._cell(*previous))
+
+    def _discard(self, item: Hashable, cell: Tuple[int, int]):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(item)
+            if not members:
+                del self.cells[cell]
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[Hashable]:
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        radius_sq = radius * radius
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for item in self.cells.get((cx, cy), ()):
+                    px, py = self.positions[item]
+                    if (px - x) ** 2 + (py - y) ** 2 <= radius_sq:
+                        found.append(item)
+        return found
+
+# Per-session area-of-interest state: where every player and world object is,
+# and which players currently see each other.
+class SessionSpace:
+    def __init__(self, session: GameSession, radius: float, cell_size: float):
+        self.radius = radius
+        self.players = UniformGrid(cell_size)
+        self.objects = UniformGrid(cell_size)
+        # Object lists as given (WorldObjectColumns on live sessions); grid
+        # items are (list index, row) so objects are only built when queried
+        self.object_sources: List[Sequence[WorldObject]] = []
+        # user_id -> user_ids within radius (symmetric)
+        self.visible: Dict[str, Set[str]] = {}
+        self.index_objects(session.world_map)
+        self.index_objects(session.shared_objects)
+        for user_id, player in session.players.items():
+            self.move_player(user_id, player.position)
+
+    def index_objects(self, objects: Sequence[WorldObject]):
+        source = len(self.object_sources)
+        self.object_sources.append(objects)
+        if isinstance(objects, WorldObjectColumns):
+            points = enumerate(zip(objects.x, objects.y))
+        else:
+            points = enumerate((obj.x, obj.y) for obj in objects)
+        for row, (x, y) in points:
+            if math.isfinite(x) and math.isfinite(y):
+                self.objects.insert((source, row), float(x), float(y))
+
+    def move_player(self, user_id: str, position: Any) -> Set[str]:
+        # Returns the players that just came into view of user_id
+        xy = position_xy(position)
+        if xy is None:
+            return set()
+        self.players.insert(user_id, *xy)
+        near = set(self.players.query_radius(xy[0], xy[1], self.radius))
+        near.discard(user_id)
+        old = self.visible.get(user_id, set())
+        for other in near - old:
+            self.visible.setdefault(other, set()).add(user_id)
+        for other in old - near:
+            self.visible.get(other, set()).discard(user_id)
+        self.visible[user_id] = near
+        return near - old
+
+    def remove_player(self, user_id: str):
+        self.players.remove(user_id)
+        for other in self.visible.pop(user_id, set()):
+            self.visible.get(other, set()).discard(user_id)
+
+    def players_near(self, user_id: str) -> Set[str]:
+        return self.visible.get(user_id, set())
+
+    def objects_near(self, user_id: str, radius: Optional[float] = None) -> List[WorldObject]:
+        xy = self.players.positions.get(user_id)
+        if xy is None:
+            return []
+        radius = min(radius or self.radius, self.radius)
+        return [
+            self.object_sources[source][row]
+            for source, row in sorted(self.objects.query_radius(xy[0], xy[1], radius))
+        ]
+
+class SpaceRegistry:
+    def __init__(self):
+        # session_id -> SessionSpace
+        self.spaces: Dict[str, SessionSpace] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.AOI_RADIUS > 0
+
+    def get(self, session_id: str) -> Optional[SessionSpace]:
+        return self.spaces.get(session_id)
+
+    def ensure(self, session_id: str, session: GameSession) -> Optional[SessionSpace]:
+        if not self.enabled:
+            return None
+        space = self.spaces.get(session_id)
+        if space is None:
+            space = SessionSpace(
+                session,
+                settings.AOI_RADIUS,
+                settings.SPATIAL_CELL_SIZE or settings.AOI_RADIUS
+            )
+            self.spaces[session_id] = space
+        return space
+
+    def discard(self, session_id: str):
+        self.spaces.pop(session_id, None)
+
+spaces = SpaceRegistry()
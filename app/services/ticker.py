@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+from app.models.models import GameSession
+from app.services.connections import Connection, ConnectionManager, OutboundMessage, manager
+from app.services.metrics import tick_seconds
+from app.services.protocol import Frame
+from app.services.spatial import SessionSpace
+
+logger = logging.getLogger(__name__)
+
+# Runs a fixed-rate loop for a session in tick mode. Position and health
+# changes received during a tick are coalesced and sent out as a single
+# delta snapshot per recipient instead of one message per packet.
+class SessionTicker:
+    def __init__(
+        self,
+        session_id: str,
+        session: GameSession,
+        tick_rate: int,
+        connections: ConnectionManager,
+        space: Optional[SessionSpace] = None
+    ):
+        self.session_id = session_id
+        self.session = session
+        self.interval = 1.0 / tick_rate
+        self.connections = connections
+        self.space = space
+        self.tick = 0
+        self.moved: Set[str] = set()
+        # Moves made through this node's sockets, passed on to other nodes
+        self.local_moved: Set[str] = set()
+        self.damaged: Set[str] = set()
+        # recipient -> players that just came into its area of interest
+        self.revealed: Dict[str, Set[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_position(self, user_id: str, local: bool = True):
+        self.moved.add(user_id)
+        if local:
+            self.local_moved.add(user_id)
+
+    def mark_health(self, user_id: str):
+        self.damaged.add(user_id)
+
+    def reveal(self, recipient: str, user_ids: Set[str]):
+        if user_ids:
+            self.revealed.setdefault(recipient, set()).update(user_ids)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += self.interval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Fell behind; skip ahead rather than bursting to catch up
+                deadline = loop.time()
+            started = time.perf_counter()
+            try:
+                self.flush()
+                tick_seconds.observe(time.perf_counter() - started)
+            except Exception:
+                logger.exception("Tick failed for session %s", self.session_id)
+
+    def _player_entry(self, user_id: str) -> Optional[dict]:
+        player = self.session.players.get(user_id)
+        if player is None:
+            return None
+        return {"position": player.position, "health": player.health, "is_alive": player.is_alive}
+
+    def _collect(self) -> Dict[str, dict]:
+        changes: Dict[str, dict] = {}
+        for user_id in self.moved:
+            player = self.session.players.get(user_id)
+            if player is not None:
+                changes[user_id] = {"position": player.position}
+        for user_id in self.damaged:
+            player = self.session.players.get(user_id)
+            if player is not None:
+                entry = changes.setdefault(user_id, {})
+                entry["health"] = player.health
+                entry["is_alive"] = player.is_alive
+        self.moved.clear()
+        self.damaged.clear()
+        return changes
+
+    def _changes_for(self, recipient: str, changes: Dict[str, dict]) -> Dict[str, dict]:
+        visible = self.space.players_near(recipient) if self.space else None
+        players = {}
+        for user_id, entry in changes.items():
+            if user_id == recipient:
+                # Clients own their position; only echo back what the server changed
+                entry = {k: v for k, v in entry.items() if k != "position"}
+            elif visible is not None and user_id not in visible:
+                continue
+            if entry:
+                players[user_id] = entry
+        for user_id in self.revealed.pop(recipient, ()):
+            entry = self._player_entry(user_id)
+            if entry is not None:
+                players[user_id] = entry
+        return players
+
+    def flush(self):
+        if not self.moved and not self.damaged and not self.revealed:
+            return
+        changes = self._collect()
+        self.tick += 1
+        positions = {
+            user_id: changes[user_id]["position"]
+            for user_id in self.local_moved if "position" in changes.get(user_id, {})
+        }
+        self.local_moved.clear()
+        if positions:
+            # One message per tick carries this node's moves to the others
+            self.connections.publish_state(
+                self.session_id,
+                {"type": "tick_positions", "tick": self.tick, "positions": positions}
+            )
+        connections = self.connections.active_connections.get(self.session_id, {})
+        for user_id, connection in connections.items():
+            players = self._changes_for(user_id, changes)
+            if not players:
+                continue
+            if connection.wants_snapshots:
+                connection.enqueue(OutboundMessage(Frame(
+                    {"type": "snapshot", "tick": self.tick, "players": players}
+                )))
+            else:
+                self._send_legacy(connection, players)
+        self.revealed.clear()
+
+    def _send_legacy(self, connection: Connection, players: Dict[str, dict]):
+        # Per-message clients get the coalesced positions as ordinary events
+        for user_id, entry in players.items():
+            if user_id == connection.user_id or "position" not in entry:
+                continue
+            connection.enqueue(OutboundMessage(
+                Frame({
+                    "type": "position_update",
+                    "user_id": user_id,
+                    "position": entry["position"]
+                }),
+                ("position_update", user_id)
+            ))
+
+class TickerRegistry:
+    def __init__(self, connections: ConnectionManager):
+        self.connections = connections
+        # session_id -> SessionTicker
+        self.tickers: Dict[str, SessionTicker] = {}
+
+    def get(self, session_id: str) -> Optional[SessionTicker]:
+        return self.tickers.get(session_id)
+
+    def ensure(
+        self,
+        session_id: str,
+        session: GameSession,
+        space: Optional[SessionSpace] = None
+    ) -> Optional[SessionTicker]:
+        if not session.tick_rate:
+            return None
+        ticker = self.tickers.get(session_id)
+        if ticker is None:
+            ticker = SessionTicker(session_id, session, session.tick_rate, self.connections, space)
+            ticker.start()
+            self.tickers[session_id] = ticker
+        return ticker
+
+    def discard(self, session_id: str):
+        ticker = self.tickers.pop(session_id, None)
+        if ticker is not None:
+            ticker.stop()
+
+    def stop_all(self):
+        for session_id in list(self.tickers):
+            self.discard(session_id)
+
+tickers = TickerRegistry(manager)
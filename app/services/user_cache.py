@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+from app.core.config import settings
+from app.models.models import User
+
+# In-process LRU of authenticated users (with a TTL) and of decoded tokens
+# (until the token expires), so get_current_user doesn't hit MongoDB or
+# re-verify the JWT on every request.
+class UserCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        # user_id -> (expires_at, user)
+        self.users: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        # token -> (exp, user_id)
+        self.tokens: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.token_hits = 0
+        self.token_misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        entry = self.users.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.users[user_id]
+            self.misses += 1
+            return None
+        self.users.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user: User):
+        # Also used after writes to refresh the cached copy
+        if not self.enabled:
+            return
+        user_id = str(user.id)
+        self.users[user_id] = (time.monotonic() + self.ttl, user)
+        self.users.move_to_end(user_id)
+        while len(self.users) > self.max_size:
+            self.users.popitem(last=False)
+
+    async def reload(self, user_id: str) -> Optional[User]:
+        # Invalidation only reaches this process, so a cached copy can predate
+        # another worker's write; checks that would reject on current_session
+        # re-read the user before trusting it
+        self.invalidate(user_id)
+        user = await User.get(user_id)
+        if user is not None:
+            self.put(user)
+        return user
+
+    def invalidate(self, user_id: str):
+        self.users.pop(user_id, None)
+
+    def invalidate_sessions(self, session_ids: Set[str]):
+        # Users whose current_session was cleared in bulk
+        for user_id, (_, user) in list(self.users.items()):
+            if user.current_session in session_ids:
+                del self.users[user_id]
+
+    def get_token_subject(self, token: str) -> Optional[str]:
+        entry = self.tokens.get(token)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self.tokens[token]
+            self.token_misses += 1
+            return None
+        self.tokens.move_to_end(token)
+        self.token_hits += 1
+        return entry[1]
+
+    def put_token(self, token: str, user_id: str, exp: float):
+        if not self.enabled:
+            return
+        self.tokens[token] = (exp, user_id)
+        self.tokens.move_to_end(token)
+        while len(self.tokens) > self.max_size:
+            self.tokens.popitem(last=False)
+
+    def clear(self):
+        self.users.clear()
+        self.tokens.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        token_lookups = self.token_hits + self.token_misses
+        return {
+            "size": len(self.users),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "token_size": len(self.tokens),
+            "token_hits": self.token_hits,
+            "token_misses": self.token_misses,
+            "token_hit_rate": self.token_hits / token_lookups if token_lookups else 0
+        }
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
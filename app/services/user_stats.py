@@ -0,0 +1,90 @@
+from typing import List
+from pymongo import DESCENDING
+from app.core.config import settings
+from app.models.models import GameSave, UserStats, user_ref
+
+RECENT_SCORES = 5
+
+def use_materialized_stats() -> bool:
+    return settings.USER_STATS_SOURCE != "aggregate"
+
+def format_stats(total_games: int, total_score: int, highest_score: int, recent_scores: List[dict]) -> dict:
+    return {
+        "total_games": total_games,
+        "highest_score": highest_score,
+        "average_score": total_score / total_games if total_games else 0,
+        "recent_scores": recent_scores
+    }
+
+async def record_save(user_id: str, save: GameSave):
+    if not use_materialized_stats():
+        return
+    # Single upsert so concurrent saves can't lose each other's counts
+    await UserStats.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {
+            "$inc": {"total_games": 1, "total_score": save.score},
+            "$max": {"highest_score": save.score},
+            "$push": {
+                "recent_scores": {
+                    "$each": [{
+                        "save_name": save.name,
+                        "score": save.score,
+                        "created_at": save.created_at
+                    }],
+                    "$sort": {"created_at": DESCENDING},
+                    "$slice": RECENT_SCORES
+                }
+            }
+        },
+        upsert=True
+    )
+
+async def _aggregate_totals(user_id: str) -> dict:
+    # Fallback for deployments without the stats collection: the same numbers,
+    # computed inside MongoDB from the user's saves
+    pipeline = [
+        {"$match": {"created_by": user_ref(user_id)}},
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "total_games": {"$sum": 1},
+                    "total_score": {"$sum": "$score"},
+                    "highest_score": {"$max": "$score"}
+                }}
+            ],
+            "recent_scores": [
+                {"$sort": {"created_at": DESCENDING}},
+                {"$limit": RECENT_SCORES},
+                {"$project": {"_id": 0, "save_name": "$name", "score": 1, "created_at": 1}}
+            ]
+        }}
+    ]
+    results = await GameSave.get_motor_collection().aggregate(pipeline).to_list(length=1)
+    result = results[0] if results else {"totals": [], "recent_scores": []}
+    totals = result["totals"][0] if result["totals"] else {}
+    return {
+        "total_games": totals.get("total_games", 0),
+        "total_score": totals.get("total_score", 0),
+        "highest_score": totals.get("highest_score", 0),
+        "recent_scores": result["recent_scores"]
+    }
+
+async def aggregate_user_stats(user_id: str) -> dict:
+    return format_stats(**await _aggregate_totals(user_id))
+
+async def get_user_stats(user_id: str) -> dict:
+    if not use_materialized_stats():
+        return await aggregate_user_stats(user_id)
+    stats = await UserStats.find_one({"user_id": user_id})
+    if stats is None:
+        return format_stats(0, 0, 0, [])
+    return format_stats(stats.total_games, stats.total_score, stats.highest_score, stats.recent_scores)
+
+async def rebuild_user_stats(user_id: str):
+    await UserStats.get_motor_collection().update_one(
+        {"user_id": user_id},
+        {"$set": await _aggregate_totals(user_id)},
+        upsert=True
+    )
@@ -0,0 +1,102 @@
+"""Throughput of the vectorized shot line-of-sight check.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_hit_validation
+
+Builds random maps of 1k-100k walls (boxes and segments) and reports shots
+per second for batches of shots resolved together, next to a plain Python
+loop over the walls for comparison. Also checks both give the same answers.
+"""
+import random
+import time
+from types import SimpleNamespace
+from typing import List
+import numpy as np
+from app.services.hit_validation import WallIndex
+
+WORLD_SIZE = 2000.0
+SHOT_RANGE = 60.0
+
+def random_map(walls: int) -> List[SimpleNamespace]:
+    objects = []
+    for i in range(walls):
+        x, y = random.uniform(0, WORLD_SIZE), random.uniform(0, WORLD_SIZE)
+        if i % 4 == 0:
+            angle = random.uniform(0, 6.283)
+            length = random.uniform(1, 10)
+            properties = {"x2": x + length * np.cos(angle), "y2": y + length * np.sin(angle)}
+        else:
+            properties = None
+        objects.append(SimpleNamespace(type="wall", x=x, y=y, properties=properties, owner_id=None))
+    return objects
+
+def random_shots(count: int):
+    origins = np.random.uniform(0, WORLD_SIZE, (count, 2))
+    angles = np.random.uniform(0, 2 * np.pi, count)
+    distances = np.random.uniform(1, SHOT_RANGE, count)
+    targets = origins + np.column_stack((np.cos(angles), np.sin(angles))) * distances[:, None]
+    return origins, targets
+
+def naive_blocked(index: WallIndex, origin, target) -> bool:
+    # Reference: one wall at a time in Python
+    ox, oy = origin
+    dx, dy = target[0] - ox, target[1] - oy
+    for min_x, min_y, max_x, max_y in index.boxes.tolist():
+        t_enter, t_exit = -float("inf"), float("inf")
+        for o, d, low, high in ((ox, dx, min_x, max_x), (oy, dy, min_y, max_y)):
+            if d == 0:
+                if not low <= o <= high:
+                    t_enter, t_exit = float("inf"), -float("inf")
+                continue
+            t1, t2 = (low - o) / d, (high - o) / d
+            t_enter, t_exit = max(t_enter, min(t1, t2)), min(t_exit, max(t1, t2))
+        if t_exit >= t_enter and 0 < t_enter < 1:
+            return True
+    for x1, y1, x2, y2 in index.segments.tolist():
+        ex, ey = x2 - x1, y2 - y1
+        denominator = dx * ey - dy * ex
+        if denominator == 0:
+            continue
+        t = ((x1 - ox) * ey - (y1 - oy) * ex) / denominator
+        u = ((x1 - ox) * dy - (y1 - oy) * dx) / denominator
+        if 0 < t < 1 and 0 <= u <= 1:
+            return True
+    return False
+
+def shots_per_second(fn, shots: int, min_time: float = 0.5) -> float:
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return runs * shots / elapsed
+
+def main(wall_counts=(1_000, 10_000, 100_000), batches=(1, 64, 512), seed: int = 1):
+    random.seed(seed)
+    np.random.seed(seed)
+    print(f"{'walls':>8} {'batch':>6} {'build ms':>9} {'vectorized shots/s':>19} {'python loop shots/s':>20}")
+    for walls in wall_counts:
+        objects = random_map(walls)
+        start = time.perf_counter()
+        index = WallIndex(objects)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        origins, targets = random_shots(200)
+        vectorized = index.blocked(origins, targets)
+        reference = [naive_blocked(index, o, t) for o, t in zip(origins.tolist(), targets.tolist())]
+        assert vectorized.tolist() == reference, "vectorized and reference results differ"
+
+        naive_origins, naive_targets = random_shots(20)
+        naive = shots_per_second(
+            lambda: [naive_blocked(index, o, t) for o, t in zip(naive_origins.tolist(), naive_targets.tolist())],
+            20
+        )
+        for batch in batches:
+            origins, targets = random_shots(batch)
+            rate = shots_per_second(lambda: index.blocked(origins, targets), batch)
+            print(f"{walls:>8} {batch:>6} {build_ms:>9.1f} {rate:>19,.0f} {naive:>20,.0f}")
+
+if __name__ == "__main__":
+    main()
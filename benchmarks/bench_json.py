@@ -0,0 +1,115 @@
+"""Compare FastAPI's default JSON path with FastJSONResponse.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_json
+
+Builds a large session (players, world map, shared objects) and a full save
+of it, then times rendering each the way FastAPI does by default
+(jsonable_encoder + JSONResponse) against FastJSONResponse, and checks both
+produce the same JSON. Documents are built in memory; Beanie is initialised
+against MONGODB_URL=mongomock:// (benchmarks/requirements.txt).
+"""
+import os
+
+# Documents need an initialised Beanie; must be set before the app is imported
+os.environ["MONGODB_URL"] = "mongomock://"
+
+import asyncio
+import json
+import random
+import timeit
+from datetime import datetime, timezone
+from beanie import PydanticObjectId
+from bson import DBRef
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.serialization import FastJSONResponse, orjson
+from app.db.session import init_db
+from app.models.models import GameSave, GameSession, PlayerRole, PlayerState, WorldObject
+
+def world_objects(count: int):
+    kinds = ["wall", "wall", "wall", "enemy", "bonus"]
+    return [
+        WorldObject(
+            type=random.choice(kinds),
+            x=random.uniform(0, 2000),
+            y=random.uniform(0, 2000),
+            properties={"width": 4, "height": 1} if random.random() < 0.2 else None
+        )
+        for _ in range(count)
+    ]
+
+def players(count: int):
+    return {
+        str(PydanticObjectId()): PlayerState(
+            position={"x": random.uniform(0, 2000), "y": random.uniform(0, 2000)},
+            health=random.randint(1, 100),
+            weapons=[{"type": "pistol", "ammo": 12}],
+            effects=["haste"] if random.random() < 0.3 else []
+        )
+        for _ in range(count)
+    }
+
+def large_session(player_count: int, object_count: int) -> GameSession:
+    # Constructed as Beanie returns it from MongoDB: links unfetched
+    host = DBRef("users", PydanticObjectId())
+    session_players = players(player_count)
+    return GameSession.model_validate({
+        "_id": PydanticObjectId(),
+        "name": "benchmark",
+        "host": host,
+        "players": session_players,
+        "player_count": player_count,
+        "max_players": player_count,
+        "world_map": world_objects(object_count),
+        "shared_objects": world_objects(object_count // 20),
+        "game_state": {"scores": {user_id: random.randint(0, 1000) for user_id in session_players}},
+        "player_roles": {user_id: PlayerRole.PLAYER for user_id in session_players}
+    })
+
+def full_save(session: GameSession) -> GameSave:
+    return GameSave.model_validate({
+        "_id": PydanticObjectId(),
+        "session": DBRef("game_sessions", session.id),
+        "name": "benchmark save",
+        "players": session.players,
+        "world_map": session.world_map,
+        "shared_objects": session.shared_objects,
+        "game_state": session.game_state,
+        "created_by": DBRef("users", PydanticObjectId()),
+        "created_at": datetime.now(timezone.utc),
+        "score": 420
+    })
+
+def default_render(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+def fast_render(content) -> bytes:
+    return FastJSONResponse(content).body
+
+def per_call_ms(fn, content) -> float:
+    timer = timeit.Timer(lambda: fn(content))
+    runs, _ = timer.autorange()
+    return min(timer.repeat(3, runs)) / runs * 1000
+
+def main(seed: int = 1):
+    asyncio.run(init_db())
+    random.seed(seed)
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (orjson not installed)'}")
+    print(f"{'payload':<28} {'bytes':>10} {'default ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for player_count, object_count in ((16, 1_000), (64, 10_000), (64, 50_000)):
+        session = large_session(player_count, object_count)
+        for label, content in (
+            (f"session {player_count}p/{object_count}o", session),
+            (f"save {player_count}p/{object_count}o", full_save(session)),
+            ("replay-style dict", {"players": session.players, "world_map": session.world_map})
+        ):
+            default_body, fast_body = default_render(content), fast_render(content)
+            assert json.loads(default_body) == json.loads(fast_body), f"{label}: outputs differ"
+            default_ms = per_call_ms(default_render, content)
+            fast_ms = per_call_ms(fast_render, content)
+            print(f"{label:<28} {len(fast_body):>10,} {default_ms:>11.2f} {fast_ms:>9.2f} {default_ms / fast_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
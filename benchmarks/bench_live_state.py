@@ -0,0 +1,77 @@
+"""Memory used by live players and world objects.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_live_state
+
+Builds players and world objects the way they load from MongoDB (validated
+PlayerState/WorldObject models) and reports bytes per item for the models
+and for the compact live forms sessions swap in (LivePlayer and
+WorldObjectColumns). Also checks both convert back to the same models.
+"""
+import gc
+import random
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, List
+from app.models.models import LivePlayer, PlayerState, WorldObject, WorldObjectColumns
+
+def player_document() -> dict:
+    return {
+        "position": {"x": random.uniform(-500, 500), "y": random.uniform(-500, 500)},
+        "health": random.randint(1, 100),
+        "weapons": [{"type": "pistol", "ammo": 12}] if random.random() < 0.5 else [],
+        "effects": [],
+        "is_alive": True,
+        "last_updated": datetime.now(timezone.utc)
+    }
+
+def object_document() -> dict:
+    kind = random.choice(["wall", "wall", "wall", "enemy", "bonus"])
+    return {
+        "type": kind,
+        "x": random.uniform(0, 2000),
+        "y": random.uniform(0, 2000),
+        "properties": {"value": 10} if kind == "bonus" else None,
+        "owner_id": None
+    }
+
+def allocated(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def report(label: str, count: int, before: int, after: int):
+    print(f"{label:<14} {count:>8} {before / count:>13.0f} {after / count:>13.0f} {before / after:>7.1f}x")
+
+def main(players: int = 10_000, objects: int = 100_000, seed: int = 1):
+    random.seed(seed)
+    player_docs: List[dict] = [player_document() for _ in range(players)]
+    object_docs: List[dict] = [object_document() for _ in range(objects)]
+
+    models = [PlayerState.model_validate(doc) for doc in player_docs]
+    assert [LivePlayer.from_model(m).to_model() for m in models] == models, "players differ after conversion"
+    world = [WorldObject.model_validate(doc) for doc in object_docs]
+    assert WorldObjectColumns.from_models(world).to_models() == world, "world objects differ after conversion"
+    del models, world
+
+    print(f"{'':<14} {'count':>8} {'model B/item':>13} {'live B/item':>13} {'saving':>8}")
+    # Live forms are built through the models, as on session load; only what
+    # they keep once the models are gone is counted
+    report(
+        "players", players,
+        allocated(lambda: [PlayerState.model_validate(doc) for doc in player_docs]),
+        allocated(lambda: [LivePlayer.from_model(PlayerState.model_validate(doc)) for doc in player_docs])
+    )
+    report(
+        "world objects", objects,
+        allocated(lambda: [WorldObject.model_validate(doc) for doc in object_docs]),
+        allocated(lambda: WorldObjectColumns.from_models(WorldObject.model_validate(doc) for doc in object_docs))
+    )
+
+if __name__ == "__main__":
+    main()
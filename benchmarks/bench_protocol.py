@@ -0,0 +1,80 @@
+"""Compare the JSON and binary WebSocket wire formats.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_protocol
+
+Reports encode/decode time per message and bytes on the wire for the
+messages that dominate game traffic.
+"""
+import random
+import timeit
+from app.services.protocol import Frame, binary_codec, json_codec
+
+def user_id() -> str:
+    return "%024x" % random.getrandbits(96)
+
+def snapshot(players: int) -> dict:
+    return {
+        "type": "snapshot",
+        "tick": 12345,
+        "players": {
+            user_id(): {
+                "position": {"x": random.uniform(-500, 500), "y": random.uniform(-500, 500)},
+                "health": float(random.randint(1, 100)),
+                "is_alive": True
+            }
+            for _ in range(players)
+        }
+    }
+
+MESSAGES = {
+    "position_update": {
+        "type": "position_update",
+        "user_id": user_id(),
+        "position": {"x": 123.456789, "y": -987.654321}
+    },
+    "shoot": {
+        "type": "game_action",
+        "user_id": user_id(),
+        "action": {
+            "type": "game_action",
+            "action": "shoot",
+            "target_hit": {"user_id": user_id(), "damage": 25}
+        }
+    },
+    "snapshot_4": snapshot(4),
+    "snapshot_32": snapshot(32),
+}
+
+def bench(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+def main(number: int = 20000, recipients: int = 16):
+    print(f"{'message':<16} {'codec':<7} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for name, message in MESSAGES.items():
+        for codec in (json_codec, binary_codec):
+            payload = codec.encode(message)
+            encode = bench(lambda: codec.encode(message), number)
+            decode = bench(lambda: codec.decode(payload), number)
+            print(f"{name:<16} {codec.name:<7} {len(payload):>6} {encode:>10.2f} {decode:>10.2f}")
+
+    # Broadcast cost: one frame shared by every recipient vs encoding per socket
+    message = MESSAGES["position_update"]
+
+    def per_recipient():
+        for _ in range(recipients):
+            json_codec.encode(message)
+
+    def shared_frame():
+        frame = Frame(message)
+        for _ in range(recipients):
+            frame.encode(json_codec)
+
+    print()
+    print(f"broadcast to {recipients} recipients (us per message)")
+    print(f"  encode per recipient {bench(per_recipient, number // 10):>8.2f}")
+    print(f"  shared frame         {bench(shared_frame, number // 10):>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Worker cold start: time until the app serves traffic and reports ready.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.bench_startup
+
+Each sample is a fresh interpreter that imports app.main, runs the lifespan
+startup and polls /ready until it returns 200, once per MONGODB_INDEXES mode.
+Defaults to MONGODB_URL=mongomock:// (benchmarks/requirements.txt), where
+index builds cost next to nothing; point it at a real MongoDB to see them.
+Also reports the import cost of google.auth, which is now deferred to the
+first Google login.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+def measure():
+    # Runs in the child interpreter
+    started = time.perf_counter()
+    import httpx
+    from app.main import app
+    imported = time.perf_counter()
+
+    async def boot():
+        async with app.router.lifespan_context(app):
+            up = time.perf_counter()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                while (await client.get("/ready")).status_code != 200:
+                    await asyncio.sleep(0.005)
+            return up, time.perf_counter()
+
+    up, ready = asyncio.run(boot())
+    print(json.dumps({"import": imported - started, "startup": up - imported, "ready": ready - started}))
+
+def child(code: str, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(runs: int = 5):
+    mongodb_url = os.environ.get("MONGODB_URL") or "mongomock://"
+    print(f"MONGODB_URL={mongodb_url}, median of {runs} runs (ms)")
+    print(f"{'MONGODB_INDEXES':<16} {'import':>8} {'startup':>8} {'ready':>8}")
+    for mode in ("startup", "background", "skip"):
+        env = {"MONGODB_URL": mongodb_url, "MONGODB_INDEXES": mode, "GOOGLE_CLIENT_ID": ""}
+        samples = [child("from benchmarks.bench_startup import measure; measure()", env) for _ in range(runs)]
+        print(f"{mode:<16}", *(
+            f"{statistics.median(sample[key] for sample in samples) * 1000:>8.1f}"
+            for key in ("import", "startup", "ready")
+        ))
+    google = statistics.median(
+        child(
+            "import json, time; started = time.perf_counter(); import google.auth.jwt; "
+            "print(json.dumps({'import': time.perf_counter() - started}))",
+            {}
+        )["import"]
+        for _ in range(runs)
+    )
+    print(f"\ngoogle.auth import, deferred to the first login: {google * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Load test the REST and WebSocket paths of the API.
+
+Run from the repository root (extra packages in benchmarks/requirements.txt):
+
+    python -m benchmarks.load_test --sessions 4 --clients 8 --duration 30 --output results.json
+    python -m benchmarks.load_test --duration 30 --compare results.json
+
+Serves the app in this process on a free local port with MONGODB_URL=mongomock://
+so no MongoDB is needed. Every session gets --clients WebSocket players sending
+position updates at --rate Hz and shots at --action-rate Hz, while --rest-clients
+users hit /sessions/list, /leaderboard/global and the save/load endpoints.
+
+WebSocket latency is measured per delivery, from the sender's send() to the
+recipient's recv(). Results (throughput, p50/p95/p99 per operation) are printed
+and written as JSON; --compare exits non-zero when p95 latency, throughput or
+error counts regress by more than --threshold against an earlier run.
+"""
+import os
+
+# Never point a load test at a real database; must be set before the app is imported
+os.environ["MONGODB_URL"] = "mongomock://"
+os.environ.setdefault("SECRET_KEY", "load-test")
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import httpx
+import uvicorn
+import websockets
+from app.api.v1.endpoints.auth import create_access_token
+from app.core.config import settings
+from app.main import app
+from app.models.models import User
+
+RESULTS_VERSION = 1
+
+REST_WEIGHTS = {
+    "GET /sessions/list": 4,
+    "GET /leaderboard/global": 4,
+    "POST /saves/create": 1,
+    "POST /saves/{id}/load": 1,
+}
+
+def percentile(ordered: List[float], p: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.sent: Counter = Counter()
+
+    def record(self, operation: str, seconds: float):
+        self.samples[operation].append(seconds)
+
+    def error(self, operation: str):
+        self.errors[operation] += 1
+
+    def summary(self, duration: float) -> Dict[str, dict]:
+        results = {}
+        for operation in sorted(set(self.samples) | set(self.errors)):
+            ordered = sorted(self.samples.get(operation, []))
+            results[operation] = {
+                "count": len(ordered),
+                "errors": self.errors[operation],
+                "throughput_per_s": round(len(ordered) / duration, 2),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+                "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            }
+        return results
+
+async def timed(recorder: Recorder, operation: str, request) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await request
+        response.raise_for_status()
+    except Exception:
+        recorder.error(operation)
+        return None
+    recorder.record(operation, time.perf_counter() - start)
+    return response
+
+async def create_user(index: int) -> Tuple[str, str]:
+    # OAuth needs Google, so benchmark users are inserted directly
+    user = User(
+        email=f"load{index}@example.com",
+        google_id=f"load-{index}",
+        username=f"load{index}"
+    )
+    await user.insert()
+    return str(user.id), await create_access_token({"sub": str(user.id)})
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+async def setup_session(
+    http: httpx.AsyncClient,
+    recorder: Recorder,
+    players: List[Tuple[str, str]],
+    tick_rate: int
+) -> Optional[str]:
+    host_token = players[0][1]
+    response = await timed(recorder, "POST /sessions/create", http.post(
+        "/sessions/create",
+        params={"name": "load test", "max_players": len(players), "tick_rate": tick_rate},
+        headers=auth(host_token)
+    ))
+    if response is None:
+        return None
+    session_id = response.json()["_id"]
+    for _, token in players[1:]:
+        await timed(recorder, "POST /sessions/{id}/join", http.post(
+            f"/sessions/{session_id}/join", headers=auth(token)
+        ))
+    return session_id
+
+class FanoutTracker:
+    # Send times of every position update and shot, keyed the way the server
+    # echoes them back to the other players
+    def __init__(self):
+        self.positions: Dict[Tuple[str, float], float] = {}
+        self.actions: Dict[Tuple[str, int], float] = {}
+
+    def received(self, recorder: Recorder, message: dict, now: float):
+        kind = message.get("type")
+        if kind == "position_update":
+            sent = self.positions.get((message.get("user_id"), message["position"]["x"]))
+            if sent is not None:
+                recorder.record("WS position_update delivery", now - sent)
+        elif kind == "snapshot":
+            for user_id, entry in message["players"].items():
+                if "position" in entry:
+                    sent = self.positions.get((user_id, entry["position"]["x"]))
+                    if sent is not None:
+                        recorder.record("WS position_update delivery", now - sent)
+        elif kind == "game_action":
+            action = message.get("action") or {}
+            sent = self.actions.get((message.get("user_id"), action.get("seq")))
+            if sent is not None:
+                recorder.record("WS game_action delivery", now - sent)
+
+async def ws_receive(websocket, recorder: Recorder, tracker: FanoutTracker):
+    async for raw in websocket:
+        tracker.received(recorder, json.loads(raw), time.perf_counter())
+
+async def ws_client(
+    url: str,
+    user_id: str,
+    peers: List[str],
+    args: argparse.Namespace,
+    recorder: Recorder,
+    tracker: FanoutTracker,
+    deadline: float
+):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        websocket = await websockets.connect(url, max_queue=None)
+    except Exception:
+        recorder.error("WS connect")
+        return
+    recorder.record("WS connect", time.perf_counter() - start)
+    receiver = asyncio.create_task(ws_receive(websocket, recorder, tracker))
+    seq = 0
+    next_position = loop.time() + random.random() / args.rate
+    next_action = loop.time() + random.random() / args.action_rate if args.action_rate else math.inf
+    try:
+        while loop.time() < deadline and not receiver.done():
+            await asyncio.sleep(max(0.0, min(next_position, next_action) - loop.time()))
+            seq += 1
+            if next_position <= next_action:
+                next_position += 1 / args.rate
+                # x carries the sequence number so recipients can match the send time
+                tracker.positions[(user_id, float(seq))] = time.perf_counter()
+                message = {
+                    "type": "position_update",
+                    "position": {"x": float(seq), "y": random.uniform(-50, 50)}
+                }
+            else:
+                next_action += 1 / args.action_rate
+                tracker.actions[(user_id, seq)] = time.perf_counter()
+                message = {"type": "game_action", "action": "shoot", "seq": seq}
+                if peers:
+                    message["target_hit"] = {"user_id": random.choice(peers), "damage": 0}
+            await websocket.send(json.dumps(message))
+            recorder.sent[message["type"]] += 1
+        # Let in-flight deliveries arrive before hanging up
+        await asyncio.sleep(args.drain)
+    except Exception:
+        recorder.error("WS send")
+    finally:
+        receiver.cancel()
+        await websocket.close()
+
+async def rest_client(
+    http: httpx.AsyncClient,
+    token: str,
+    args: argparse.Namespace,
+    recorder: Recorder,
+    deadline: float
+):
+    loop = asyncio.get_running_loop()
+    headers = auth(token)
+    await timed(recorder, "POST /sessions/create", http.post(
+        "/sessions/create", params={"name": "load test saves"}, headers=headers
+    ))
+    save_ids: List[str] = []
+    operations, weights = zip(*REST_WEIGHTS.items())
+    next_request = loop.time() + random.random() / args.rest_rate
+    while loop.time() < deadline:
+        await asyncio.sleep(max(0.0, next_request - loop.time()))
+        next_request += 1 / args.rest_rate
+        operation = random.choices(operations, weights)[0]
+        if operation == "POST /saves/{id}/load" and not save_ids:
+            operation = "POST /saves/create"
+        if operation == "GET /sessions/list":
+            await timed(recorder, operation, http.get("/sessions/list", headers=headers))
+        elif operation == "GET /leaderboard/global":
+            await timed(recorder, operation, http.get("/leaderboard/global", headers=headers))
+        elif operation == "POST /saves/create":
+            response = await timed(recorder, operation, http.post(
+                "/saves/create", params={"name": f"save {len(save_ids)}"}, headers=headers
+            ))
+            if response is not None:
+                save_ids.append(response.json()["_id"])
+        else:
+            await timed(recorder, operation, http.post(
+                f"/saves/{random.choice(save_ids)}/load", headers=headers
+            ))
+
+async def run(args: argparse.Namespace) -> dict:
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=args.port, log_level="warning", ws="websockets"
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+            raise RuntimeError("Server exited during startup")
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    recorder = Recorder()
+    tracker = FanoutTracker()
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}{settings.API_PREFIX}",
+            timeout=30,
+            limits=httpx.Limits(max_connections=max(10, args.rest_clients * 2))
+        ) as http:
+            users = [await create_user(i) for i in range(args.sessions * args.clients + args.rest_clients)]
+            sessions = []
+            for i in range(args.sessions):
+                players = users[i * args.clients:(i + 1) * args.clients]
+                session_id = await setup_session(http, recorder, players, args.tick_rate)
+                if session_id is not None:
+                    sessions.append((session_id, players))
+            rest_users = users[args.sessions * args.clients:]
+
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            deadline = started + args.duration
+            tasks = []
+            for session_id, players in sessions:
+                user_ids = [user_id for user_id, _ in players]
+                for user_id, token in players:
+                    url = f"ws://127.0.0.1:{port}{settings.API_PREFIX}/ws/{session_id}?token={token}"
+                    peers = [other for other in user_ids if other != user_id]
+                    tasks.append(ws_client(url, user_id, peers, args, recorder, tracker, deadline))
+            for _, token in rest_users:
+                tasks.append(rest_client(http, token, args, recorder, deadline))
+            await asyncio.gather(*tasks)
+            duration = loop.time() - started
+    finally:
+        server.should_exit = True
+        await serving
+
+    return {
+        "benchmark": "load_test",
+        "version": RESULTS_VERSION,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "duration_s": round(duration, 3),
+        "messages_sent": dict(recorder.sent),
+        "operations": recorder.summary(duration),
+    }
+
+def print_results(results: dict):
+    print(f"{'operation':<30} {'count':>8} {'errors':>7} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for operation, stats in results["operations"].items():
+        print(
+            f"{operation:<30} {stats['count']:>8} {stats['errors']:>7} {stats['throughput_per_s']:>9.1f}"
+            f" {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for operation, before in baseline["operations"].items():
+        after = results["operations"].get(operation)
+        if after is None:
+            regressions.append(f"{operation}: missing from this run")
+            continue
+        if before["p95_ms"] and after["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{operation}: p95 {before['p95_ms']:.2f} -> {after['p95_ms']:.2f} ms")
+        if after["throughput_per_s"] < before["throughput_per_s"] * (1 - threshold):
+            regressions.append(
+                f"{operation}: throughput {before['throughput_per_s']:.1f} -> {after['throughput_per_s']:.1f}/s"
+            )
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{operation}: errors {before['errors']} -> {after['errors']}")
+    return regressions
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the REST and WebSocket paths")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8, help="WebSocket players per session")
+    parser.add_argument("--rate", type=float, default=20, help="position updates per player per second")
+    parser.add_argument("--action-rate", type=float, default=1, help="shots per player per second")
+    parser.add_argument("--tick-rate", type=int, default=0, help="session tick rate; 0 broadcasts every update")
+    parser.add_argument("--rest-clients", type=int, default=4)
+    parser.add_argument("--rest-rate", type=float, default=10, help="requests per REST client per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--drain", type=float, default=0.5, help="seconds to wait for in-flight messages")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions against", args.compare)
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
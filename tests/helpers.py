@@ -0,0 +1,121 @@
+import asyncio
+import json
+from typing import Callable, List, Optional, Tuple
+
+class FakeWebSocket:
+    # Just enough of starlette's WebSocket for ConnectionManager with the JSON codec
+    def __init__(self):
+        self.sent: List[dict] = []
+        self.close_code: Optional[int] = None
+
+    async def accept(self, subprotocol: Optional[str] = None):
+        pass
+
+    async def send_text(self, data: str):
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+async def eventually(predicate: Callable[[], bool], timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+async def create_user(name: str) -> Tuple[str, str]:
+    # A new user and a bearer token for them
+    from app.api.v1.endpoints.auth import create_access_token
+    from app.models.models import User
+    user = User(email=f"{name}@example.com", google_id=f"google-{name}", username=name)
+    await user.insert()
+    return str(user.id), await create_access_token({"sub": str(user.id)})
+
+def signed_in_user(client, name: str) -> Tuple[str, str]:
+    # create_user on a TestClient's event loop
+    return client.portal.call(create_user, name)
+
+class GoogleStandIn:
+    # Local stand-in for Google's OAuth2 token and signing-certificate
+    # endpoints, served on a free port: point GOOGLE_TOKEN_URL and
+    # GOOGLE_CERTS_URL at token_url and certs_url.
+    def __init__(self, max_age: int = 3600):
+        self.max_age = max_age
+        # key id -> (private key PEM, certificate PEM); only published ones are served
+        self.keys = {}
+        self.published: List[str] = []
+        self.cert_requests = 0
+        self.token_requests: List[dict] = []
+        self.id_token: Optional[str] = None
+        self._server = None
+        self._serving = None
+
+    def add_key(self, key_id: str, publish: bool = True):
+        import datetime
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        self.keys[key_id] = (
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()
+            ),
+            certificate.public_bytes(serialization.Encoding.PEM).decode()
+        )
+        if publish:
+            self.published.append(key_id)
+
+    def sign(self, key_id: str, **claims) -> str:
+        import time
+        from google.auth import crypt, jwt
+        now = int(time.time())
+        payload = {"iss": "https://accounts.google.com", "iat": now, "exp": now + 600, **claims}
+        return jwt.encode(crypt.RSASigner.from_string(self.keys[key_id][0], key_id), payload).decode()
+
+    def _app(self):
+        from starlette.applications import Starlette
+        from starlette.requests import Request
+        from starlette.responses import JSONResponse
+        from starlette.routing import Route
+
+        async def certs(request: Request):
+            self.cert_requests += 1
+            return JSONResponse(
+                {key_id: self.keys[key_id][1] for key_id in self.published},
+                headers={"Cache-Control": f"public, max-age={self.max_age}"}
+            )
+
+        async def token(request: Request):
+            self.token_requests.append(dict(await request.form()))
+            return JSONResponse({"id_token": self.id_token, "token_type": "Bearer"})
+
+        return Starlette(routes=[Route("/certs", certs), Route("/token", token, methods=["POST"])])
+
+    async def start(self):
+        import uvicorn
+        self._server = uvicorn.Server(uvicorn.Config(self._app(), host="127.0.0.1", port=0, log_level="warning"))
+        self._serving = asyncio.create_task(self._server.serve())
+        await eventually(lambda: self._server.started)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        self.certs_url = f"http://127.0.0.1:{port}/certs"
+        self.token_url = f"http://127.0.0.1:{port}/token"
+
+    async def stop(self):
+        self._server.should_exit = True
+        await self._serving
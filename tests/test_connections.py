@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+from beanie import PydanticObjectId
+from app.core.config import settings
+from app.services.connections import SLOW_CONSUMER_CLOSE_CODE, ConnectionManager
+from app.services.metrics import ws_slow_disconnects
+from tests.helpers import FakeWebSocket, eventually
+
+SESSION_ID = str(PydanticObjectId())
+
+class ConnectionManagerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = ConnectionManager()
+        await self.manager.start()
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    async def test_superseded_connection_disconnects_quietly(self):
+        first = await self.manager.connect(FakeWebSocket(), SESSION_ID, "user-1")
+        second = await self.manager.connect(FakeWebSocket(), SESSION_ID, "user-1")
+        self.assertFalse(self.manager.disconnect(SESSION_ID, "user-1", first))
+        self.assertEqual(self.manager.connection_count(SESSION_ID), 1)
+        self.assertTrue(self.manager.disconnect(SESSION_ID, "user-1", second))
+        self.assertEqual(self.manager.connection_count(SESSION_ID), 0)
+
+    async def test_disconnect_without_connection_removes_current(self):
+        websocket = FakeWebSocket()
+        await self.manager.connect(websocket, SESSION_ID, "user-1")
+        self.assertTrue(self.manager.disconnect(SESSION_ID, "user-1"))
+        self.assertFalse(self.manager.disconnect(SESSION_ID, "user-1"))
+
+    async def test_overflowing_queue_closes_once(self):
+        websocket = FakeWebSocket()
+        connection = await self.manager.connect(websocket, SESSION_ID, "user-1")
+        disconnects = ws_slow_disconnects.values.get((), 0)
+        with mock.patch.object(settings, "WS_SEND_QUEUE_SIZE", 2):
+            # Nothing is written until the loop runs, so the queue overflows
+            for i in range(10):
+                self.manager.send_to_user(SESSION_ID, "user-1", {"type": "chat", "text": str(i)})
+        self.assertTrue(connection.closed)
+        self.assertEqual(ws_slow_disconnects.values.get((), 0), disconnects + 1)
+        await eventually(lambda: websocket.close_code is not None)
+        self.assertEqual(websocket.close_code, SLOW_CONSUMER_CLOSE_CODE)
+        self.assertEqual(websocket.sent, [])
+
+class ResumeTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = ConnectionManager()
+        await self.manager.start()
+        await self.manager.connect(FakeWebSocket(), SESSION_ID, "user-1")
+        await self.manager.connect(FakeWebSocket(), SESSION_ID, "user-2")
+        await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": "seen"})
+        self.history = self.manager.histories[SESSION_ID]
+        self.epoch, self.seq = self.history.epoch, self.history.seq
+        self.manager.disconnect(SESSION_ID, "user-2")
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    async def _reconnect(self):
+        websocket = FakeWebSocket()
+        connection = await self.manager.connect(websocket, SESSION_ID, "user-2")
+        return websocket, connection
+
+    async def test_resume_replays_missed_events(self):
+        await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": "missed"})
+        await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": "own"}, exclude_user="user-2")
+        await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": "elsewhere"}, recipients={"user-1"})
+        await self.manager.broadcast_to_session(SESSION_ID, {"type": "position_update", "user_id": "user-1", "position": {}})
+        await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": "also missed"})
+        websocket, connection = await self._reconnect()
+        self.assertTrue(self.manager.resume(connection, self.epoch, self.seq))
+        await eventually(lambda: len(websocket.sent) == 2)
+        self.assertEqual([message["text"] for message in websocket.sent], ["missed", "also missed"])
+        self.assertEqual([message["seq"] for message in websocket.sent], [self.seq + 1, self.seq + 4])
+
+    async def test_resume_with_nothing_missed(self):
+        websocket, connection = await self._reconnect()
+        self.assertTrue(self.manager.resume(connection, self.epoch, self.seq))
+
+    async def test_resume_from_other_epoch_fails(self):
+        _, connection = await self._reconnect()
+        self.assertFalse(self.manager.resume(connection, "restarted", self.seq))
+        self.assertFalse(self.manager.resume(connection, self.epoch, self.seq + 1))
+
+    async def test_resume_past_buffer_fails(self):
+        for i in range(len(self.history.entries) + self.history.entries.maxlen):
+            await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": str(i)}, recipients={"user-1"})
+        _, connection = await self._reconnect()
+        self.assertFalse(self.manager.resume(connection, self.epoch, self.seq))
+
+    async def test_large_gap_falls_back_to_full_state(self):
+        for i in range(3):
+            await self.manager.broadcast_to_session(SESSION_ID, {"type": "chat", "text": str(i)}, recipients={"user-2"})
+        _, connection = await self._reconnect()
+        with mock.patch.object(settings, "WS_SEND_QUEUE_SIZE", 4):
+            self.assertFalse(self.manager.resume(connection, self.epoch, self.seq))
@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+from beanie import PydanticObjectId
+from app.db.session import init_db
+from app.models.models import GameEvent
+from app.services.event_journal import EventJournal
+
+SESSION_ID = str(PydanticObjectId())
+
+class EventJournalTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        self.events = GameEvent.get_motor_collection()
+        await self.events.delete_many({})
+        self.journal = EventJournal(batch_size=100, flush_interval=0, max_buffer=1000)
+
+    def _record(self, count: int):
+        for i in range(count):
+            self.journal.record(SESSION_ID, "move", "user-1", {"position": {"x": i, "y": 0}})
+
+    async def test_retry_after_partial_write_drops_stored_events(self):
+        self._record(4)
+        insert_many = self.events.insert_many
+
+        async def fail_after_two(documents, **kwargs):
+            # Two events reach MongoDB, then the connection drops
+            await insert_many(documents[:2], **kwargs)
+            raise ConnectionError("connection reset")
+
+        with mock.patch.object(type(self.events), "insert_many", side_effect=fail_after_two):
+            await self.journal.flush()
+        # insert_many gave every event its _id; all four are re-queued
+        self.assertEqual(len(self.journal.buffer), 4)
+        await self.journal.flush()
+        self.assertEqual(self.journal.buffer, [])
+        self.assertEqual(await self.events.count_documents({"session_id": SESSION_ID}), 4)
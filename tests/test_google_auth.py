@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import httpx
+from google.auth import exceptions
+from app.core.config import settings
+from app.db.session import init_db
+from app.main import app
+from app.models.models import User
+from app.services.google_certs import GoogleCertificates, google_certs
+from app.services.http_client import http_client
+from tests.helpers import GoogleStandIn
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+class GoogleStandInTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.google = GoogleStandIn(max_age=300)
+        self.google.add_key("key-1")
+        await self.google.start()
+        self.certs = GoogleCertificates(self.google.certs_url)
+
+    async def asyncTearDown(self):
+        await http_client.close()
+        await self.google.stop()
+
+    async def test_certs_are_cached_for_max_age(self):
+        token = self.google.sign("key-1", aud=CLIENT_ID, sub="1")
+        for _ in range(3):
+            idinfo = await self.certs.verify_oauth2_token(token, CLIENT_ID)
+        self.assertEqual(idinfo["sub"], "1")
+        self.assertEqual(self.google.cert_requests, 1)
+
+    async def test_certs_expire_after_max_age(self):
+        self.google.max_age = 0
+        token = self.google.sign("key-1", aud=CLIENT_ID, sub="1")
+        await self.certs.verify_oauth2_token(token, CLIENT_ID)
+        await self.certs.verify_oauth2_token(token, CLIENT_ID)
+        self.assertEqual(self.google.cert_requests, 2)
+
+    async def test_unknown_key_id_forces_refresh(self):
+        await self.certs.get()
+        # Google rotates in a key the cached certificates don't have yet
+        self.google.add_key("key-2")
+        idinfo = await self.certs.verify_oauth2_token(self.google.sign("key-2", aud=CLIENT_ID, sub="2"), CLIENT_ID)
+        self.assertEqual(idinfo["sub"], "2")
+        self.assertEqual(self.google.cert_requests, 2)
+
+    async def test_unpublished_key_is_rejected(self):
+        self.google.add_key("rogue", publish=False)
+        with self.assertRaises(ValueError):
+            await self.certs.verify_oauth2_token(self.google.sign("rogue", aud=CLIENT_ID, sub="3"), CLIENT_ID)
+
+    async def test_wrong_issuer_is_rejected(self):
+        token = self.google.sign("key-1", aud=CLIENT_ID, sub="1", iss="https://evil.example.com")
+        with self.assertRaises(exceptions.GoogleAuthError):
+            await self.certs.verify_oauth2_token(token, CLIENT_ID)
+
+    async def test_callback_exchanges_code_at_token_endpoint(self):
+        await init_db()
+        self.google.id_token = self.google.sign("key-1", aud=CLIENT_ID, sub="google-42", email="player@example.com")
+        with mock.patch.object(settings, "GOOGLE_TOKEN_URL", self.google.token_url), \
+                mock.patch.object(settings, "GOOGLE_CLIENT_ID", CLIENT_ID), \
+                mock.patch.object(google_certs, "url", self.google.certs_url):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get(
+                    f"{settings.API_PREFIX}/auth/google/callback", params={"code": "auth-code", "state": "s"}
+                )
+        self.assertEqual(response.status_code, 307)
+        self.assertIn("token", parse_qs(urlparse(response.headers["location"]).query))
+        self.assertEqual(self.google.token_requests[0]["code"], "auth-code")
+        user = await User.find_one({"google_id": "google-42"})
+        self.assertEqual(user.email, "player@example.com")
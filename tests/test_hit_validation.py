@@ -0,0 +1,36 @@
+import unittest
+from beanie import PydanticObjectId
+from bson import DBRef
+from app.db.session import init_db
+from app.models.models import GameSession, PlayerState, WorldObject
+from app.services.hit_validation import HitResolver, WallIndex, validate_shot
+
+class ValidateShotTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        self.session = GameSession.model_validate({
+            "name": "shots",
+            "host": DBRef("users", PydanticObjectId()),
+            "players": {
+                "shooter": PlayerState(position={"x": 0, "y": 0}),
+                "target": PlayerState(position={"x": 10, "y": 0}),
+                "hidden": PlayerState(position={"x": 0, "y": 10})
+            },
+            "world_map": [WorldObject(type="wall", x=0, y=5)]
+        })
+        self.resolver = HitResolver(WallIndex(self.session.world_map), 0)
+
+    async def _shoot(self, target_id: str, damage=10):
+        return await validate_shot(self.resolver, self.session, "shooter", {"user_id": target_id, "damage": damage})
+
+    async def test_clear_shot_hits(self):
+        self.assertEqual(await self._shoot("target", 7.6), {"user_id": "target", "damage": 8})
+
+    async def test_self_hit_is_rejected(self):
+        self.assertIsNone(await self._shoot("shooter"))
+
+    async def test_shot_through_wall_is_rejected(self):
+        self.assertIsNone(await self._shoot("hidden"))
+
+    async def test_unknown_target_is_rejected(self):
+        self.assertIsNone(await self._shoot("nobody"))
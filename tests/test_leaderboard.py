@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+import httpx
+from beanie import PydanticObjectId
+from bson import DBRef
+from app.core.config import settings
+from app.db.session import init_db
+from app.main import app
+from app.models.models import GameSave
+from app.services.response_cache import LEADERBOARD, response_cache
+
+class GlobalLeaderboardTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        response_cache.invalidate(LEADERBOARD)
+        await GameSave.get_motor_collection().delete_many({})
+        await GameSave.get_motor_collection().insert_many([
+            {
+                "session": DBRef("game_sessions", PydanticObjectId()),
+                "created_by": DBRef("users", PydanticObjectId()),
+                "name": f"save-{i}",
+                "score": i,
+                "username": "player",
+                "created_at": datetime.now(timezone.utc)
+            }
+            for i in range(5)
+        ])
+
+    async def _leaderboard(self, limit: int) -> list:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(f"{settings.API_PREFIX}/leaderboard/global", params={"limit": limit})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_limit_is_clamped(self):
+        with mock.patch.object(settings, "LEADERBOARD_MAX_LIMIT", 3):
+            self.assertEqual([entry["score"] for entry in await self._leaderboard(1000)], [4, 3, 2])
+            self.assertEqual(len(await self._leaderboard(0)), 1)
+            self.assertEqual(len(await self._leaderboard(-5)), 1)
+
+    async def test_weak_etag_gets_not_modified(self):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            url = f"{settings.API_PREFIX}/leaderboard/global"
+            etag = (await client.get(url)).headers["etag"]
+            for if_none_match in (etag, f"W/{etag}", f'"other", W/{etag}'):
+                response = await client.get(url, headers={"If-None-Match": if_none_match})
+                self.assertEqual(response.status_code, 304)
+            response = await client.get(url, headers={"If-None-Match": 'W/"other"'})
+            self.assertEqual(response.status_code, 200)
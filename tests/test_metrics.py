@@ -0,0 +1,18 @@
+import unittest
+from app.services.metrics import Counter, Gauge, Metric
+
+class MetricTest(unittest.TestCase):
+    def test_metric_without_samples_cannot_be_created(self):
+        with self.assertRaises(TypeError):
+            Metric("dungeon_untyped", "No samples")
+
+    def test_render(self):
+        counter = Counter("dungeon_events_total", "Events", ("type",))
+        counter.inc("move")
+        counter.inc("move", amount=2)
+        self.assertEqual(
+            counter.render(),
+            '# HELP dungeon_events_total Events\n# TYPE dungeon_events_total counter\ndungeon_events_total{type="move"} 3'
+        )
+        gauge = Gauge("dungeon_sessions", "Sessions", function=lambda: {(): 4})
+        self.assertEqual(gauge.samples(), ["dungeon_sessions 4"])
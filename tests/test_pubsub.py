@@ -0,0 +1,206 @@
+import asyncio
+import json
+import unittest
+from beanie import PydanticObjectId
+from bson import DBRef
+from app.db.session import init_db
+from app.db.repositories import session_repository
+from app.models.models import GameSession, PlayerRole, PlayerState, link_id
+from app.services.connections import ConnectionManager
+from app.services.live_sessions import LiveSession, live_sessions
+from app.services.pubsub import LocalBroker, SessionRouter, serve_local_broker, session_channel
+from app.services.ticker import SessionTicker, tickers
+from tests.helpers import FakeWebSocket, eventually
+
+SESSION_ID = str(PydanticObjectId())
+
+class LocalBrokerTest(unittest.IsolatedAsyncioTestCase):
+    # Two nodes (ConnectionManagers) talking through the local stand-in broker
+    async def asyncSetUp(self):
+        self.server = await serve_local_broker("127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.managers = [self._node(f"node-{i}") for i in range(2)]
+        for manager in self.managers:
+            await manager.start()
+        self.sockets = []
+        for i, manager in enumerate(self.managers):
+            websocket = FakeWebSocket()
+            await manager.connect(websocket, SESSION_ID, f"user-{i}")
+            self.sockets.append(websocket)
+        await self._wait_connected()
+
+    async def asyncTearDown(self):
+        for manager in self.managers:
+            await manager.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _node(self, node_id: str) -> ConnectionManager:
+        broker = LocalBroker(f"tcp://127.0.0.1:{self.port}")
+        broker.reconnect_delay = 0.05
+        return ConnectionManager(broker, SessionRouter([], node_id), node_id)
+
+    async def _wait_connected(self):
+        await eventually(lambda: all(manager.broker.connected for manager in self.managers))
+        # Subscribes are queued behind the connect; give the broker a moment
+        await asyncio.sleep(0.05)
+
+    def _received(self, index: int, kind: str):
+        return [message for message in self.sockets[index].sent if message["type"] == kind]
+
+    async def test_broadcast_reaches_other_node(self):
+        await self.managers[0].broadcast_to_session(SESSION_ID, {"type": "chat", "text": "hi"})
+        await eventually(lambda: self._received(1, "chat"))
+        self.assertEqual(self._received(1, "chat")[0]["text"], "hi")
+
+    async def test_own_echo_is_dropped(self):
+        await self.managers[0].broadcast_to_session(SESSION_ID, {"type": "chat", "text": "once"})
+        await eventually(lambda: self._received(1, "chat"))
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self._received(0, "chat")), 1)
+
+    async def test_exclude_user_applies_on_other_nodes(self):
+        await self.managers[0].broadcast_to_session(SESSION_ID, {"type": "chat", "text": "x"}, exclude_user="user-1")
+        await self.managers[0].broadcast_to_session(SESSION_ID, {"type": "chat", "text": "y"})
+        await eventually(lambda: self._received(1, "chat"))
+        self.assertEqual([message["text"] for message in self._received(1, "chat")], ["y"])
+
+    async def test_announcements_reach_owner_node_with_routing(self):
+        # REST calls aren't routed: the node serving a join may not own the session
+        for manager in self.managers:
+            manager.router = SessionRouter([manager.node_id for manager in self.managers], manager.node_id)
+        await self.managers[0].broadcast_to_session(SESSION_ID, {"type": "chat", "text": "local"})
+        await self.managers[0].announce(SESSION_ID, {"type": "player_joined", "user_id": "user-2"})
+        await eventually(lambda: self._received(1, "player_joined"))
+        self.assertEqual(self._received(0, "player_joined")[0]["user_id"], "user-2")
+        self.assertEqual(self._received(1, "chat"), [])
+
+    async def test_tick_moves_reach_other_node(self):
+        from app.api.v1.endpoints.websocket import apply_remote_message
+        await init_db()
+        # Each node's copy of a tick-mode session, with both players in it
+        copies = [
+            GameSession.model_validate({
+                "_id": PydanticObjectId(SESSION_ID),
+                "name": "tick",
+                "host": DBRef("users", PydanticObjectId()),
+                "tick_rate": 10,
+                "players": {f"user-{i}": PlayerState(position={"x": 0, "y": 0}) for i in range(2)}
+            })
+            for _ in self.managers
+        ]
+        origin = SessionTicker(SESSION_ID, copies[0], 10, self.managers[0])
+        live_sessions.sessions[SESSION_ID] = LiveSession(copies[1])
+        tickers.tickers[SESSION_ID] = SessionTicker(SESSION_ID, copies[1], 10, self.managers[1])
+        self.addCleanup(live_sessions.sessions.pop, SESSION_ID, None)
+        self.addCleanup(tickers.tickers.pop, SESSION_ID, None)
+        self.managers[1].remote_handler = apply_remote_message
+
+        copies[0].players["user-0"].position = {"x": 7.0, "y": 8.0}
+        origin.mark_position("user-0")
+        origin.flush()
+        await eventually(lambda: tickers.get(SESSION_ID).moved)
+        self.assertEqual(copies[1].players["user-0"].position, {"x": 7.0, "y": 8.0})
+        tickers.get(SESSION_ID).flush()
+        await eventually(lambda: self._received(1, "position_update"))
+        self.assertEqual(self._received(1, "position_update")[0]["position"], {"x": 7.0, "y": 8.0})
+        # The batch itself is for nodes, not clients, and isn't sent back
+        self.assertEqual(self._received(1, "tick_positions"), [])
+        self.assertFalse(tickers.get(SESSION_ID).local_moved)
+
+    async def test_resubscribes_after_reconnect(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for manager in self.managers:
+            # Drop the live client connections so both nodes notice
+            manager.broker._writer.close()
+        await eventually(lambda: not any(manager.broker.connected for manager in self.managers))
+        self.server = await serve_local_broker("127.0.0.1", self.port)
+        await self._wait_connected()
+        await self.managers[1].broadcast_to_session(SESSION_ID, {"type": "chat", "text": "back"})
+        await eventually(lambda: self._received(0, "chat"))
+        self.assertEqual(self._received(0, "chat")[0]["text"], "back")
+
+HOST_ID = str(PydanticObjectId())
+
+class RemoteStateTest(unittest.IsolatedAsyncioTestCase):
+    # Moves and hits made on another node update this node's live session
+    async def asyncSetUp(self):
+        await init_db()
+        await GameSession.get_motor_collection().delete_many({})
+        session = GameSession.model_validate({
+            "_id": PydanticObjectId(SESSION_ID),
+            "name": "remote",
+            "host": DBRef("users", PydanticObjectId(HOST_ID)),
+            "players": {
+                "shooter": PlayerState(position={"x": 0, "y": 0}),
+                "target": PlayerState(position={"x": 1, "y": 1}, health=10)
+            },
+            "player_roles": {"shooter": PlayerRole.PLAYER, "target": PlayerRole.PLAYER},
+            "player_count": 2
+        })
+        await session.insert()
+        live_sessions.sessions[SESSION_ID] = LiveSession(session)
+
+    async def asyncTearDown(self):
+        live_sessions.sessions.pop(SESSION_ID, None)
+
+    def _receive(self, *messages: dict):
+        from app.api.v1.endpoints.websocket import apply_remote_message
+        node = ConnectionManager(node="local")
+        node.remote_handler = apply_remote_message
+        for message in messages:
+            envelope = {"node": "remote", "exclude_user": None, "message": message}
+            node._receive(session_channel(SESSION_ID), json.dumps(envelope).encode())
+
+    async def test_remote_joins_and_leaves_are_applied(self):
+        joiner = str(PydanticObjectId())
+        self._receive(
+            {
+                "type": "player_joined",
+                "user_id": joiner,
+                "role": "player",
+                "player": PlayerState(position={"x": 2, "y": 2}).model_dump(mode="json")
+            },
+            {"type": "player_left", "user_id": "shooter", "host": joiner, "closed": False}
+        )
+        session = live_sessions.get(SESSION_ID)
+        self.assertEqual(set(session.players), {"target", joiner})
+        self.assertEqual(session.player_count, 2)
+        self.assertEqual(session.players[joiner].position, {"x": 2, "y": 2})
+        self.assertEqual(session.player_roles[joiner], PlayerRole.HOST)
+        self.assertEqual(link_id(session.host), joiner)
+        self._receive({"type": "player_left", "user_id": "target", "host": None, "closed": True})
+        self.assertFalse(session.is_active)
+
+    async def test_acquire_syncs_players_joined_elsewhere(self):
+        # Joined through another node before this one heard about it
+        joiner = str(PydanticObjectId())
+        await session_repository.add_player(SESSION_ID, joiner, PlayerState(position={"x": 5, "y": 5}), PlayerRole.PLAYER)
+        live_sessions.sessions[SESSION_ID].connections = 1
+        session = await live_sessions.acquire(SESSION_ID, joiner)
+        self.assertEqual(session.players[joiner].position, {"x": 5.0, "y": 5.0})
+        self.assertEqual(session.player_count, 3)
+
+    async def test_acquire_syncs_lingering_session(self):
+        # Left through another node while this node had no sockets for it
+        await session_repository.remove_player(SESSION_ID, "target")
+        session = await live_sessions.acquire(SESSION_ID, "shooter")
+        self.assertEqual(set(session.players), {"shooter"})
+        self.assertEqual(live_sessions.sessions[SESSION_ID].connections, 1)
+
+    async def test_remote_moves_and_hits_are_applied(self):
+        self._receive(
+            {"type": "position_update", "user_id": "shooter", "position": {"x": 5, "y": 6}},
+            {
+                "type": "game_action",
+                "user_id": "shooter",
+                "action": {"type": "game_action", "action": "shoot", "target_hit": {"user_id": "target", "damage": 10}}
+            }
+        )
+        session = live_sessions.get(SESSION_ID)
+        self.assertEqual(session.players["shooter"].position, {"x": 5, "y": 6})
+        self.assertEqual(session.players["target"].health, 0)
+        self.assertFalse(session.players["target"].is_alive)
+        # Only the node the change came from persists it
+        self.assertFalse(live_sessions.sessions[SESSION_ID].dirty)
@@ -0,0 +1,116 @@
+import unittest
+from datetime import timedelta
+from unittest import mock
+import httpx
+from app.core.config import settings
+from app.db.repositories import session_repository
+from app.db.session import init_db
+from app.main import app
+from app.models.models import GameSession, PlayerRole, PlayerState, User, WorldObject, user_ref, utc_now
+from app.services.live_sessions import LiveSession, LiveSessionStore
+from app.services.session_reaper import SessionReaper
+from app.services.user_cache import user_cache
+from tests.helpers import create_user
+
+WORLD_MAP = [WorldObject(type="wall", x=1, y=2), WorldObject(type="enemy", x=3, y=4)]
+
+class SessionReaperTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        await GameSession.get_motor_collection().delete_many({})
+        user_cache.clear()
+        self.store = LiveSessionStore(0)
+        self.reaper = SessionReaper(interval=0, idle_timeout=60, store=self.store)
+        self.host_id, self.host_token = await create_user("host")
+        self.session = await self._session(idle_for=timedelta(hours=1))
+
+    async def _session(self, idle_for: timedelta) -> GameSession:
+        session = GameSession(
+            name="idle",
+            host=user_ref(self.host_id),
+            players={self.host_id: PlayerState(position={"x": 0, "y": 0})},
+            player_roles={self.host_id: PlayerRole.HOST},
+            player_count=1,
+            world_map=WORLD_MAP
+        )
+        await session.insert()
+        await GameSession.get_motor_collection().update_one(
+            {"_id": session.id}, {"$set": {"last_updated": utc_now() - idle_for}}
+        )
+        await User.get_motor_collection().update_one(
+            {"_id": user_ref(self.host_id).id}, {"$set": {"current_session": str(session.id)}}
+        )
+        return session
+
+    async def _stored(self) -> GameSession:
+        return await GameSession.get(self.session.id)
+
+    async def _join(self, name: str) -> httpx.Response:
+        _, token = await create_user(name)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(
+                f"{settings.API_PREFIX}/sessions/{self.session.id}/join",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+
+    async def test_reap_hibernate_and_wake_on_join(self):
+        self.assertEqual(await self.reaper.reap(), 1)
+        stored = await self._stored()
+        self.assertFalse(stored.is_active)
+        self.assertIsNotNone(stored.hibernated_at)
+        self.assertIsNotNone(stored.world_map_hash)
+        self.assertEqual(stored.world_map, [])
+        self.assertIsNone((await User.get(self.host_id)).current_session)
+
+        response = await self._join("joiner")
+        self.assertEqual(response.status_code, 200)
+        stored = await self._stored()
+        self.assertTrue(stored.is_active)
+        self.assertIsNone(stored.hibernated_at)
+        self.assertIsNone(stored.world_map_hash)
+        self.assertEqual(stored.world_map, WORLD_MAP)
+        self.assertEqual(stored.player_count, 2)
+
+    async def test_deactivate_keeps_world_map(self):
+        with mock.patch.object(settings, "SESSION_IDLE_ACTION", "deactivate"):
+            self.assertEqual(await self.reaper.reap(), 1)
+        stored = await self._stored()
+        self.assertFalse(stored.is_active)
+        self.assertIsNone(stored.world_map_hash)
+        self.assertEqual(stored.world_map, WORLD_MAP)
+        self.assertEqual((await self._join("joiner")).status_code, 200)
+        self.assertTrue((await self._stored()).is_active)
+
+    async def test_recent_sessions_are_kept(self):
+        await GameSession.get_motor_collection().update_one(
+            {"_id": self.session.id}, {"$set": {"last_updated": utc_now()}}
+        )
+        self.assertEqual(await self.reaper.reap(), 0)
+        self.assertTrue((await self._stored()).is_active)
+
+    async def test_sessions_live_on_this_node_are_kept(self):
+        live = LiveSession(await self._stored())
+        live.connections = 1
+        self.store.sessions[str(self.session.id)] = live
+        self.assertEqual(await self.reaper.reap(), 0)
+        # The heartbeat also keeps other nodes' reapers off it
+        self.assertGreater(
+            (await self._stored()).last_updated.replace(tzinfo=None),
+            (utc_now() - timedelta(seconds=5)).replace(tzinfo=None)
+        )
+
+    async def test_activity_after_find_idle_wins(self):
+        cutoff = utc_now() - timedelta(seconds=60)
+        candidates = await session_repository.find_idle(cutoff, [], 10, world_map=False)
+        self.assertEqual([document["_id"] for document in candidates], [self.session.id])
+        await session_repository.touch([str(self.session.id)])
+        self.assertFalse(await session_repository.deactivate_idle(self.session.id, cutoff))
+        self.assertTrue((await self._stored()).is_active)
+
+    async def test_wake_only_reactivates_reaped_sessions(self):
+        self.assertFalse(await session_repository.wake(str(self.session.id), None))
+        # Closed by its last player leaving, not by the reaper
+        await session_repository.remove_player(str(self.session.id), self.host_id)
+        self.assertTrue(await session_repository.close_if_empty(str(self.session.id)))
+        self.assertFalse(await session_repository.wake(str(self.session.id), None))
+        self.assertFalse((await self._stored()).is_active)
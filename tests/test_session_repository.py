@@ -0,0 +1,93 @@
+import unittest
+import httpx
+from beanie import PydanticObjectId
+from app.core.config import settings
+from app.db.repositories import session_repository
+from app.db.session import init_db
+from app.main import app
+from app.models.models import GameSession, PlayerRole, PlayerState, link_id, user_ref
+from tests.helpers import create_user
+
+def player() -> PlayerState:
+    return PlayerState(position={"x": 0, "y": 0})
+
+class GameSessionRepositoryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        await GameSession.get_motor_collection().delete_many({})
+        self.host_id, self.host_token = await create_user("host")
+        session = GameSession(
+            name="repository",
+            host=user_ref(self.host_id),
+            players={self.host_id: player()},
+            player_roles={self.host_id: PlayerRole.HOST},
+            player_count=1,
+            max_players=2
+        )
+        await session.insert()
+        self.session_id = str(session.id)
+
+    async def _stored(self) -> GameSession:
+        return await GameSession.get(self.session_id)
+
+    async def test_add_player_checks_capacity(self):
+        self.assertTrue(await session_repository.add_player(self.session_id, "second", player(), PlayerRole.PLAYER))
+        self.assertFalse(await session_repository.add_player(self.session_id, "third", player(), PlayerRole.PLAYER))
+        stored = await self._stored()
+        self.assertEqual(set(stored.players), {self.host_id, "second"})
+        self.assertEqual(stored.player_count, 2)
+        self.assertEqual(stored.player_roles["second"], PlayerRole.PLAYER)
+
+    async def test_add_player_twice_or_to_inactive_session_fails(self):
+        self.assertFalse(await session_repository.add_player(self.session_id, self.host_id, player(), PlayerRole.PLAYER))
+        await GameSession.get_motor_collection().update_one(
+            {"_id": (await self._stored()).id}, {"$set": {"is_active": False}}
+        )
+        self.assertFalse(await session_repository.add_player(self.session_id, "second", player(), PlayerRole.PLAYER))
+        self.assertEqual((await self._stored()).player_count, 1)
+
+    async def test_join_full_session_over_rest(self):
+        await session_repository.add_player(self.session_id, "second", player(), PlayerRole.PLAYER)
+        _, token = await create_user("late")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                f"{settings.API_PREFIX}/sessions/{self.session_id}/join",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Session is full")
+        self.assertEqual((await self._stored()).player_count, 2)
+
+    async def test_remove_player_and_transfer_host(self):
+        second, stranger = str(PydanticObjectId()), str(PydanticObjectId())
+        await session_repository.add_player(self.session_id, second, player(), PlayerRole.PLAYER)
+        remaining = await session_repository.remove_player(self.session_id, self.host_id)
+        self.assertEqual(set(remaining["players"]), {second})
+        self.assertIsNone(await session_repository.remove_player(self.session_id, self.host_id))
+        self.assertFalse(await session_repository.close_if_empty(self.session_id))
+        # Only from the current host, and only to a player still in the session
+        self.assertFalse(await session_repository.transfer_host(self.session_id, second, second))
+        self.assertFalse(await session_repository.transfer_host(self.session_id, self.host_id, stranger))
+        self.assertTrue(await session_repository.transfer_host(self.session_id, self.host_id, second))
+        stored = await self._stored()
+        self.assertEqual(link_id(stored.host), second)
+        self.assertEqual(stored.player_roles[second], PlayerRole.HOST)
+
+    async def test_host_leaving_hands_over_or_closes(self):
+        other_id, other_token = await create_user("other")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            def post(action: str, token: str):
+                return client.post(
+                    f"{settings.API_PREFIX}/sessions/{self.session_id}/{action}",
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+            self.assertEqual((await post("join", other_token)).status_code, 200)
+            self.assertEqual((await post("leave", self.host_token)).status_code, 200)
+            stored = await self._stored()
+            self.assertEqual(link_id(stored.host), other_id)
+            self.assertEqual(stored.player_roles[other_id], PlayerRole.HOST)
+            self.assertTrue(stored.is_active)
+            self.assertEqual((await post("leave", other_token)).status_code, 200)
+        stored = await self._stored()
+        self.assertEqual(stored.player_count, 0)
+        self.assertFalse(stored.is_active)
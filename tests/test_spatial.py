@@ -0,0 +1,38 @@
+import math
+import unittest
+from beanie import PydanticObjectId
+from bson import DBRef
+from app.db.session import init_db
+from app.models.models import GameSession, PlayerState, WorldObject
+from app.services.spatial import SessionSpace, position_xy
+
+class SessionSpaceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+
+    def test_non_finite_positions_have_no_xy(self):
+        for position in ({"x": math.inf, "y": 0}, {"x": 0, "y": math.nan}, {"x": "1e999", "y": 0}, {"x": 1}, None):
+            self.assertIsNone(position_xy(position))
+        self.assertEqual(position_xy({"x": 1, "y": "2.5"}), (1.0, 2.5))
+
+    def test_space_skips_non_finite_players_and_objects(self):
+        # As stored by a session that accepted an inf position before validation
+        session = GameSession.model_validate({
+            "name": "space",
+            "host": DBRef("users", PydanticObjectId()),
+            "players": {
+                "lost": PlayerState(position={"x": math.inf, "y": 1}),
+                "near": PlayerState(position={"x": 1, "y": 1}),
+                "other": PlayerState(position={"x": 2, "y": 2})
+            },
+            "world_map": [
+                WorldObject(type="wall", x=math.nan, y=0),
+                WorldObject(type="wall", x=3, y=3)
+            ]
+        })
+        space = SessionSpace(session, radius=50, cell_size=50)
+        self.assertNotIn("lost", space.players.positions)
+        self.assertEqual(space.players_near("near"), {"other"})
+        self.assertEqual([obj.x for obj in space.objects_near("near")], [3])
+        self.assertEqual(space.move_player("near", {"x": 1e999, "y": 0}), set())
+        self.assertEqual(space.players.positions["near"], (1.0, 1.0))
@@ -0,0 +1,30 @@
+import unittest
+from beanie import PydanticObjectId
+from app.api.v1.endpoints.auth import create_access_token, get_current_user
+from app.db.session import init_db
+from app.models.models import User
+from app.services.user_cache import user_cache
+
+class UserCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        await init_db()
+        user_cache.clear()
+        self.user = User(email="player@example.com", google_id="google-1", username="player")
+        await self.user.insert()
+        self.token = await create_access_token({"sub": str(self.user.id)})
+
+    async def test_reload_sees_another_workers_write(self):
+        cached = await get_current_user(self.token)
+        session_id = str(PydanticObjectId())
+        # Another worker joins the session; only its own cache is refreshed
+        await User.find_one(User.id == self.user.id).update({"$set": {"current_session": session_id}})
+        self.assertIsNone((await get_current_user(self.token)).current_session)
+        fresh = await user_cache.reload(str(cached.id))
+        self.assertEqual(fresh.current_session, session_id)
+        self.assertEqual((await get_current_user(self.token)).current_session, session_id)
+
+    async def test_reload_of_deleted_user(self):
+        await get_current_user(self.token)
+        await self.user.delete()
+        self.assertIsNone(await user_cache.reload(str(self.user.id)))
+        self.assertIsNone(user_cache.get_user(str(self.user.id)))
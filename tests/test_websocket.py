@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+from starlette.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.models.models import GameSession
+from app.services.live_sessions import live_sessions
+from tests.helpers import eventually, signed_in_user
+
+class WebSocketTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+        self.user_id, self.token = signed_in_user(self.client, "player")
+        response = self.client.post(
+            f"{settings.API_PREFIX}/sessions/create",
+            params={"name": "ws"},
+            headers={"Authorization": f"Bearer {self.token}"}
+        )
+        self.session_id = response.json()["_id"]
+
+    def _connect(self):
+        return self.client.websocket_connect(f"{settings.API_PREFIX}/ws/{self.session_id}?token={self.token}")
+
+    def _unload(self):
+        # Wait for the last socket's release, write the session back and drop
+        # the live copy, so the next connect loads it from MongoDB
+        async def unload():
+            await eventually(lambda: live_sessions.sessions[self.session_id].connections == 0)
+            await live_sessions.flush_session(self.session_id)
+            live = live_sessions.sessions.pop(self.session_id)
+            if live.evict_handle is not None:
+                live.evict_handle.cancel()
+        self.client.portal.call(unload)
+
+    def test_invalid_positions_are_dropped(self):
+        with mock.patch.object(settings, "AOI_RADIUS", 50):
+            with self._connect() as websocket:
+                self.assertEqual(websocket.receive_json()["type"], "session_state")
+                websocket.send_json({"type": "position_update", "position": {"x": 3, "y": 4}})
+                for position in ({"x": "abc", "y": 1}, {"x": 1e999, "y": 1}, {"x": 1}, [1, 2], {"x": True, "y": 1}):
+                    websocket.send_json({"type": "position_update", "position": position})
+                websocket.send_json({"type": "world_query"})
+                self.assertEqual(websocket.receive_json()["type"], "world_objects")
+            self._unload()
+            stored = self.client.portal.call(GameSession.get, self.session_id)
+            self.assertEqual(stored.players[self.user_id].position, {"x": 3.0, "y": 4.0})
+            # The session still loads and accepts new connections
+            with self._connect() as websocket:
+                state = websocket.receive_json()
+                self.assertEqual(state["players"][self.user_id]["position"], {"x": 3.0, "y": 4.0})
+
+    def test_joins_and_leaves_are_announced(self):
+        joiner_id, joiner_token = signed_in_user(self.client, "joiner")
+        headers = {"Authorization": f"Bearer {joiner_token}"}
+        with self._connect() as websocket:
+            self.assertEqual(websocket.receive_json()["type"], "session_state")
+            self.client.post(f"{settings.API_PREFIX}/sessions/{self.session_id}/join", headers=headers)
+            joined = websocket.receive_json()
+            self.assertEqual((joined["type"], joined["user_id"], joined["role"]), ("player_joined", joiner_id, "player"))
+            self.client.post(f"{settings.API_PREFIX}/sessions/{self.session_id}/leave", headers=headers)
+            left = websocket.receive_json()
+            self.assertEqual((left["type"], left["user_id"], left["host"], left["closed"]), ("player_left", joiner_id, None, False))
+            self.assertNotIn(joiner_id, live_sessions.get(self.session_id).players)